@@ -0,0 +1,157 @@
+"""Time and memory profile the ingest and query paths on synthetic data.
+
+    python benchmarks/run_benchmarks.py --players 25 100 --days 365 730
+
+Every case runs on freshly generated data in a temporary folder. Times are the
+best of `--repeat` runs, memory is the peak of the Python allocations traced
+during one run."""
+
+from argparse import ArgumentParser
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Dict, List
+import json
+import pandas as pd  # type: ignore
+import pickle
+import sys
+import tracemalloc
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from preprocessing import data_loader, read_in_data
+from preprocessing.synthetic import (
+    SyntheticConfig,
+    write_feature_folder,
+    write_team_workbooks,
+)
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    case: str
+    players: int
+    days: int
+    seconds: float
+    peak_mb: float
+
+
+def measure(function: Callable, repeat: int):
+    """Best wall time of `repeat` runs and the peak traced memory in MB."""
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        result = function()
+        seconds = min(seconds, perf_counter() - start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def export_players(teams: Dict[str, data_loader.Team]):
+    for team in teams.values():
+        for pseudonym, player in team.players.items():
+            player.to_dataframe(pseudonym)
+            player.to_session_dataframe(pseudonym)
+            player.to_injuries_to_dataframe(pseudonym)
+            player.to_illness_to_dataframe(pseudonym)
+            player.to_performance_to_dataframe(pseudonym)
+
+
+def query_players(teams: Dict[str, data_loader.Team], variables: List[str]):
+    for team in teams.values():
+        for player in team.players.values():
+            player.get_variables_by_date(variables, "01.01.2020", "31.12.2021")
+
+
+def benchmark_scale(
+    config: SyntheticConfig, repeat: int, workbooks: bool
+) -> List[BenchmarkResult]:
+    results = []
+
+    def record(case: str, function: Callable):
+        result, seconds, peak_mb = measure(function, repeat)
+        results.append(
+            BenchmarkResult(case, config.players, config.days, seconds, peak_mb)
+        )
+        return result
+
+    variables = ["daily_load", "fatigue", "sleep_duration"]
+    with TemporaryDirectory() as folder:
+        path_to_features = Path(folder) / "features"
+        write_feature_folder(path_to_features, config)
+        teams = record(
+            "read_in_data.generate_teams",
+            lambda: read_in_data.generate_teams(path_to_features),
+        )
+        record("get_variables_by_date", lambda: query_players(teams, variables))
+        record("player exports", lambda: export_players(teams))
+        record(
+            "Team.export",
+            lambda: [team.export() for team in teams.values()],
+        )
+        record("pickle.dumps", lambda: pickle.dumps(teams))
+        compact_teams = record(
+            "generate_teams compact",
+            lambda: read_in_data.generate_teams(path_to_features, compact=True),
+        )
+        record("pickle.dumps compact", lambda: pickle.dumps(compact_teams))
+        path_to_new_day = Path(folder) / "new_day"
+        next_day = pd.Timestamp(config.start) + pd.Timedelta(days=config.days)
+        write_feature_folder(
+            path_to_new_day,
+            replace(config, days=1, start=str(next_day.date()), seed=config.seed + 1),
+        )
+        record(
+            "append one day",
+            lambda: read_in_data.append_teams(
+                teams, read_in_data.team_updates(teams, path_to_new_day)
+            ),
+        )
+
+        if workbooks:
+            paths, team_names = write_team_workbooks(Path(folder) / "players", config)
+            record(
+                "data_loader.generate_teams",
+                lambda: data_loader.generate_teams(paths, team_names),
+            )
+    return results
+
+
+def print_table(results: List[BenchmarkResult]):
+    print(f"{'case':<30} {'players':>8} {'days':>6} {'seconds':>10} {'peak MB':>9}")
+    for result in results:
+        print(
+            f"{result.case:<30} {result.players:>8} {result.days:>6} "
+            f"{result.seconds:>10.4f} {result.peak_mb:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--players", type=int, nargs="+", default=[25, 100])
+    parser.add_argument("--days", type=int, nargs="+", default=[365])
+    parser.add_argument("--teams", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--skip-workbooks",
+        action="store_true",
+        help="leave out the workbook loader, writing the workbooks is slow",
+    )
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    arguments = parser.parse_args()
+
+    results = []
+    for players in arguments.players:
+        for days in arguments.days:
+            config = SyntheticConfig(teams=arguments.teams, players=players, days=days)
+            results += benchmark_scale(
+                config, arguments.repeat, not arguments.skip_workbooks
+            )
+    print_table(results)
+    if arguments.json is not None:
+        with open(arguments.json, "w") as json_file:
+            json.dump([asdict(result) for result in results], json_file, indent=2)
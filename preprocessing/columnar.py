@@ -0,0 +1,376 @@
+"""Partitioned on-disk format for teams.
+
+Every team is stored in its own folder. The daily features are written as raw
+.npy blocks which are memory-mapped when loaded, so only the pages that are
+actually read are brought into memory. The comparatively small session and
+event tables are stored per team next to them and are only read when the team
+is first accessed. Players are built when they are first looked up.
+
+Session tables are written as their flat arrays and memory-mapped as well.
+Compact stores are written as their int8 score and float32 load blocks and are
+memory-mapped as compact stores again.
+
+New days are appended as segments, folders `segments/000000`, `000001`, ... of
+a team holding only the new rows (see `incremental`), so a daily update does not
+rewrite the team. The segments are memory-mapped as well and appended to the
+team as chunks of its store when it is loaded, see `ChunkedStore`. They can be
+merged into the team with `merge_segments`."""
+
+import json
+import shutil
+from collections.abc import Mapping
+from dataclasses import asdict
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.compact import CompactStore, log_memory_report
+from preprocessing.data_loader import (
+    Illness,
+    Injury,
+    MissingTeamStore,
+    Performance,
+    SoccerPlayer,
+    Team,
+)
+from preprocessing.events import EventTable
+from preprocessing.incremental import TeamUpdate, extend_team
+from preprocessing.read_in_data import initialise_player
+from preprocessing.sessions import SessionTable, session_variables
+from preprocessing.team_store import TeamStore
+from preprocessing.validation import ValidationReport
+
+event_variables = {
+    "injuries": Injury,
+    "illness": Illness,
+    "performance": Performance,
+}
+
+
+def events_to_dataframe(
+    players: Dict[str, SoccerPlayer], variable: str
+) -> pd.DataFrame:
+    event_type = event_variables[variable]
+    rows = [
+        asdict(event)
+        for player in players.values()
+        for event in getattr(player, variable)
+    ]
+    return pd.DataFrame(rows, columns=list(event_type.__annotations__.keys()))
+
+
+def save_store(path_to_team: Path, store: Union[TeamStore, CompactStore]) -> Dict:
+    """Write the arrays of the store, returns the store part of the metadata."""
+    np.save(path_to_team / "dates.npy", store.index.values)
+    meta = {"players": store.players, "features": store.features}
+    if isinstance(store, CompactStore):
+        np.save(path_to_team / "scores.npy", store.scores)
+        np.save(path_to_team / "score_mask.npy", store.score_mask)
+        np.save(path_to_team / "loads.npy", store.loads)
+        return {**meta, "score_features": store.score_features}
+    np.save(path_to_team / "values.npy", store.values)
+    np.save(path_to_team / "mask.npy", store.mask)
+    return meta
+
+
+def save_sessions(path_to_team: Path, sessions: SessionTable):
+    np.save(path_to_team / "session_offsets.npy", sessions.offsets)
+    np.save(path_to_team / "session_dates.npy", sessions.dates)
+    for variable in session_variables:
+        np.save(path_to_team / f"session_{variable}.npy", sessions.values[variable])
+
+
+def load_sessions(
+    path_to_team: Path, players: List[str], mmap_mode: str = "r"
+) -> SessionTable:
+    return SessionTable(
+        players,
+        np.load(path_to_team / "session_offsets.npy"),
+        np.load(path_to_team / "session_dates.npy", mmap_mode=mmap_mode),
+        {
+            variable: np.load(
+                path_to_team / f"session_{variable}.npy", mmap_mode=mmap_mode
+            )
+            for variable in session_variables
+        },
+    )
+
+
+def save_team(path_to_team: Path, team: Team, compact: bool = False):
+    """With compact=True the daily features are written as a `CompactStore` and
+    its memory is logged, see `log_memory_report`."""
+    if team.store is None:
+        raise MissingTeamStore(team.name)
+    path_to_team.mkdir(parents=True, exist_ok=True)
+    store = team.store
+    if compact:
+        store = CompactStore.from_store(store)
+        log_memory_report({team.name: store})
+    meta = save_store(path_to_team, store)
+    with open(path_to_team / "meta.json", "w") as meta_file:
+        json.dump({"name": team.name, **meta}, meta_file)
+    team.game_ts.to_pickle(path_to_team / "game_ts.pkl")
+    team.game_performance.to_pickle(path_to_team / "game_performance.pkl")
+    if team.sessions is not None:
+        save_sessions(path_to_team, team.sessions)
+    else:
+        pd.to_pickle(
+            {
+                variable: {
+                    name: getattr(player, variable)
+                    for name, player in team.players.items()
+                }
+                for variable in session_variables
+            },
+            path_to_team / "sessions.pkl",
+        )
+    for variable in event_variables:
+        events = (
+            team.events[variable].to_frame()
+            if variable in team.events
+            else events_to_dataframe(team.players, variable)
+        )
+        events.to_pickle(path_to_team / f"{variable}.pkl")
+    if team.validation is not None:
+        team.validation.violations.to_pickle(path_to_team / "validation.pkl")
+
+
+def save_teams(path_to_folder: Path, teams: Dict[str, Team], compact: bool = False):
+    path_to_folder.mkdir(parents=True, exist_ok=True)
+    for key, team in teams.items():
+        save_team(path_to_folder / key, team, compact)
+    with open(path_to_folder / "teams.json", "w") as index_file:
+        json.dump({"teams": list(teams.keys())}, index_file)
+
+
+def load_store(
+    path_to_team: Path, mmap_mode: str = "r"
+) -> Union[TeamStore, CompactStore]:
+    with open(path_to_team / "meta.json") as meta_file:
+        meta = json.load(meta_file)
+    index = pd.DatetimeIndex(np.load(path_to_team / "dates.npy"), name="Date")
+    if "score_features" in meta:
+        return CompactStore(
+            meta["players"],
+            meta["features"],
+            index,
+            meta["score_features"],
+            np.load(path_to_team / "scores.npy", mmap_mode=mmap_mode),
+            np.load(path_to_team / "score_mask.npy", mmap_mode=mmap_mode),
+            np.load(path_to_team / "loads.npy", mmap_mode=mmap_mode),
+        )
+    return TeamStore(
+        meta["players"],
+        meta["features"],
+        index,
+        np.load(path_to_team / "values.npy", mmap_mode=mmap_mode),
+        np.load(path_to_team / "mask.npy", mmap_mode=mmap_mode),
+    )
+
+
+def load_events(path_to_team: Path, names: List[str]) -> Dict[str, EventTable]:
+    return {
+        variable: EventTable.from_frame(
+            pd.read_pickle(path_to_team / f"{variable}.pkl"), names, event_type
+        )
+        for variable, event_type in event_variables.items()
+    }
+
+
+class LazyPlayers(Mapping):
+    """Read only mapping of player names to players, building each player on its
+    first lookup."""
+
+    def __init__(
+        self,
+        names: List[str],
+        path_to_team: Path,
+        store: TeamStore,
+        events: Dict[str, EventTable],
+        sessions: Optional[SessionTable] = None,
+    ):
+        self.names = list(names)
+        self.path_to_team = path_to_team
+        self.store = store
+        self.events = events
+        self.sessions = sessions
+        self._variables: Dict = {}
+        self._players: Dict[str, SoccerPlayer] = {}
+
+    def variables(self) -> Dict:
+        if not self._variables:
+            self._variables = {
+                **(
+                    {
+                        variable: self.sessions.player_sessions(variable)
+                        for variable in session_variables
+                    }
+                    if self.sessions is not None
+                    else pd.read_pickle(self.path_to_team / "sessions.pkl")
+                ),
+                **self.events,
+            }
+        return self._variables
+
+    def __getitem__(self, player_name: str) -> SoccerPlayer:
+        if player_name not in self._players:
+            if player_name not in self.store.player_positions:
+                raise KeyError(player_name)
+            self._players[player_name] = initialise_player(
+                player_name, self.variables(), self.store, lazy=True
+            )
+        return self._players[player_name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def lazy_players(
+    path_to_team: Path,
+    store: TeamStore,
+    sessions: Optional[SessionTable],
+    events: Dict[str, EventTable],
+) -> LazyPlayers:
+    return LazyPlayers(store.players, path_to_team, store, events, sessions)
+
+
+def segment_paths(path_to_team: Path) -> List[Path]:
+    path_to_segments = path_to_team / "segments"
+    if not path_to_segments.exists():
+        return []
+    return sorted(path for path in path_to_segments.iterdir() if path.is_dir())
+
+
+def save_update(path_to_segment: Path, update: TeamUpdate):
+    path_to_segment.mkdir(parents=True)
+    meta = save_store(path_to_segment, update.store)
+    with open(path_to_segment / "meta.json", "w") as meta_file:
+        json.dump(meta, meta_file)
+    update.game_ts.to_pickle(path_to_segment / "game_ts.pkl")
+    update.game_performance.to_pickle(path_to_segment / "game_performance.pkl")
+    if update.sessions is not None:
+        save_sessions(path_to_segment, update.sessions)
+    for variable, table in update.events.items():
+        table.to_frame().to_pickle(path_to_segment / f"{variable}.pkl")
+    if update.validation is not None:
+        update.validation.violations.to_pickle(path_to_segment / "validation.pkl")
+
+
+def append_segment(path_to_team: Path, update: TeamUpdate) -> Path:
+    """Write the update as the next segment of the team, the files written before
+    are not touched."""
+    path_to_segment = (
+        path_to_team / "segments" / f"{len(segment_paths(path_to_team)):06d}"
+    )
+    save_update(path_to_segment, update)
+    return path_to_segment
+
+
+def append_segments(path_to_folder: Path, updates: Dict[str, TeamUpdate]):
+    for team_name, update in updates.items():
+        append_segment(path_to_folder / team_name, update)
+
+
+def load_update(
+    path_to_segment: Path, names: List[str], mmap_mode: str = "r"
+) -> TeamUpdate:
+    store = load_store(path_to_segment, mmap_mode)
+    sessions = None
+    if (path_to_segment / "session_offsets.npy").exists():
+        sessions = load_sessions(path_to_segment, store.players, mmap_mode)
+    validation = None
+    if (path_to_segment / "validation.pkl").exists():
+        validation = ValidationReport(
+            pd.read_pickle(path_to_segment / "validation.pkl")
+        )
+    return TeamUpdate(
+        store,
+        sessions,
+        {
+            variable: EventTable.from_frame(
+                pd.read_pickle(path_to_segment / f"{variable}.pkl"), names, event_type
+            )
+            for variable, event_type in event_variables.items()
+            if (path_to_segment / f"{variable}.pkl").exists()
+        },
+        pd.read_pickle(path_to_segment / "game_performance.pkl"),
+        pd.read_pickle(path_to_segment / "game_ts.pkl"),
+        validation,
+    )
+
+
+def load_team(path_to_team: Path, mmap_mode: str = "r") -> Team:
+    with open(path_to_team / "meta.json") as meta_file:
+        name = json.load(meta_file)["name"]
+    store = load_store(path_to_team, mmap_mode)
+    events = load_events(path_to_team, store.players)
+    sessions = None
+    if (path_to_team / "session_offsets.npy").exists():
+        sessions = load_sessions(path_to_team, store.players, mmap_mode)
+    validation = None
+    if (path_to_team / "validation.pkl").exists():
+        validation = ValidationReport(pd.read_pickle(path_to_team / "validation.pkl"))
+    team = Team(
+        name,
+        pd.read_pickle(path_to_team / "game_performance.pkl"),
+        pd.read_pickle(path_to_team / "game_ts.pkl"),
+        lazy_players(path_to_team, store, sessions, events),
+        store,
+        events,
+        validation,
+        sessions,
+    )
+    for path_to_segment in segment_paths(path_to_team):
+        team = extend_team(
+            team,
+            load_update(path_to_segment, store.players, mmap_mode),
+            partial(lazy_players, path_to_team),
+        )
+    return team
+
+
+def merge_segments(path_to_team: Path):
+    """Rewrite the team with its segments appended and remove the segments."""
+    if not segment_paths(path_to_team):
+        return
+    with open(path_to_team / "meta.json") as meta_file:
+        compact = "score_features" in json.load(meta_file)
+    save_team(path_to_team, load_team(path_to_team), compact)
+    shutil.rmtree(path_to_team / "segments")
+
+
+class LazyTeams(Mapping):
+    """Read only mapping of the teams in a folder written by `save_teams`. Teams are
+    loaded on their first lookup."""
+
+    def __init__(self, path_to_folder: Path, mmap_mode: str = "r"):
+        self.path_to_folder = path_to_folder
+        self.mmap_mode = mmap_mode
+        with open(path_to_folder / "teams.json") as index_file:
+            self.names = json.load(index_file)["teams"]
+        self._teams: Dict[str, Team] = {}
+
+    def __getitem__(self, team_name: str) -> Team:
+        if team_name not in self._teams:
+            if team_name not in self.names:
+                raise KeyError(team_name)
+            self._teams[team_name] = load_team(
+                self.path_to_folder / team_name, self.mmap_mode
+            )
+        return self._teams[team_name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def load_teams(path_to_folder: Path, mmap_mode: str = "r") -> LazyTeams:
+    return LazyTeams(path_to_folder, mmap_mode)
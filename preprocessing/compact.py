@@ -0,0 +1,285 @@
+"""Compact storage of the daily features of a team.
+
+The wellness scores are small integers and are kept as int8 together with a
+mask of the missing days, all other features as float32 with NaN for missing
+days. The per player series handed out by the store are views into these
+arrays: nullable `Int8` series for the scores and float32 series for the loads.
+Computations over many players still work on float64 blocks, which are
+gathered for the selection only, or feature by feature. The loaders log the
+`memory_report` of the stores they compact:
+
+    store = CompactStore.from_store(team_store)
+    memory_report({"TeamA": team_store, "TeamA compact": store})"""
+
+import logging
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional, Union
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.daily_calendar import DailyCalendar
+from preprocessing.team_store import TeamStore
+
+score_features = [
+    "fatigue",
+    "mood",
+    "readiness",
+    "sleep_quality",
+    "soreness",
+    "stress",
+]
+memory_columns = ["players", "features", "days", "float64_mb", "stored_mb", "ratio"]
+
+logger = logging.getLogger(__name__)
+
+
+def integral_scores(values: np.ndarray) -> bool:
+    """True if all observed values are integers that fit into int8."""
+    observed = values[~np.isnan(values)]
+    return bool(
+        np.all(observed == np.round(observed))
+        and np.all((observed >= -128) & (observed <= 127))
+    )
+
+
+@dataclass(frozen=True)
+class CompactStore:
+    """Player x feature x day store of a team with int8 scores, `scores` and
+    `score_mask` have one row per score feature, `loads` one per other feature."""
+
+    players: List[str]
+    features: List[str]
+    index: pd.DatetimeIndex
+    score_features: List[str]
+    scores: np.ndarray
+    score_mask: np.ndarray
+    loads: np.ndarray
+
+    @cached_property
+    def player_positions(self) -> Dict[str, int]:
+        return {player: position for position, player in enumerate(self.players)}
+
+    @cached_property
+    def feature_positions(self) -> Dict[str, int]:
+        return {feature: position for position, feature in enumerate(self.features)}
+
+    @cached_property
+    def load_features(self) -> List[str]:
+        return [
+            feature for feature in self.features if feature not in self.score_features
+        ]
+
+    @cached_property
+    def locations(self) -> Dict[str, tuple]:
+        """Array and row of every feature."""
+        return {
+            **{
+                feature: ("scores", position)
+                for position, feature in enumerate(self.score_features)
+            },
+            **{
+                feature: ("loads", position)
+                for position, feature in enumerate(self.load_features)
+            },
+        }
+
+    @cached_property
+    def calendar(self) -> DailyCalendar:
+        return DailyCalendar.from_index(self.index)
+
+    @property
+    def shape(self):
+        return len(self.players), len(self.features), len(self.index)
+
+    @property
+    def nbytes(self) -> int:
+        return self.scores.nbytes + self.score_mask.nbytes + self.loads.nbytes
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Players x features x days mask of the missing days, built on every
+        access; use `feature_mask` where one feature at a time will do."""
+        return np.stack(
+            [self.feature_mask(feature) for feature in self.features], axis=1
+        )
+
+    @property
+    def values(self) -> np.ndarray:
+        """Players x features x days float64 array, built on every access; use
+        `feature_values` where one feature at a time will do."""
+        return self.block()
+
+    def player_position(self, player_name: str) -> int:
+        return self.player_positions[player_name]
+
+    def feature_position(self, feature_name: str) -> int:
+        return self.feature_positions[feature_name]
+
+    def day_position(self, date) -> int:
+        return self.calendar.position(date)
+
+    def feature_values(self, feature_name: str) -> np.ndarray:
+        """Players x days array of one feature, a view for the loads and a float32
+        copy with NaN for missing days for the scores."""
+        array, position = self.locations[feature_name]
+        if array == "loads":
+            return self.loads[:, position]
+        return np.where(
+            self.score_mask[:, position],
+            np.float32(np.nan),
+            self.scores[:, position].astype(np.float32),
+        )
+
+    def feature_mask(self, feature_name: str) -> np.ndarray:
+        """Players x days mask of the missing days of one feature."""
+        array, position = self.locations[feature_name]
+        if array == "loads":
+            return np.isnan(self.loads[:, position])
+        return self.score_mask[:, position]
+
+    def series(self, player_name: str, feature_name: str) -> pd.Series:
+        player = self.player_position(player_name)
+        array, position = self.locations[feature_name]
+        if array == "loads":
+            values = self.loads[player, position]
+        else:
+            values = pd.arrays.IntegerArray(
+                self.scores[player, position], self.score_mask[player, position]
+            )
+        return pd.Series(values, index=self.index, name=player_name, copy=False)
+
+    def feature(self, feature_name: str) -> pd.DataFrame:
+        """Days x players frame of one feature."""
+        return pd.DataFrame(
+            self.feature_values(feature_name).T,
+            index=self.index,
+            columns=self.players,
+            copy=False,
+        )
+
+    def player_frame(self, player_name: str) -> pd.DataFrame:
+        """Days x features frame of one player."""
+        return pd.DataFrame(
+            {feature: self.series(player_name, feature) for feature in self.features},
+            copy=False,
+        )
+
+    def block(
+        self,
+        players: Optional[List[str]] = None,
+        features: Optional[List[str]] = None,
+        days: Union[slice, np.ndarray] = slice(None),
+    ) -> np.ndarray:
+        """Players x features x days float64 array of the selection."""
+        player_positions = (
+            np.arange(len(self.players))
+            if players is None
+            else np.array([self.player_position(player) for player in players])
+        )
+        features = self.features if features is None else list(features)
+        day_positions = np.arange(len(self.index))[days]
+        block = np.empty((len(player_positions), len(features), len(day_positions)))
+        for column, feature in enumerate(features):
+            array, position = self.locations[feature]
+            selection = np.ix_(player_positions, day_positions)
+            if array == "loads":
+                block[:, column] = self.loads[:, position][selection]
+            else:
+                block[:, column] = np.where(
+                    self.score_mask[:, position][selection],
+                    np.nan,
+                    self.scores[:, position][selection],
+                )
+        return block
+
+    def append(self, values: np.ndarray, index: pd.DatetimeIndex) -> "CompactStore":
+        """Store extended by new days following its last day. If new scores do not
+        fit into int8, the whole store is compacted again."""
+        new = CompactStore.from_store(
+            TeamStore.from_arrays(self.players, self.features, index, values),
+            self.score_features,
+        )
+        if new.score_features != self.score_features:
+            return CompactStore.from_store(self.to_store().append(values, index))
+        return CompactStore(
+            self.players,
+            self.features,
+            self.index.append(index),
+            self.score_features,
+            np.concatenate([self.scores, new.scores], axis=-1),
+            np.concatenate([self.score_mask, new.score_mask], axis=-1),
+            np.concatenate([self.loads, new.loads], axis=-1),
+        )
+
+    def to_store(self) -> TeamStore:
+        return TeamStore.from_arrays(
+            self.players, self.features, self.index, self.values
+        )
+
+    @classmethod
+    def from_store(
+        cls, store: TeamStore, scores: List[str] = score_features
+    ) -> "CompactStore":
+        """Scores that are not all integers in the int8 range, e.g. after an
+        imputation, are kept as float32 like the loads."""
+        if isinstance(store, CompactStore):
+            return store
+        kept = [
+            feature
+            for feature in store.features
+            if feature in scores and integral_scores(store.feature_values(feature))
+        ]
+        loads = [feature for feature in store.features if feature not in kept]
+
+        def stacked(features: List[str], dtype) -> np.ndarray:
+            days = len(store.index)
+            array = np.empty((len(store.players), len(features), days), dtype=dtype)
+            for position, feature in enumerate(features):
+                array[:, position] = store.feature_values(feature)
+            return array
+
+        score_values = stacked(kept, np.float64)
+        score_mask = np.isnan(score_values)
+        return cls(
+            list(store.players),
+            list(store.features),
+            store.index,
+            kept,
+            np.where(score_mask, 0, score_values).astype(np.int8),
+            score_mask,
+            stacked(loads, np.float32),
+        )
+
+
+def float64_nbytes(store: Union[TeamStore, CompactStore]) -> int:
+    """Bytes of the values and the mask of a float64 store of the same shape."""
+    players, features, days = store.shape
+    return players * features * days * (np.float64().nbytes + np.bool_().nbytes)
+
+
+def memory_report(stores: Dict[str, Union[TeamStore, CompactStore]]) -> pd.DataFrame:
+    """Memory of the stores compared to float64 stores of the same shape, in MB."""
+    rows = {
+        name: [
+            *store.shape,
+            float64_nbytes(store) / 2**20,
+            store.nbytes / 2**20,
+            float64_nbytes(store) / max(store.nbytes, 1),
+        ]
+        for name, store in stores.items()
+    }
+    return pd.DataFrame.from_dict(rows, orient="index", columns=memory_columns)
+
+
+def log_memory_report(stores: Dict[str, Union[TeamStore, CompactStore]]):
+    """Log the memory of the stores before and after compaction."""
+    for name, row in memory_report(stores).iterrows():
+        logger.info(
+            "%s: %.2f MB as float64, %.2f MB compact (%.1fx smaller)",
+            name,
+            row["float64_mb"],
+            row["stored_mb"],
+            row["ratio"],
+        )
@@ -0,0 +1,198 @@
+"""Lagged correlations between daily features of all players at once.
+
+The correlation at lag k relates a source feature on day t to a target feature
+on day t + k, e.g. the daily load to the fatigue reported k days later. Days on
+which either value is missing are left out pair by pair, as `pandas.corr` does.
+For one lag, the sums needed by all players and feature pairs are computed with
+a few `einsum` calls over the players x features x days arrays; Spearman
+correlations rank the pairwise complete values first."""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+correlation_methods = ["pearson", "spearman"]
+
+
+class UnknownCorrelation(Exception):
+    def __init__(self, value):
+        message = f"Unknown correlation {value}, use one of {correlation_methods}"
+        super().__init__(message)
+
+
+def pearson_from_sums(n, x, y, xx, yy, xy) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = n * xy - x * y
+        variance = (n * xx - x**2) * (n * yy - y**2)
+        return np.where(variance > 0, covariance / np.sqrt(variance), np.nan)
+
+
+def pearson(sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Correlations of all source and target features of all players, shape
+    players x sources x targets, for arrays of shape players x features x days."""
+    source_observed = ~np.isnan(sources)
+    target_observed = ~np.isnan(targets)
+    x = np.where(source_observed, sources, 0.0)
+    y = np.where(target_observed, targets, 0.0)
+    source_observed = source_observed.astype(np.float64)
+    target_observed = target_observed.astype(np.float64)
+    return pearson_from_sums(
+        np.einsum("pad,pbd->pab", source_observed, target_observed),
+        np.einsum("pad,pbd->pab", x, target_observed),
+        np.einsum("pad,pbd->pab", source_observed, y),
+        np.einsum("pad,pbd->pab", x**2, target_observed),
+        np.einsum("pad,pbd->pab", source_observed, y**2),
+        np.einsum("pad,pbd->pab", x, y),
+    )
+
+
+def pairwise_ranks(values: np.ndarray, observed: np.ndarray) -> np.ndarray:
+    """Average ranks along the last axis of the values where `observed`."""
+    shape = observed.shape
+    values = np.where(observed, np.broadcast_to(values, shape), np.nan)
+    rows = int(np.prod(shape[:-1]))
+    ranks = pd.DataFrame(values.reshape(rows, shape[-1])).rank(axis=1)
+    return ranks.to_numpy().reshape(shape)
+
+
+def spearman(sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    x = sources[:, :, None, :]
+    y = targets[:, None, :, :]
+    observed = ~(np.isnan(x) | np.isnan(y))
+    x = pairwise_ranks(x, observed)
+    y = pairwise_ranks(y, observed)
+    n = observed.sum(axis=-1)
+    x, y = np.where(observed, x, 0.0), np.where(observed, y, 0.0)
+    return pearson_from_sums(
+        n,
+        x.sum(axis=-1),
+        y.sum(axis=-1),
+        (x**2).sum(axis=-1),
+        (y**2).sum(axis=-1),
+        (x * y).sum(axis=-1),
+    )
+
+
+def pair_counts(sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    return np.einsum(
+        "pad,pbd->pab",
+        (~np.isnan(sources)).astype(np.float64),
+        (~np.isnan(targets)).astype(np.float64),
+    ).astype(np.int64)
+
+
+def lagged_block(
+    sources: np.ndarray, targets: np.ndarray, lags: List[int], method: str
+):
+    """Correlations and numbers of pairs of shape players x sources x targets x
+    lags. Lags of as many days as there are have no pairs and no correlation."""
+    if method not in correlation_methods:
+        raise UnknownCorrelation(method)
+    correlate = pearson if method == "pearson" else spearman
+    days = sources.shape[-1]
+    correlations, counts = [], []
+    for lag in lags:
+        lag = min(lag, days)
+        lagged_sources = sources[..., : days - lag]
+        lagged_targets = targets[..., lag:]
+        correlations.append(correlate(lagged_sources, lagged_targets))
+        counts.append(pair_counts(lagged_sources, lagged_targets))
+    return np.stack(correlations, axis=-1), np.stack(counts, axis=-1)
+
+
+@dataclass(frozen=True)
+class LaggedCorrelations:
+    players: List[str]
+    sources: List[str]
+    targets: List[str]
+    lags: List[int]
+    correlations: np.ndarray
+    counts: np.ndarray
+
+    def player(self, player_name: str) -> pd.DataFrame:
+        """Sources and targets x lags frame of one player."""
+        position = self.players.index(player_name)
+        return pd.DataFrame(
+            self.correlations[position].reshape(-1, len(self.lags)),
+            index=pd.MultiIndex.from_product(
+                [self.sources, self.targets], names=["source", "target"]
+            ),
+            columns=pd.Index(self.lags, name="lag"),
+        )
+
+    def squad(self) -> pd.DataFrame:
+        """Correlations over all players: the mean of the Fisher transformed
+        correlations of the players, weighted by their number of pairs - 3."""
+        weights = np.where(
+            np.isnan(self.correlations), 0.0, np.maximum(self.counts - 3, 0)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.arctanh(np.clip(self.correlations, -0.999999, 0.999999))
+            mean = np.nansum(z * weights, axis=0) / weights.sum(axis=0)
+        return pd.DataFrame(
+            np.tanh(mean).reshape(-1, len(self.lags)),
+            index=pd.MultiIndex.from_product(
+                [self.sources, self.targets], names=["source", "target"]
+            ),
+            columns=pd.Index(self.lags, name="lag"),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long frame with one row per player, feature pair and lag."""
+        return pd.DataFrame(
+            {
+                "correlation": self.correlations.reshape(-1),
+                "pairs": self.counts.reshape(-1),
+            },
+            index=pd.MultiIndex.from_product(
+                [self.players, self.sources, self.targets, self.lags],
+                names=["player", "source", "target", "lag"],
+            ),
+        )
+
+
+def lagged_correlations(
+    sources: np.ndarray,
+    targets: np.ndarray,
+    players: List[str],
+    source_names: List[str],
+    target_names: List[str],
+    max_lag: int = 14,
+    method: str = "pearson",
+    min_periods: int = 3,
+    workers: int = 1,
+    players_per_task: int = 32,
+) -> LaggedCorrelations:
+    """Correlations of the players x features x days arrays `sources` and `targets`
+    for the lags 0 ... max_lag. Correlations of fewer than `min_periods` pairs
+    are missing. With more than one worker, blocks of players are correlated in
+    worker processes."""
+    lags = list(range(max_lag + 1))
+    blocks = range(0, len(players), players_per_task)
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(
+                pool.map(
+                    lagged_block,
+                    [sources[start : start + players_per_task] for start in blocks],
+                    [targets[start : start + players_per_task] for start in blocks],
+                    [lags] * len(blocks),
+                    [method] * len(blocks),
+                )
+            )
+        correlations = np.concatenate([result[0] for result in results])
+        counts = np.concatenate([result[1] for result in results])
+    else:
+        correlations, counts = lagged_block(sources, targets, lags, method)
+    correlations = np.where(counts >= min_periods, correlations, np.nan)
+    return LaggedCorrelations(
+        list(players),
+        list(source_names),
+        list(target_names),
+        lags,
+        correlations,
+        counts,
+    )
@@ -0,0 +1,155 @@
+"""Canonical daily calendar of a team and the resolution of duplicated dates.
+
+The exports repeat dates and skip others, so the rows of a sheet cannot be
+aligned by position. Every loader maps the rows onto one gap-free calendar
+running from the first to the last reported day instead. The position of a
+date is its distance in days from the first day, so a lookup is a subtraction:
+
+    calendar = DailyCalendar.from_dates(dates)
+    values = resolve(rows, calendar.positions(dates), calendar.days, "first")
+
+Several rows of the same day are merged by a duplicate policy: the first or
+the last reported value, their mean or their sum. Missing values do not take
+part, a day without any reported value stays missing."""
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Optional
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+duplicate_policies = ["first", "last", "mean", "sum"]
+default_duplicate_policies = {"daily_load": "sum"}
+
+
+class UnknownDuplicatePolicy(Exception):
+    def __init__(self, value):
+        message = f"Unknown duplicate policy {value}, use one of {duplicate_policies}"
+        super().__init__(message)
+
+
+class NotADailyCalendar(Exception):
+    def __init__(self, value):
+        message = f"Index {value} is not a gap-free daily calendar"
+        super().__init__(message)
+
+
+def to_dates(dates, date_format: str = "%d.%m.%Y") -> pd.DatetimeIndex:
+    """Days of the dates, strings are parsed with `date_format`."""
+    dates = pd.Index(dates)
+    if not isinstance(dates, pd.DatetimeIndex):
+        dates = pd.DatetimeIndex(
+            pd.to_datetime(dates, format=date_format, errors="coerce")
+        )
+    return dates.floor("D")
+
+
+def to_timestamp(date, date_format: str = "%d.%m.%Y") -> pd.Timestamp:
+    """Timestamp of a date bound. Strings are read with `date_format` first and
+    by pandas otherwise, so "01.02.2020" is the 1st of February while ISO dates
+    are read as such."""
+    if not isinstance(date, str):
+        return pd.Timestamp(date)
+    timestamp = pd.to_datetime(date, format=date_format, errors="coerce")
+    if pd.isna(timestamp):
+        timestamp = pd.to_datetime(date, format="mixed", errors="coerce")
+    if pd.isna(timestamp):
+        raise ValueError(f"Cannot read {date!r} as a date")
+    return timestamp
+
+
+@dataclass(frozen=True)
+class DailyCalendar:
+    start: pd.Timestamp
+    days: int
+
+    @cached_property
+    def index(self) -> pd.DatetimeIndex:
+        return pd.date_range(self.start, periods=self.days, freq="D", name="Date")
+
+    @property
+    def end(self) -> pd.Timestamp:
+        return self.start + pd.Timedelta(days=self.days - 1)
+
+    def __len__(self) -> int:
+        return self.days
+
+    def position(self, date) -> int:
+        """Position of the day of `date`, -1 outside of the calendar. Strings are
+        read as by `to_timestamp`."""
+        offset = (to_timestamp(date).floor("D") - self.start).days
+        return offset if 0 <= offset < self.days else -1
+
+    def positions(self, dates, date_format: str = "%d.%m.%Y") -> np.ndarray:
+        """Positions of the days of all dates, -1 for dates outside of the
+        calendar or dates that cannot be parsed."""
+        dates = to_dates(dates, date_format)
+        offsets = np.asarray((dates - self.start).days, dtype=np.float64)
+        inside = (offsets >= 0) & (offsets < self.days)
+        return np.where(inside, offsets, -1).astype(np.int64)
+
+    def slice(self, from_date, until_date) -> slice:
+        """Positions of the days from `from_date` up to, but not including,
+        `until_date`, clipped to the calendar. Strings are read as by
+        `to_timestamp`."""
+        start = (to_timestamp(from_date).floor("D") - self.start).days
+        stop = (to_timestamp(until_date).floor("D") - self.start).days
+        return slice(min(max(start, 0), self.days), min(max(stop, 0), self.days))
+
+    @classmethod
+    def from_dates(cls, *dates, date_format: str = "%d.%m.%Y") -> "DailyCalendar":
+        """Calendar from the first to the last of all given dates."""
+        days = to_dates(
+            np.concatenate([np.asarray(to_dates(each, date_format)) for each in dates])
+        ).dropna()
+        if len(days) == 0:
+            return cls(pd.Timestamp(0), 0)
+        return cls(days.min(), (days.max() - days.min()).days + 1)
+
+    @classmethod
+    def from_index(cls, index: pd.DatetimeIndex) -> "DailyCalendar":
+        """Calendar of an index that already is one."""
+        if len(index) == 0:
+            return cls(pd.Timestamp(0), 0)
+        calendar = cls(index[0], len(index))
+        if not index.equals(calendar.index):
+            raise NotADailyCalendar(index.name)
+        return calendar
+
+
+def duplicate_policy(
+    feature: str, policies: Optional[Dict[str, str]] = None, default: str = "first"
+) -> str:
+    return (policies or {}).get(feature, default)
+
+
+def resolve(
+    values: np.ndarray, positions: np.ndarray, days: int, policy: str = "first"
+) -> np.ndarray:
+    """Map the rows of `values` (..., rows) onto the calendar positions, giving an
+    array of shape (..., days). Rows on the same day are merged by the policy,
+    rows with a negative position are dropped."""
+    if policy not in duplicate_policies:
+        raise UnknownDuplicatePolicy(policy)
+    values = np.asarray(values, dtype=np.float64)
+    leading = values.shape[:-1]
+    rows = values.reshape(-1, values.shape[-1])
+    positions = np.asarray(positions, dtype=np.int64)
+    observed = ~np.isnan(rows) & (positions >= 0)
+    series, row = np.nonzero(observed)
+    targets = series * days + positions[row]
+    reported = rows[series, row]
+    result = np.full(len(rows) * days, np.nan)
+    if policy in ("first", "last"):
+        if policy == "last":
+            targets, reported = targets[::-1], reported[::-1]
+        unique, first = np.unique(targets, return_index=True)
+        result[unique] = reported[first]
+    else:
+        sums = np.bincount(targets, weights=reported, minlength=len(result))
+        counts = np.bincount(targets, minlength=len(result))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            merged = sums if policy == "sum" else sums / counts
+        result = np.where(counts > 0, merged, np.nan)
+    return result.reshape(leading + (days,))
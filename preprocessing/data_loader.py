@@ -1,13 +1,48 @@
-from typing import Any, Dict, List, Union, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Union, Tuple
 from pathlib import Path
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field, replace
+from functools import cached_property, partial
 from collections import defaultdict
 from uuid import uuid4
+import io
 
 import pandas as pd  # type: ignore
 import numpy as np  # type: ignore
 import warnings
 
+from preprocessing.compact import CompactStore, log_memory_report
+from preprocessing.daily_calendar import (
+    DailyCalendar,
+    default_duplicate_policies,
+    duplicate_policy,
+    resolve,
+    to_timestamp,
+)
+from preprocessing.correlations import LaggedCorrelations, lagged_correlations
+from preprocessing.events import EventTable, event_matrix, event_series
+from preprocessing.export import export_tables, export_team
+from preprocessing.imputation import MissingnessIndex, impute
+from preprocessing.incremental import (
+    ChunkedStore,
+    TeamUpdate,
+    extend_team,
+    team_update,
+)
+from preprocessing.ingest_cache import IngestCache
+from preprocessing.parallel_loader import load_in_parallel
+from preprocessing.rollups import RollupCube
+from preprocessing.sessions import SessionTable, session_features, session_variables
+from preprocessing.shared_arrays import attach_arrays, share_arrays, worker_pool
+from preprocessing.profiling import profiler
+from preprocessing.team_store import TeamStore, daily_features
+from preprocessing.validation import (
+    UnitRule,
+    ValidationReport,
+    default_rules,
+    validate_store,
+)
+from preprocessing.windows import WindowDataset
+
 
 class NoDateIndex(Exception):
     def __init__(self, value):
@@ -27,6 +62,12 @@ class DateNotInRange(Exception):
         super().__init__(message)
 
 
+class MissingTeamStore(Exception):
+    def __init__(self, value):
+        message = f"Team {value} has no team store"
+        super().__init__(message)
+
+
 wellness_sheets_names = [
     "Game Performance",
     "Injury",
@@ -40,6 +81,44 @@ wellness_sheets_names = [
     "Stress",
 ]
 
+record_columns = [
+    "Date",
+    "Daily Load",
+    "SRPE",
+    "RPE",
+    "Duration [min]",
+    "ATL",
+    "Weekly Load",
+    "Monotony",
+    "Strain",
+    "Acwr",
+    "Ctl28",
+    "Ctl42",
+]
+
+wellness_features = {
+    "Fatigue": "fatigue",
+    "Mood": "mood",
+    "Readiness": "readiness",
+    "SleepDurH": "sleep_duration",
+    "SleepQuality": "sleep_quality",
+    "Soreness": "soreness",
+    "Stress": "stress",
+}
+
+session_columns = {"srpe": "SRPE", "rpe": "RPE", "duration": "Duration [min]"}
+
+record_features = {
+    "Daily Load": "daily_load",
+    "ATL": "atl",
+    "Weekly Load": "weekly_load",
+    "Monotony": "monotony",
+    "Strain": "strain",
+    "Acwr": "acwr",
+    "Ctl28": "ctl28",
+    "Ctl42": "ctl42",
+}
+
 sheets = [
     "Game Performance",
     "Injury",
@@ -54,9 +133,14 @@ sheets = [
 
 
 def check_if_variable_callable(variable_name, player):
-    if variable_name not in player.__annotations__.keys():
+    """Sessions can be queried by date when their dates are known."""
+    if variable_name not in player.get_variable_names():
         raise VarNotFound(variable_name)
-    if variable_name in ["srpe", "rpe", "injuries", "illness", "performance", "name"]:
+    if variable_name in ["injuries", "illness", "performance", "name"]:
+        raise NoDateIndex(variable_name)
+    if variable_name in session_variables and not isinstance(
+        getattr(getattr(player, variable_name), "index", None), pd.DatetimeIndex
+    ):
         raise NoDateIndex(variable_name)
 
 
@@ -109,7 +193,15 @@ class SoccerPlayer:
     performance: List[Performance]
 
     def get_variable_names(self) -> List[str]:
-        return list(self.__annotations__.keys())
+        return list(SoccerPlayer.__annotations__.keys())
+
+    @property
+    def injury_ts(self) -> pd.Series:
+        """Binary series of the days with an injury, on the index of the daily
+        load."""
+        return event_series(
+            self.daily_load.index, [injury.timestamp for injury in self.injuries]
+        ).reindex(self.daily_load.index)
 
     def get_variables_by_date(
         self,
@@ -118,11 +210,14 @@ class SoccerPlayer:
         until_date: str = "31.12.2021",
     ) -> pd.DataFrame:
         return pd.DataFrame(
-            [
-                get_variable_by_date(self, variable_name, from_date, until_date)
+            {
+                variable_name: get_variable_by_date(
+                    self, variable_name, from_date, until_date
+                )
                 for variable_name in variable_names
-            ]
-        ).T
+            },
+            copy=False,
+        )
 
     def to_dataframe(self, pseudonym):
         feature_df = pd.DataFrame(
@@ -197,12 +292,39 @@ class SoccerPlayer:
         return []
 
 
+class LazySoccerPlayer(SoccerPlayer):
+    """Player whose daily features are only created from the team store when they
+    are first accessed, and then kept. The session and event variables are
+    looked up in `variables`, a mapping of variable name to the player's value."""
+
+    def __init__(self, name: str, store: TeamStore, variables: Dict[str, Any]):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "_store", store)
+        object.__setattr__(self, "_variables", variables)
+
+    def __getattr__(self, variable_name: str):
+        if variable_name.startswith("_"):
+            raise AttributeError(variable_name)
+        if variable_name in self._store.feature_positions:
+            value = self._store.series(self.name, variable_name)
+        elif variable_name in self._variables:
+            value = self._variables[variable_name]
+        else:
+            raise AttributeError(variable_name)
+        object.__setattr__(self, variable_name, value)
+        return value
+
+
 @dataclass(frozen=True)
 class Team:
     name: str
     game_performance: pd.DataFrame
     game_ts: pd.Series
     players: Dict[str, SoccerPlayer]
+    store: Optional[Union[TeamStore, CompactStore, ChunkedStore]] = None
+    events: Dict[str, EventTable] = field(default_factory=dict)
+    validation: Optional[ValidationReport] = None
+    sessions: Optional[SessionTable] = None
 
     def get_player(self, player_name: str) -> SoccerPlayer:
         return self.players[player_name]
@@ -210,22 +332,246 @@ class Team:
     def get_players(self, player_names: List[str]) -> List[SoccerPlayer]:
         return [self.get_player(player_name) for player_name in player_names]
 
+    def get_store(self) -> Union[TeamStore, CompactStore, ChunkedStore]:
+        if self.store is None:
+            raise MissingTeamStore(self.name)
+        return self.store
+
+    def get_sessions(self) -> SessionTable:
+        if self.sessions is None:
+            raise VarNotFound("sessions")
+        return self.sessions
+
+    @cached_property
+    def session_store(self) -> TeamStore:
+        """Daily aggregates of the sessions of all players on the calendar of the
+        team store, see `SessionTable.daily`."""
+        return self.get_sessions().daily(self.get_store().calendar)
+
+    def feature_block(
+        self,
+        players: List[str],
+        features: List[str],
+        days: Union[slice, np.ndarray] = slice(None),
+    ) -> np.ndarray:
+        """Players x features x days array of daily features and daily session
+        aggregates, joined on the calendar of the team store."""
+        store = self.get_store()
+        for feature in features:
+            if feature not in store.feature_positions and not (
+                self.sessions is not None and feature in session_features
+            ):
+                raise VarNotFound(feature)
+        daily = [feature for feature in features if feature in store.feature_positions]
+        if len(daily) == len(features):
+            return store.block(players, features, days)
+        sessions = [feature for feature in features if feature not in daily]
+        if not daily:
+            return self.session_store.block(players, features, days)
+        block = np.concatenate(
+            [
+                store.block(players, daily, days),
+                self.session_store.block(players, sessions, days),
+            ],
+            axis=1,
+        )
+        order = [(daily + sessions).index(feature) for feature in features]
+        return block[:, order]
+
+    @cached_property
+    def missingness(self) -> MissingnessIndex:
+        """Coverage of every player and feature per week, computed once."""
+        return MissingnessIndex.from_store(self.get_store())
+
+    @cached_property
+    def rollups(self) -> RollupCube:
+        """Day, week, month and season aggregates of all players, computed once.
+        The chunks of a chunked store are rolled up one after another."""
+        first, *chunks = ChunkedStore.from_store(self.get_store()).chunks
+        rollups = RollupCube.from_store(first)
+        for chunk in chunks:
+            rollups = rollups.merge(RollupCube.from_store(chunk))
+        return rollups
+
+    def impute(
+        self,
+        method: str = "ffill",
+        features: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        window: int = 7,
+        min_periods: int = 1,
+    ) -> TeamStore:
+        """Team store with the gaps of all players filled at once, see `impute`."""
+        return impute(self.get_store(), method, features, limit, window, min_periods)
+
+    def query(
+        self,
+        features: List[str],
+        players: Optional[List[str]] = None,
+        start=None,
+        end=None,
+        layout: str = "long",
+    ) -> pd.DataFrame:
+        """Daily features of many players in one frame, gathered from the team store
+        in one operation. As for `get_variables_by_date`, `end` is exclusive.
+        Besides the daily features, the daily session aggregates
+        `session_features` can be queried.
+
+        layout="long": one row per player and day, one column per feature.
+        layout="wide": one row per day, one column per player and feature."""
+        store = self.get_store()
+        players = store.players if players is None else list(players)
+        days: Union[slice, np.ndarray] = slice(None)
+        if start is not None or end is not None:
+            days = date_positions(
+                store.index,
+                store.index[0] if start is None else start,
+                store.index[-1] + pd.Timedelta(days=1) if end is None else end,
+            )
+        dates = store.index[days]
+        block = self.feature_block(players, features, days)
+        if layout == "long":
+            return pd.DataFrame(
+                block.transpose(0, 2, 1).reshape(-1, len(features)),
+                index=pd.MultiIndex.from_product(
+                    [players, dates], names=["player", "date"]
+                ),
+                columns=features,
+                copy=False,
+            )
+        if layout == "wide":
+            return pd.DataFrame(
+                block.transpose(2, 0, 1).reshape(len(dates), -1),
+                index=dates,
+                columns=pd.MultiIndex.from_product(
+                    [players, features], names=["player", "feature"]
+                ),
+                copy=False,
+            )
+        raise ValueError(f"Unknown layout {layout}, use long or wide")
+
+    def lagged_correlations(
+        self,
+        sources: List[str],
+        targets: List[str],
+        max_lag: int = 14,
+        method: str = "pearson",
+        min_periods: int = 3,
+        workers: int = 1,
+    ) -> LaggedCorrelations:
+        """Correlations of the source features with the target features 0 ...
+        max_lag days later, for all players, see `lagged_correlations`. Daily
+        session aggregates can be used as well."""
+        store = self.get_store()
+        return lagged_correlations(
+            self.feature_block(store.players, sources),
+            self.feature_block(store.players, targets),
+            store.players,
+            sources,
+            targets,
+            max_lag,
+            method,
+            min_periods,
+            workers,
+        )
+
+    def event_series(self, variable_name: str) -> np.ndarray:
+        """Players x days array marking the days with an event of the players."""
+        store = self.get_store()
+        table = self.events[variable_name]
+        return (
+            event_matrix(
+                store.index,
+                store.players,
+                table.player_column(),
+                table.columns["timestamp"],
+            )
+            .reindex(store.index)
+            .to_numpy(dtype=np.float64)
+            .T
+        )
+
+    def windows(
+        self,
+        inputs: List[str],
+        targets: List[str],
+        lookback: int,
+        horizon: int = 1,
+        stride: int = 1,
+        max_missing: int = 0,
+    ) -> WindowDataset:
+        """Sliding windows over all players for forecasting models, see
+        `WindowDataset`. Besides the daily features, `injuries` and `illness` can
+        be used as binary event series."""
+        store = self.get_store()
+        sources = {}
+        for variable_name in inputs + targets:
+            if variable_name in store.feature_positions:
+                sources[variable_name] = store.feature_values(variable_name)
+            elif variable_name in self.events:
+                sources[variable_name] = self.event_series(variable_name)
+            else:
+                raise VarNotFound(variable_name)
+        return WindowDataset(
+            sources,
+            store.index,
+            store.players,
+            inputs,
+            targets,
+            lookback,
+            horizon,
+            stride,
+            max_missing,
+        )
+
+    def export(
+        self,
+        path_to_folder: Optional[Path] = None,
+        file_format: str = "csv",
+        tables: List[str] = export_tables,
+    ):
+        """Daily, session, injury, illness and performance tables of all players,
+        see `export_team`. With a folder given the tables are written to it."""
+        return export_team(self, path_to_folder, file_format, tables)
+
+
+def date_positions(index: pd.Index, from_date, until_date) -> Union[slice, np.ndarray]:
+    """Positions of the days from `from_date` up to, but not including,
+    `until_date`. The bounds do not have to be part of the index, strings are
+    read day first as day.month.year and by pandas otherwise, e.g. ISO dates,
+    see `to_timestamp`. Daily calendars give a slice computed from the distance
+    to the first day, other sorted date indexes are searched with a binary search
+    and give a slice, other indexes are parsed as day.month.year dates and give
+    a boolean mask."""
+    start, stop = to_timestamp(from_date), to_timestamp(until_date)
+    if stop < start:
+        raise DateNotInRange
+    if isinstance(index, pd.DatetimeIndex) and index.freq == "D" and len(index):
+        return DailyCalendar(index[0], len(index)).slice(start, stop)
+    if isinstance(index, pd.DatetimeIndex) and index.is_monotonic_increasing:
+        return slice(
+            index.searchsorted(start, side="left"),
+            index.searchsorted(stop, side="left"),
+        )
+    dates = pd.to_datetime(pd.Index(index), format="%d.%m.%Y", errors="coerce")
+    return np.asarray((dates >= start) & (dates < stop))
+
 
 def get_variable_by_date(
     player,
     variable_name: str,
     from_date: str = "01.01.2020",
     until_date: str = "31.12.2021",
-):
-
+) -> pd.Series:
     check_if_variable_callable(variable_name, player)
-    variable = player.__getattribute__(variable_name)
-    variable.name = variable_name
-    if (from_date not in variable.index) or (until_date not in variable.index):
-        raise DateNotInRange
-    return variable[
-        variable.index.get_loc(from_date) : variable.index.get_loc(until_date)
-    ]
+    variable = getattr(player, variable_name)
+    positions = date_positions(variable.index, from_date, until_date)
+    return pd.Series(
+        variable.array[positions],
+        index=variable.index[positions],
+        name=variable_name,
+        copy=False,
+    )
 
 
 def has_numbers(string):
@@ -249,76 +595,55 @@ def get_player_data(
 
 def clean_duration_of_sleep(sleep_duration_ts: pd.Series) -> pd.Series:
     """High numbers are potentially in minutes and not hours --> divide by 60 if higher than x"""
-    return sleep_duration_ts.apply(lambda x: x / 60 if x > 24 else x)
+    return sleep_duration_ts.mask(sleep_duration_ts > 24, sleep_duration_ts / 60)
+
+
+unit_rules: List = [UnitRule("sleep_duration", 24, 1 / 60)]
+performance_columns = {
+    "name": "Player",
+    "team_performance": "Team Overall Performance",
+    "offensive_performance": "Individual Offensive Performance",
+    "defensive_performance": "Individual Defensive Performance",
+    "timestamp": "Date",
+}
+injury_columns = {"player": "Player", "type": "Injuries", "timestamp": "Date"}
+illness_columns = {"player": "Player", "problems": "Problems", "timestamp": "Date"}
 
 
 def get_player_game_performance(
     player_performance: pd.DataFrame, player_name: str
 ) -> Union[List, List[Performance]]:
-    players = set(player_performance["Player"])
-    if player_name in players:
-        players_perf = []
-        for _, performance in player_performance.loc[
-            player_performance["Player"] == player_name
-        ].iterrows():
-            players_perf.append(
-                Performance(
-                    player_name,
-                    performance["Team Overall Performance"],
-                    performance["Individual Offensive Performance"],
-                    performance["Individual Defensive Performance"],
-                    performance["Date"],
-                )
-            )
-        return players_perf
-    return []
+    table = EventTable.from_frame(
+        player_performance, [player_name], Performance, performance_columns
+    )
+    return list(table[player_name])
 
 
 def get_player_injuries(
     player_injuries: pd.DataFrame, player_name: str
 ) -> Union[List, List[Injury]]:
-    injured_players = set(player_injuries["Player"])
-    if player_name in injured_players:
-        players_injuries = []
-        for _, injury in player_injuries.loc[
-            player_injuries["Player"] == player_name
-        ].iterrows():
-            players_injuries.append(
-                Injury(player_name, injury["Injuries"], injury["Date"])
-            )
-        return players_injuries
-    return []
+    table = EventTable.from_frame(
+        player_injuries, [player_name], Injury, injury_columns
+    )
+    return list(table[player_name])
 
 
 def get_player_illness(
     player_illness: pd.DataFrame, player_name: str
 ) -> Union[List, List[Injury]]:
-    injured_players = set(player_illness["Player"])
-    if player_name in injured_players:
-        players_illness = []
-        for _, injury in player_illness.loc[
-            player_illness["Player"] == player_name
-        ].iterrows():
-            players_illness.append(
-                Illness(player_name, injury["Problems"], injury["Date"])
-            )
-        return players_illness
-    return []
+    table = EventTable.from_frame(
+        player_illness, [player_name], Illness, illness_columns
+    )
+    return list(table[player_name])
 
 
 def create_game_ts(time_index: pd.Index, game_performance: pd.DataFrame):
-    binary_game_timeseries = {
-        time: (
-            0
-            if time not in game_performance["Date"].tolist()
-            else game_performance.loc[game_performance["Date"] == time][
-                "Team Overall Performance"
-            ].iat[0]
-        )
-        for time in time_index.tolist()
-    }
-    return pd.Series(
-        binary_game_timeseries.values(), index=binary_game_timeseries.keys()
+    """Overall team performance on game days, 0 on all other days."""
+    return event_series(
+        time_index,
+        game_performance["Date"],
+        game_performance["Team Overall Performance"].to_numpy(),
+        how="first",
     )
 
 
@@ -326,13 +651,105 @@ def create_ts_of_injures(time_index: pd.Index, injuries: List[Injury]):
     """Extract the times when injuries occurred. For now only the time stamps are extracted and
     an injury is binary event. However, there are more information stored and can be extracted, like
     how many, injuries, what is injured and severity."""
-    injury_timestamps = [injury.timestamp for injury in injuries]
-    binary_injury_timeseries = {
-        time: (0 if time not in injury_timestamps else 1)
-        for time in time_index.tolist()
+    return event_series(
+        time_index, [injury.timestamp for injury in injuries], how="binary"
+    )
+
+
+def get_valid_player_names(wellness_sheets: Dict[str, pd.DataFrame]) -> List[str]:
+    return [
+        name
+        for name in list(get_player_names(wellness_sheets))
+        if not has_numbers(name)
+    ]
+
+
+def initialise_event_tables(
+    wellness_sheets: Dict[str, pd.DataFrame], names: List[str]
+) -> Dict[str, EventTable]:
+    return {
+        "injuries": EventTable.from_frame(
+            wellness_sheets["Injury"], names, Injury, injury_columns
+        ),
+        "illness": EventTable.from_frame(
+            wellness_sheets["Illness"], names, Illness, illness_columns
+        ),
+        "performance": EventTable.from_frame(
+            wellness_sheets["Game Performance"],
+            names,
+            Performance,
+            performance_columns,
+        ),
     }
-    return pd.Series(
-        binary_injury_timeseries.values(), index=binary_injury_timeseries.keys()
+
+
+def workbook_store(
+    wellness_sheets: Dict[str, pd.DataFrame],
+    player_records: Dict[str, Dict[str, pd.Series]],
+    names: List[str],
+    pseudonyms: List[str],
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+) -> TeamStore:
+    """Team store of the wellness sheets and the daily records of the players, on
+    one daily calendar from the first to the last date of all of them. Days
+    reported more than once are merged by the duplicate policies. The players of
+    the store are named by their pseudonyms."""
+    calendar = DailyCalendar.from_dates(
+        *[
+            wellness_sheets[sheet_name][f"{sheet_name} Data"]
+            for sheet_name in wellness_features
+        ],
+        *[player_records[name]["Daily Load"].index for name in names],
+    )
+    feature_positions = {
+        feature: position for position, feature in enumerate(daily_features)
+    }
+    values = np.full((len(names), len(daily_features), calendar.days), np.nan)
+    for sheet_name, feature in wellness_features.items():
+        sheet = wellness_sheets[sheet_name]
+        values[:, feature_positions[feature]] = resolve(
+            sheet[names].to_numpy(dtype=np.float64).T,
+            calendar.positions(sheet[f"{sheet_name} Data"]),
+            calendar.days,
+            duplicate_policy(feature, policies),
+        )
+    for player, name in enumerate(names):
+        records = player_records[name]
+        positions = calendar.positions(records["Daily Load"].index)
+        for column, feature in record_features.items():
+            values[player, feature_positions[feature]] = resolve(
+                records[column].to_numpy(dtype=np.float64),
+                positions,
+                calendar.days,
+                duplicate_policy(feature, policies),
+            )
+    return TeamStore.from_arrays(pseudonyms, daily_features, calendar.index, values)
+
+
+def validate_workbook_store(
+    store: TeamStore, rules: Optional[List] = default_rules
+) -> Tuple[TeamStore, Optional[ValidationReport]]:
+    """Workbook store validated and cleaned by `validate_store`. With rules=None
+    only sleep reported in minutes is converted to hours and there is no
+    report."""
+    if rules is None:
+        return validate_store(store, unit_rules)[0], None
+    return validate_store(store, rules)
+
+
+def workbook_sessions(
+    player_records: Dict[str, Dict[str, pd.Series]],
+    names: List[str],
+    pseudonyms: List[str],
+) -> SessionTable:
+    """Session table of the record sheets, the players are named by their
+    pseudonyms."""
+    return SessionTable.from_series(
+        pseudonyms,
+        {
+            variable: [player_records[name][column] for name in names]
+            for variable, column in session_columns.items()
+        },
     )
 
 
@@ -340,64 +757,141 @@ def initialise_players(
     wellness_sheets: Dict[str, pd.DataFrame],
     player_records: Dict[str, Dict[str, pd.Series]],
     name_mapping: Dict[str, str],
+    events: Optional[Dict[str, EventTable]] = None,
+    rules: Optional[List] = default_rules,
+    store: Optional[Union[TeamStore, CompactStore]] = None,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    sessions: Optional[SessionTable] = None,
 ) -> Dict[str, SoccerPlayer]:
-    names = [
-        name
-        for name in list(get_player_names(wellness_sheets))
-        if not has_numbers(name)
-    ]
-    players_injuries = wellness_sheets["Injury"]
-    players_illness = wellness_sheets["Illness"]
-    players_performance = wellness_sheets["Game Performance"]
+    """The daily features of the players are views into the team store, without a
+    store it is built by `workbook_store` and validated by
+    `validate_workbook_store`. Their sessions are views into the session table,
+    built by `workbook_sessions` if not given."""
+    names = get_valid_player_names(wellness_sheets)
+    if events is None:
+        events = initialise_event_tables(wellness_sheets, names)
     del wellness_sheets["Injury"]
     del wellness_sheets["Illness"]
     del wellness_sheets["Game Performance"]
     inv_map = {v: k for k, v in name_mapping.items()}
-    players = {}
-    for name in names:
-        values = get_player_data(wellness_sheets, name)
-        records = player_records[name]
-        injuries = get_player_injuries(players_injuries, name)
-        performance = get_player_game_performance(players_performance, name)
-        illness = get_player_illness(players_illness, name)
-        injury_ts = create_ts_of_injures(values["Fatigue"].index, injuries)
-        sleep_duration = clean_duration_of_sleep(values["SleepDurH"],)
-        date_index = values["Stress"].index
-        date_index.name = "Date"
-        players[inv_map[name]] = SoccerPlayer(
-            inv_map[name],
-            records["Daily Load"],
-            records["SRPE"],
-            records["RPE"],
-            records["Duration [min]"],
-            records["ATL"],
-            records["Weekly Load"],
-            records["Monotony"],
-            records["Strain"],
-            records["Acwr"],
-            records["Ctl28"],
-            records["Ctl42"],
-            values["Fatigue"],
-            values["Mood"],
-            values["Readiness"],
-            sleep_duration,
-            values["SleepQuality"],
-            values["Soreness"],
-            values["Stress"],
-            injuries,
-            injury_ts,
-            illness,
-            performance,
+    if store is None:
+        store = workbook_store(
+            wellness_sheets,
+            player_records,
+            names,
+            [inv_map[name] for name in names],
+            policies,
+        )
+        store, _ = validate_workbook_store(store, rules)
+    if sessions is None:
+        sessions = workbook_sessions(
+            player_records, names, [inv_map[name] for name in names]
+        )
+    return {
+        inv_map[name]: workbook_player(inv_map[name], name, store, sessions, events)
+        for name in names
+    }
+
+
+def workbook_player(
+    pseudonym: str,
+    name: str,
+    store: Union[TeamStore, CompactStore],
+    sessions: SessionTable,
+    events: Dict[str, EventTable],
+) -> SoccerPlayer:
+    """Player named by its pseudonym, the events are looked up by its name."""
+    return SoccerPlayer(
+        pseudonym,
+        store.series(pseudonym, "daily_load"),
+        sessions.series(pseudonym, "srpe"),
+        sessions.series(pseudonym, "rpe"),
+        sessions.series(pseudonym, "duration"),
+        store.series(pseudonym, "atl"),
+        store.series(pseudonym, "weekly_load"),
+        store.series(pseudonym, "monotony"),
+        store.series(pseudonym, "strain"),
+        store.series(pseudonym, "acwr"),
+        store.series(pseudonym, "ctl28"),
+        store.series(pseudonym, "ctl42"),
+        store.series(pseudonym, "fatigue"),
+        store.series(pseudonym, "mood"),
+        store.series(pseudonym, "readiness"),
+        store.series(pseudonym, "sleep_duration"),
+        store.series(pseudonym, "sleep_quality"),
+        store.series(pseudonym, "soreness"),
+        store.series(pseudonym, "stress"),
+        events["injuries"][name],
+        events["illness"][name],
+        events["performance"][name],
+    )
+
+
+def workbook_players(
+    store: Union[TeamStore, CompactStore],
+    sessions: SessionTable,
+    events: Dict[str, EventTable],
+    name_mapping: Dict[str, str],
+) -> Dict[str, SoccerPlayer]:
+    return {
+        pseudonym: workbook_player(
+            pseudonym, name_mapping[pseudonym], store, sessions, events
         )
-    return players
+        for pseudonym in store.players
+    }
 
 
-def load_in_workbooks(path_to_file: List[Path]) -> Dict[str, pd.DataFrame]:
+def read_workbook(workbook_file) -> Dict[str, pd.DataFrame]:
+    """Read the wellness sheets and the record sheets of the players listed in the
+    Fatigue sheet. Of the record sheets only the record columns are parsed, all
+    other sheets are skipped."""
     with warnings.catch_warnings(record=True):
         warnings.simplefilter("always")
-        workbooks = []
-        for path in path_to_file:
-            workbooks.append(pd.read_excel(path, sheet_name=None, engine="openpyxl"))
+        with pd.ExcelFile(workbook_file, engine="openpyxl") as excel_file:
+            workbook = {
+                sheet_name: excel_file.parse(sheet_name)
+                for sheet_name in excel_file.sheet_names
+                if sheet_name in wellness_sheets_names
+            }
+            player_names = (
+                set(workbook["Fatigue"].columns[1:])
+                if "Fatigue" in workbook
+                else set(excel_file.sheet_names)
+            )
+            for sheet_name in excel_file.sheet_names:
+                if sheet_name in player_names and sheet_name not in workbook:
+                    workbook[sheet_name] = excel_file.parse(
+                        sheet_name, usecols=lambda column: column in record_columns
+                    )
+    return workbook
+
+
+def parse_workbook(file_name: str, content: bytes) -> Dict[str, pd.DataFrame]:
+    return read_workbook(io.BytesIO(content))
+
+
+def read_workbooks(
+    paths: List[Path], workers: int = 1
+) -> List[Dict[str, pd.DataFrame]]:
+    if workers == 1:
+        return [read_workbook(path) for path in paths]
+    return load_in_parallel(paths, parse_workbook, workers)
+
+
+def load_in_workbooks(
+    path_to_file: List[Path], cache_dir: Optional[Path] = None, workers: int = 1
+) -> Dict[str, pd.DataFrame]:
+    """With a cache folder given, the parsed sheets of every workbook are cached by
+    the hash of the workbook and Excel parsing is skipped for unchanged workbooks.
+    With more than one worker, workbooks are parsed in parallel processes."""
+    if cache_dir is not None:
+        cache = IngestCache(cache_dir)
+        workbooks = cache.load_many(
+            list(path_to_file), lambda changed: read_workbooks(changed, workers)
+        )
+        cache.save()
+    else:
+        workbooks = read_workbooks(list(path_to_file), workers)
     merged_dictionaries = defaultdict(list)
 
     for workbook in workbooks:
@@ -430,7 +924,7 @@ def clean_workbooks(
         filled_dates = sheet["Date"].ffill()
         dates = sheet["Date"].dropna()
         player_records = {}
-        for col_name, column in sheet.iteritems():
+        for col_name, column in sheet.items():
             if col_name in non_continuous_signals:
                 signal = pd.Series(column)
                 signal.index = filled_dates
@@ -445,26 +939,266 @@ def clean_workbooks(
 
 
 def generate_team_data(
-    team_name, name_mapping: Dict[str, str], path_to_data: List[Path]
+    team_name,
+    name_mapping: Dict[str, str],
+    path_to_data: List[Path],
+    cache_dir: Optional[Path] = None,
+    workers: int = 1,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    compact: bool = False,
 ) -> Team:
-    raw_workbook = load_in_workbooks(path_to_data)
+    with profiler.stage("load_in_workbooks", team_name) as stage:
+        raw_workbook = load_in_workbooks(path_to_data, cache_dir, workers)
+        stage.rows = sum(len(sheet) for sheet in raw_workbook.values())
     game_performance = raw_workbook["Game Performance"]
-    recorded_signals, workbook = clean_workbooks(raw_workbook)
-    players = initialise_players(workbook, recorded_signals, name_mapping)
+    with profiler.stage("clean_workbooks", team_name) as stage:
+        recorded_signals, workbook = clean_workbooks(raw_workbook)
+        stage.rows = len(recorded_signals)
+    with profiler.stage("initialise_event_tables", team_name) as stage:
+        events = initialise_event_tables(workbook, get_valid_player_names(workbook))
+        stage.rows = sum(table.size for table in events.values())
+    names = get_valid_player_names(workbook)
+    inv_map = {v: k for k, v in name_mapping.items()}
+    pseudonyms = [inv_map[name] for name in names]
+    with profiler.stage("team_store", team_name) as stage:
+        store = workbook_store(workbook, recorded_signals, names, pseudonyms, policies)
+        stage.rows = len(store.index)
+    with profiler.stage("validate_store", team_name) as stage:
+        store, validation = validate_workbook_store(store, rules)
+        stage.rows = 0 if validation is None else validation.total
+    with profiler.stage("session_table", team_name) as stage:
+        sessions = workbook_sessions(recorded_signals, names, pseudonyms)
+        stage.rows = len(sessions)
+    if compact:
+        with profiler.stage("compact_store", team_name) as stage:
+            store = CompactStore.from_store(store)
+            stage.rows = len(store.index)
+    with profiler.stage("initialise_players", team_name) as stage:
+        players = initialise_players(
+            workbook,
+            recorded_signals,
+            name_mapping,
+            events,
+            None,
+            store,
+            sessions=sessions,
+        )
+        stage.rows = len(players)
     # players = initialise_players(
     #    {k: v for k, v in workbook.items() if k != "Game Performance"}, recorded_signals
     # )
 
-    games_ts = create_game_ts(list(players.values())[0].stress.index, game_performance)
-    return Team(team_name, game_performance, games_ts, players)
+    with profiler.stage("create_game_ts", team_name) as stage:
+        games_ts = create_game_ts(store.index, game_performance)
+        stage.rows = len(games_ts)
+    return Team(
+        team_name,
+        game_performance,
+        games_ts,
+        players,
+        store,
+        events,
+        validation,
+        sessions,
+    )
 
 
 def generate_teams(
-    path_to_teams_files: List[List[Path]], team_names: List[Dict[str, str]]
+    path_to_teams_files: List[List[Path]],
+    team_names: List[Dict[str, str]],
+    cache_dir: Optional[Path] = None,
+    workers: int = 1,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    compact: bool = False,
+) -> Dict[str, Team]:
+    """With more than one worker and several teams, every team is built in its
+    own worker process. A single team uses the workers to parse its workbooks.
+    All players of a team share one gap-free daily calendar, days reported more
+    than once are merged by the duplicate `policies` (feature to policy, "first"
+    for other features). With compact=True the daily features are kept in a
+    `CompactStore`, with int8 wellness scores and float32 loads, and their memory
+    is logged, see `log_memory_report`. With rules=None the workbooks are not
+    validated."""
+    with profiler.stage("generate_teams") as stage:
+        teams = generate_teams_data(
+            path_to_teams_files,
+            team_names,
+            cache_dir,
+            workers,
+            rules,
+            policies,
+            compact,
+        )
+        stage.rows = len(teams)
+    if compact:
+        log_memory_report({name: team.get_store() for name, team in teams.items()})
+    return teams
+
+
+def generate_team_parts(
+    team_name,
+    name_mapping: Dict[str, str],
+    path_to_data: List[Path],
+    cache_dir: Optional[Path] = None,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    compact: bool = False,
+) -> Team:
+    """Worker part of `generate_teams_data`: the team without its players. The
+    players are views into the store and the session table, pickled they would
+    be sent as copies of every series. The arrays of the store and the session
+    table are left in shared memory, see `share_arrays`."""
+    team = generate_team_data(
+        team_name, name_mapping, path_to_data, cache_dir, 1, rules, policies, compact
+    )
+    return replace(
+        team,
+        players={},
+        store=share_arrays(team.store),
+        sessions=share_arrays(team.sessions),
+    )
+
+
+def generate_teams_data(
+    path_to_teams_files: List[List[Path]],
+    team_names: List[Dict[str, str]],
+    cache_dir: Optional[Path] = None,
+    workers: int = 1,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    compact: bool = False,
 ) -> Dict[str, Team]:
+    """With more than one worker, the teams are built in worker processes and
+    sent back without their players, the arrays of their stores and session
+    tables in shared memory. The players are created again as views into the
+    received arrays."""
+    if workers > 1 and len(team_names) > 1:
+        with worker_pool(min(workers, len(team_names))) as pool:
+            futures = {
+                team["pseudonym"]: pool.submit(
+                    generate_team_parts,
+                    team["team_name"],
+                    team["players"],
+                    path_to_team,
+                    cache_dir,
+                    rules,
+                    policies,
+                    compact,
+                )
+                for team, path_to_team in zip(team_names, path_to_teams_files)
+            }
+            built = {}
+            for team, future in zip(team_names, futures.values()):
+                parts = future.result()
+                store = attach_arrays(parts.store)
+                sessions = attach_arrays(parts.sessions)
+                built[team["pseudonym"]] = replace(
+                    parts,
+                    players=workbook_players(
+                        store, sessions, parts.events, team["players"]
+                    ),
+                    store=store,
+                    sessions=sessions,
+                )
+            return built
     return {
         team["pseudonym"]: generate_team_data(
-            team["team_name"], team["players"], path_to_team
+            team["team_name"],
+            team["players"],
+            path_to_team,
+            cache_dir,
+            workers,
+            rules,
+            policies,
+            compact,
+        )
+        for team, path_to_team in zip(team_names, path_to_teams_files)
+    }
+
+
+def workbook_update(
+    team: Team,
+    name_mapping: Dict[str, str],
+    path_to_data: List[Path],
+    cache_dir: Optional[Path] = None,
+    workers: int = 1,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+) -> TeamUpdate:
+    """Update of the team by workbooks that hold only the rows of the new days.
+    Only these rows are read and mapped onto the days following the last day of
+    the team, see `team_update`, and only their store is validated."""
+    with profiler.stage("load_in_workbooks", team.name) as stage:
+        raw_workbook = load_in_workbooks(path_to_data, cache_dir, workers)
+        stage.rows = sum(len(sheet) for sheet in raw_workbook.values())
+    game_performance = raw_workbook["Game Performance"]
+    recorded_signals, workbook = clean_workbooks(raw_workbook)
+    names = get_valid_player_names(workbook)
+    events = initialise_event_tables(workbook, names)
+    inv_map = {v: k for k, v in name_mapping.items()}
+    pseudonyms = [inv_map[name] for name in names]
+    with profiler.stage("team_store", team.name) as stage:
+        store = workbook_store(workbook, recorded_signals, names, pseudonyms, policies)
+        stage.rows = len(store.index)
+    with profiler.stage("validate_store", team.name) as stage:
+        store, validation = validate_workbook_store(store, rules)
+        stage.rows = 0 if validation is None else validation.total
+    return team_update(
+        team,
+        store,
+        workbook_sessions(recorded_signals, names, pseudonyms),
+        events,
+        game_performance,
+        partial(create_game_ts, game_performance=game_performance),
+        game_performance["Date"],
+        validation,
+    )
+
+
+def team_updates(
+    teams: Mapping[str, Team],
+    path_to_teams_files: List[List[Path]],
+    team_names: List[Dict[str, str]],
+    cache_dir: Optional[Path] = None,
+    workers: int = 1,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+) -> Dict[str, TeamUpdate]:
+    """Updates of the teams by their new workbooks, given as for
+    `generate_teams`."""
+    return {
+        team["pseudonym"]: workbook_update(
+            teams[team["pseudonym"]],
+            team["players"],
+            path_to_team,
+            cache_dir,
+            workers,
+            rules,
+            policies,
         )
         for team, path_to_team in zip(team_names, path_to_teams_files)
     }
+
+
+def append_teams(
+    teams: Mapping[str, Team],
+    updates: Dict[str, TeamUpdate],
+    team_names: List[Dict[str, str]],
+) -> Dict[str, Team]:
+    """Teams extended by their updates, see `extend_team`. Teams without an
+    update are kept as they are."""
+    name_mappings = {team["pseudonym"]: team["players"] for team in team_names}
+    return {
+        pseudonym: (
+            extend_team(
+                team,
+                updates[pseudonym],
+                partial(workbook_players, name_mapping=name_mappings[pseudonym]),
+            )
+            if pseudonym in updates
+            else team
+        )
+        for pseudonym, team in teams.items()
+    }
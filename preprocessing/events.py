@@ -0,0 +1,315 @@
+"""Turn event lists (games, injuries, illness) into daily time series.
+
+Events are joined onto the calendar once: sorted calendars are searched with
+`searchsorted`, others with a hash lookup. The series for all players are then
+accumulated in one `bincount` pass."""
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+aggregations = ["binary", "count", "sum", "first"]
+
+
+class UnknownAggregation(Exception):
+    def __init__(self, value):
+        message = f"Events cannot be aggregated by {value}, use one of {aggregations}"
+        super().__init__(message)
+
+
+def unique_calendar(time_index) -> pd.Index:
+    return pd.Index(time_index).unique()
+
+
+def parse_days(timestamps) -> pd.DatetimeIndex:
+    """Days of the timestamps. Strings in the day.month.year format of the
+    workbooks are read as such, all other timestamps are parsed by pandas."""
+    timestamps = pd.Series(timestamps, dtype=object)
+    days = pd.to_datetime(timestamps, format="%d.%m.%Y", errors="coerce")
+    other = days.isna() & timestamps.notna()
+    if other.any():
+        days[other] = pd.to_datetime(timestamps[other], format="mixed", errors="coerce")
+    return pd.DatetimeIndex(days).floor("D")
+
+
+def event_positions(calendar: pd.Index, timestamps) -> np.ndarray:
+    """Position of the day of every event in the calendar, -1 if the day is not
+    part of the calendar. Datetime calendars match events by day, other calendars
+    by equality."""
+    if isinstance(calendar, pd.DatetimeIndex):
+        timestamps = parse_days(timestamps)
+    else:
+        timestamps = pd.Index(timestamps, dtype=object)
+    if len(timestamps) == 0:
+        return np.empty(0, dtype=np.int64)
+    if calendar.is_monotonic_increasing and isinstance(calendar, pd.DatetimeIndex):
+        positions = calendar.searchsorted(timestamps)
+        found = positions < len(calendar)
+        found[found] = calendar[positions[found]] == timestamps[found]
+        return np.where(found, positions, -1).astype(np.int64)
+    return calendar.get_indexer(timestamps).astype(np.int64)
+
+
+def accumulate(
+    positions: np.ndarray,
+    size: int,
+    values: Optional[np.ndarray] = None,
+    how: str = "binary",
+) -> np.ndarray:
+    """Aggregate events per position into an array of length `size`. Negative
+    positions are dropped."""
+    if how not in aggregations:
+        raise UnknownAggregation(how)
+    keep = positions >= 0
+    positions = positions[keep]
+    if values is not None:
+        values = np.asarray(values)[keep]
+    if how == "binary":
+        result = np.zeros(size, dtype=np.int64)
+        result[positions] = 1
+        return result
+    if how == "count":
+        return np.bincount(positions, minlength=size).astype(np.int64)
+    if values is None:
+        raise ValueError(f"Aggregation {how} needs event values")
+    if how == "sum":
+        return np.bincount(positions, weights=values, minlength=size)
+    result = np.zeros(size, dtype=values.dtype)
+    _, first = np.unique(positions, return_index=True)
+    result[positions[first]] = values[first]
+    return result
+
+
+def event_series(time_index, timestamps, values=None, how: str = "binary") -> pd.Series:
+    """Daily series of the events on the (deduplicated) time index."""
+    calendar = unique_calendar(time_index)
+    positions = event_positions(calendar, timestamps)
+    return pd.Series(accumulate(positions, len(calendar), values, how), index=calendar)
+
+
+def event_matrix(
+    time_index,
+    players: List[str],
+    event_players,
+    timestamps,
+    values=None,
+    how: str = "binary",
+) -> pd.DataFrame:
+    """Days x players frame of the events of all players, built in one pass."""
+    calendar = unique_calendar(time_index)
+    days = event_positions(calendar, timestamps)
+    player_positions = pd.Index(players).get_indexer(pd.Index(event_players))
+    flat = np.where(
+        (days >= 0) & (player_positions >= 0),
+        days * len(players) + player_positions,
+        -1,
+    )
+    return pd.DataFrame(
+        accumulate(flat, len(calendar) * len(players), values, how).reshape(
+            len(calendar), len(players)
+        ),
+        index=calendar,
+        columns=players,
+    )
+
+
+def group_rows(offsets: np.ndarray, positions) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows of the groups at `positions` of a table grouped by `offsets`, group
+    after group, and the number of rows of each group. Negative positions stand
+    for groups without rows."""
+    positions = np.asarray(positions, dtype=np.int64)
+    found = positions >= 0
+    starts = np.where(found, offsets[:-1][positions], 0)
+    counts = np.where(found, np.diff(offsets)[positions], 0).astype(np.int64)
+    rows = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(
+        counts.sum()
+    )
+    return rows, counts
+
+
+def appended_rows(offsets: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Order of the rows of a table grouped by `offsets` followed by `counts[i]`
+    new rows of every group i, which puts the new rows of a group after its
+    rows. The result indexes the concatenation of the old and the new rows."""
+    size = int(offsets[-1])
+    return np.insert(
+        np.arange(size),
+        np.repeat(offsets[1:], counts),
+        size + np.arange(counts.sum()),
+    )
+
+
+def categorical(column):
+    """Object columns are stored as categoricals if their values are hashable."""
+    if isinstance(column, pd.Categorical) or column.dtype != object:
+        return column
+    try:
+        return pd.Categorical(column)
+    except TypeError:
+        return column
+
+
+def concatenate_columns(first, second) -> np.ndarray:
+    if isinstance(first, pd.Categorical) or isinstance(second, pd.Categorical):
+        first, second = np.asarray(first, dtype=object), np.asarray(
+            second, dtype=object
+        )
+    return np.concatenate([np.asarray(first), np.asarray(second)])
+
+
+class EventList(Sequence):
+    """Events of one player, a view into the rows `start:stop` of an event table.
+    The event objects are only created when they are accessed."""
+
+    def __init__(self, table: "EventTable", start: int, stop: int):
+        self.table = table
+        self.start = start
+        self.stop = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [
+                self.table.event(self.start + row) for row in range(len(self))[position]
+            ]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return self.table.event(self.start + position)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+@dataclass(frozen=True, eq=False)
+class EventTable(Mapping):
+    """Events of a team stored column wise and grouped by player. The rows of
+    player i are `offsets[i]:offsets[i + 1]`. Looking up a player gives the view
+    of its events."""
+
+    event_type: type
+    players: List[str]
+    offsets: np.ndarray
+    columns: Dict[str, Any]
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.event_type.__annotations__.keys())
+
+    @property
+    def size(self) -> int:
+        return int(self.offsets[-1])
+
+    @cached_property
+    def player_positions(self) -> Dict[str, int]:
+        return {player: position for position, player in enumerate(self.players)}
+
+    def __getitem__(self, player_name: str) -> EventList:
+        position = self.player_positions[player_name]
+        return EventList(
+            self, int(self.offsets[position]), int(self.offsets[position + 1])
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.players)
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def player_column(self) -> np.ndarray:
+        return np.repeat(np.array(self.players, dtype=object), np.diff(self.offsets))
+
+    def event(self, row: int):
+        player = self.players[int(np.searchsorted(self.offsets, row, side="right")) - 1]
+        return self.event_type(
+            player, *[self.columns[field][row] for field in self.fields[1:]]
+        )
+
+    def select(self, players: List[str]) -> "EventTable":
+        """Table holding only the events of the given players."""
+        rows, counts = group_rows(
+            self.offsets, [self.player_positions[player] for player in players]
+        )
+        return EventTable(
+            self.event_type,
+            list(players),
+            np.concatenate([[0], np.cumsum(counts)]),
+            {field: column[rows] for field, column in self.columns.items()},
+        )
+
+    def append(self, other: "EventTable") -> "EventTable":
+        """Table with the events of `other` added after the events of the same
+        player. Players only found in `other` are appended to the players."""
+        known = self.player_positions
+        players = self.players + [
+            player for player in other.players if player not in known
+        ]
+        offsets = np.concatenate(
+            [self.offsets, np.full(len(players) - len(self.players), self.size)]
+        )
+        new_rows, counts = group_rows(
+            other.offsets, pd.Index(other.players).get_indexer(players)
+        )
+        rows = appended_rows(offsets, counts)
+        return EventTable(
+            self.event_type,
+            players,
+            offsets + np.concatenate([[0], np.cumsum(counts)]),
+            {
+                field: categorical(
+                    concatenate_columns(column, other.columns[field][new_rows])[rows]
+                )
+                for field, column in self.columns.items()
+            },
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                self.fields[0]: self.player_column(),
+                **{field: np.asarray(column) for field, column in self.columns.items()},
+            }
+        )
+
+    @classmethod
+    def from_frame(
+        cls,
+        frame: pd.DataFrame,
+        players: List[str],
+        event_type: type,
+        columns: Optional[Dict[str, str]] = None,
+    ) -> "EventTable":
+        """`columns` maps the fields of the event type to the columns of the frame,
+        the first field holds the player. Players of the frame that are not listed
+        in `players` are appended to them."""
+        fields = list(event_type.__annotations__.keys())
+        columns = {field: field for field in fields} if columns is None else columns
+        event_players = frame[columns[fields[0]]]
+        players = list(players)
+        known = set(players)
+        players += [
+            player for player in pd.unique(event_players) if player not in known
+        ]
+        codes = pd.Index(players).get_indexer(event_players)
+        order = np.argsort(codes, kind="stable")
+        data = {}
+        for field in fields[1:]:
+            data[field] = categorical(frame[columns[field]].to_numpy()[order])
+        return cls(
+            event_type,
+            players,
+            np.searchsorted(codes[order], np.arange(len(players) + 1)),
+            data,
+        )
@@ -0,0 +1,241 @@
+"""Export the data of a whole team as flat tables.
+
+The tables are built for all players at once: the daily table is reshaped from
+the team store, the session and event tables are gathered from the arrays of the
+players. Players are identified by the key under which the team holds them (the
+pseudonym) in a categorical `player_name` column. With a folder given, the
+tables are written to CSV or Parquet files as they are built, the daily table in
+chunks of players, so the full tables never have to be held in memory."""
+
+from dataclasses import astuple
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.events import EventList
+from preprocessing.sessions import session_variables
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except ImportError:
+    pa = None
+    pq = None
+
+export_tables = ["daily", "sessions", "injuries", "illness", "performance"]
+export_formats = ["csv", "parquet"]
+daily_columns = {
+    "daily_load": "daily_load",
+    "atl": "atl",
+    "weekly_load": "weekly_load",
+    "monotony": "monotony",
+    "strain": "strain",
+    "acwr": "acwr",
+    "ctl28": "ctl28",
+    "ctl42": "ctl42",
+    "fatigue": "fatigue",
+    "mood": "mood",
+    "readiness": "readiness",
+    "sleep_duration": "sleep-duration",
+    "sleep_quality": "sleep-quality",
+    "soreness": "soreness",
+    "stress": "stress",
+}
+event_columns = {
+    "injuries": ["player_name", "type", "timestamp"],
+    "illness": ["player_name", "problems", "timestamp"],
+    "performance": [
+        "player_name",
+        "team_performance",
+        "offensive_performance",
+        "defensive_performance",
+        "timestamp",
+    ],
+}
+
+
+class UnknownExportFormat(Exception):
+    def __init__(self, value):
+        message = f"Cannot export to {value}, use one of {export_formats}"
+        super().__init__(message)
+
+
+def player_column(pseudonyms: List[str], counts) -> pd.Categorical:
+    """Categorical column repeating every pseudonym by its count."""
+    codes = np.repeat(np.arange(len(pseudonyms)), counts)
+    return pd.Categorical.from_codes(codes, categories=pseudonyms)
+
+
+def daily_chunks(
+    team, players_per_chunk: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """Daily table, one row per player and day, in chunks of players. Teams without
+    a store are exported player by player."""
+    pseudonyms = list(team.players)
+    if team.store is None:
+        yield daily_table_of_players(team)
+        return
+    store = team.store
+    positions = np.array(
+        [store.player_position(player.name) for player in team.players.values()],
+        dtype=np.int64,
+    )
+    injury_ts = None
+    if "injuries" in team.events:
+        injury_ts = team.event_series("injuries")
+    chunk = players_per_chunk or max(len(positions), 1)
+    days = len(store.index)
+    for start in range(0, len(positions), chunk):
+        selected = positions[start : start + chunk]
+        columns = {
+            "player_name": pd.Categorical.from_codes(
+                np.repeat(np.arange(start, start + len(selected)), days),
+                categories=pseudonyms,
+            ),
+            "date": np.tile(store.index.to_numpy(), len(selected)),
+        }
+        for feature, column in daily_columns.items():
+            columns[column] = store.feature_values(feature)[selected].reshape(-1)
+        if injury_ts is not None:
+            columns["injury_ts"] = injury_ts[selected].reshape(-1)
+        yield pd.DataFrame(columns, copy=False)
+
+
+def daily_table_of_players(team) -> pd.DataFrame:
+    frames = [
+        player.to_dataframe(pseudonym).rename_axis("date").reset_index()
+        for pseudonym, player in team.players.items()
+    ]
+    table = pd.concat(frames, ignore_index=True)
+    table["player_name"] = pd.Categorical(
+        table["player_name"], categories=list(team.players)
+    )
+    return table[["player_name", "date", *daily_columns.values(), "injury_ts"]]
+
+
+def daily_table(team) -> pd.DataFrame:
+    chunks = list(daily_chunks(team))
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+
+def session_table(team) -> pd.DataFrame:
+    """One row per training session. Sessions given as series keep their dates.
+    Teams with a session table are exported from its arrays."""
+    if team.sessions is not None:
+        table = team.sessions.to_frame()
+        table["player_name"] = table["player_name"].cat.set_categories(
+            list(team.players)
+        )
+        return table
+    players = list(team.players.values())
+    variables = {
+        variable: [getattr(player, variable) for player in players]
+        for variable in session_variables
+    }
+    counts = [len(sessions) for sessions in variables["srpe"]]
+    columns = {"player_name": player_column(list(team.players), counts)}
+    if all(isinstance(sessions, pd.Series) for sessions in variables["srpe"]):
+        columns["date"] = np.concatenate(
+            [np.asarray(sessions.index) for sessions in variables["srpe"]]
+            or [np.empty(0)]
+        )
+    for variable, sessions in variables.items():
+        columns[variable] = np.concatenate(
+            [np.asarray(values, dtype=np.float64) for values in sessions]
+            or [np.empty(0)]
+        )
+    return pd.DataFrame(columns, copy=False)
+
+
+def event_table(team, variable: str) -> pd.DataFrame:
+    """All events of one kind. Events held in an event table are gathered from its
+    columns in one indexing operation, other events are converted one by one."""
+    columns = event_columns[variable]
+    events = [getattr(player, variable) for player in team.players.values()]
+    counts = [len(player_events) for player_events in events]
+    if all(isinstance(e, EventList) for e in events) and (
+        len({id(e.table) for e in events}) == 1
+    ):
+        table = events[0].table
+        rows = np.concatenate(
+            [np.arange(e.start, e.stop, dtype=np.int64) for e in events]
+        )
+        data = {
+            column: table.columns[field][rows]
+            for column, field in zip(columns[1:], table.fields[1:])
+        }
+    else:
+        records = [
+            astuple(event)[1:] for player_events in events for event in player_events
+        ]
+        data = {
+            column: list(values)
+            for column, values in zip(
+                columns[1:], zip(*records) if records else [[]] * (len(columns) - 1)
+            )
+        }
+    return pd.DataFrame(
+        {"player_name": player_column(list(team.players), counts), **data},
+        columns=columns,
+        copy=False,
+    )
+
+
+def build_table(team, table: str) -> pd.DataFrame:
+    if table == "daily":
+        return daily_table(team)
+    if table == "sessions":
+        return session_table(team)
+    return event_table(team, table)
+
+
+def write_chunks(chunks: Iterator[pd.DataFrame], path: Path, file_format: str):
+    if file_format == "csv":
+        for position, chunk in enumerate(chunks):
+            chunk.to_csv(
+                path,
+                mode="w" if position == 0 else "a",
+                header=position == 0,
+                index=False,
+            )
+        return
+    if pq is None:
+        raise ImportError("Writing Parquet files needs pyarrow")
+    writer = None
+    try:
+        for chunk in chunks:
+            batch = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_table(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_team(
+    team,
+    path_to_folder: Optional[Path] = None,
+    file_format: str = "csv",
+    tables: List[str] = export_tables,
+    players_per_chunk: int = 64,
+):
+    """Without a folder the tables are returned as data frames. With a folder they
+    are written to `<table>.<file_format>` and the paths are returned."""
+    if path_to_folder is None:
+        return {table: build_table(team, table) for table in tables}
+    if file_format not in export_formats:
+        raise UnknownExportFormat(file_format)
+    path_to_folder.mkdir(parents=True, exist_ok=True)
+    paths: Dict[str, Path] = {}
+    for table in tables:
+        paths[table] = path_to_folder / f"{table}.{file_format}"
+        chunks = (
+            daily_chunks(team, players_per_chunk)
+            if table == "daily"
+            else iter([build_table(team, table)])
+        )
+        write_chunks(chunks, paths[table], file_format)
+    return paths
@@ -0,0 +1,232 @@
+"""Missing data profiling and imputation for all players and features at once.
+
+The functions work on players x features x days arrays as held by a
+`TeamStore`; every method runs over the whole array without a loop over players.
+Imputed stores keep the mask of the original store, so imputed values can
+always be told apart from reported ones."""
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.daily_calendar import to_timestamp
+from preprocessing.team_store import TeamStore
+
+imputation_methods = ["ffill", "linear", "time", "rolling_mean"]
+
+
+class UnknownImputation(Exception):
+    def __init__(self, value):
+        message = f"Unknown imputation {value}, use one of {imputation_methods}"
+        super().__init__(message)
+
+
+def last_valid_position(values: np.ndarray) -> np.ndarray:
+    """Position of the last observed day up to every day, -1 before the first."""
+    positions = np.where(np.isnan(values), -1, np.arange(values.shape[-1]))
+    return np.maximum.accumulate(positions, axis=-1)
+
+
+def next_valid_position(values: np.ndarray) -> np.ndarray:
+    """Position of the next observed day from every day on, the number of days
+    after the last."""
+    days = values.shape[-1]
+    positions = np.where(np.isnan(values), days, np.arange(days))
+    return np.minimum.accumulate(positions[..., ::-1], axis=-1)[..., ::-1]
+
+
+def forward_fill(values: np.ndarray, limit: Optional[int] = None) -> np.ndarray:
+    """Carry the last observation forward, over at most `limit` days."""
+    last = last_valid_position(values)
+    filled = np.take_along_axis(values, np.maximum(last, 0), axis=-1)
+    keep = last >= 0
+    if limit is not None:
+        keep &= np.arange(values.shape[-1]) - last <= limit
+    return np.where(keep, filled, np.nan)
+
+
+def interpolate(
+    values: np.ndarray,
+    x: Optional[np.ndarray] = None,
+    limit: Optional[int] = None,
+) -> np.ndarray:
+    """Linear interpolation of the gaps between two observations, over the day
+    positions or over the values `x` of the days (e.g. the time). Gaps before the
+    first and after the last observation stay missing. With a limit, only the
+    first `limit` days of a gap are filled."""
+    days = values.shape[-1]
+    x = np.arange(days, dtype=np.float64) if x is None else x.astype(np.float64)
+    last = last_valid_position(values)
+    following = next_valid_position(values)
+    inside = (last >= 0) & (following < days)
+    if limit is not None:
+        inside &= np.arange(days) - last <= limit
+    last = np.where(inside, last, 0)
+    following = np.where(inside, following, 0)
+    start = np.take_along_axis(values, last, axis=-1)
+    stop = np.take_along_axis(values, following, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(
+            following > last, (x - x[last]) / (x[following] - x[last]), 0.0
+        )
+    return np.where(inside, start + (stop - start) * share, np.nan)
+
+
+def rolling_mean(
+    values: np.ndarray, window: int = 7, min_periods: int = 1
+) -> np.ndarray:
+    """Fill every missing day with the mean of the observations of the `window`
+    days before it, if there are at least `min_periods` of them."""
+    observed = ~np.isnan(values)
+    sums = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+    counts = np.zeros_like(sums)
+    np.cumsum(np.where(observed, values, 0.0), axis=-1, out=sums[..., 1:])
+    np.cumsum(observed, axis=-1, out=counts[..., 1:])
+    starts = np.maximum(np.arange(values.shape[-1]) - window, 0)
+    ends = np.arange(values.shape[-1])
+    window_sums = sums[..., ends] - sums[..., starts]
+    window_counts = counts[..., ends] - counts[..., starts]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(
+            window_counts >= min_periods, window_sums / window_counts, np.nan
+        )
+    return np.where(observed, values, means)
+
+
+def impute_values(
+    values: np.ndarray,
+    method: str,
+    index: Optional[pd.DatetimeIndex] = None,
+    limit: Optional[int] = None,
+    window: int = 7,
+    min_periods: int = 1,
+) -> np.ndarray:
+    if method == "ffill":
+        return forward_fill(values, limit)
+    if method == "linear":
+        return interpolate(values, limit=limit)
+    if method == "time":
+        if index is None:
+            raise ValueError("Time interpolation needs the date index")
+        days = (index - index[0]) / pd.Timedelta(days=1)
+        return interpolate(values, np.asarray(days), limit)
+    if method == "rolling_mean":
+        return rolling_mean(values, window, min_periods)
+    raise UnknownImputation(method)
+
+
+def impute(
+    store: TeamStore,
+    method: str = "ffill",
+    features: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    window: int = 7,
+    min_periods: int = 1,
+) -> TeamStore:
+    """Store with the missing values of `features` (all by default) imputed. The
+    mask of the new store still marks the values that were missing."""
+    positions = (
+        np.arange(len(store.features))
+        if features is None
+        else np.array([store.feature_position(feature) for feature in features])
+    )
+    values = np.empty(store.shape)
+    for position, feature in enumerate(store.features):
+        values[:, position] = store.feature_values(feature)
+    values[:, positions] = impute_values(
+        values[:, positions], method, store.index, limit, window, min_periods
+    )
+    return TeamStore(store.players, store.features, store.index, values, store.mask)
+
+
+@dataclass(frozen=True)
+class MissingnessIndex:
+    """Share of the days with an observation per player, feature and week."""
+
+    players: List[str]
+    features: List[str]
+    weeks: pd.PeriodIndex
+    coverage: np.ndarray
+    days: np.ndarray
+
+    @cached_property
+    def player_positions(self) -> Dict[str, int]:
+        return {player: position for position, player in enumerate(self.players)}
+
+    @cached_property
+    def feature_positions(self) -> Dict[str, int]:
+        return {feature: position for position, feature in enumerate(self.features)}
+
+    def week_positions(self, start=None, end=None) -> np.ndarray:
+        """Positions of the weeks overlapping the days from `start` up to, but not
+        including, `end`."""
+        keep = np.ones(len(self.weeks), dtype=bool)
+        if start is not None:
+            keep &= self.weeks.end_time >= to_timestamp(start)
+        if end is not None:
+            keep &= self.weeks.start_time < to_timestamp(end)
+        return np.flatnonzero(keep)
+
+    def player_coverage(self, player_name: str, feature_name: str) -> pd.Series:
+        return pd.Series(
+            self.coverage[
+                self.player_positions[player_name], self.feature_positions[feature_name]
+            ],
+            index=self.weeks,
+            name=player_name,
+        )
+
+    def mean_coverage(self, feature_name: str, start=None, end=None) -> pd.Series:
+        """Share of the days with an observation per player over the selected
+        weeks."""
+        weeks = self.week_positions(start, end)
+        coverage = self.coverage[:, self.feature_positions[feature_name]][:, weeks]
+        observed = coverage @ self.days[weeks]
+        return pd.Series(observed / self.days[weeks].sum(), index=self.players)
+
+    def players_with_coverage(
+        self, feature_name: str, min_coverage: float, start=None, end=None
+    ) -> List[str]:
+        coverage = self.mean_coverage(feature_name, start, end)
+        return list(coverage.index[coverage.to_numpy() >= min_coverage])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long frame with one row per player, feature and week."""
+        return pd.DataFrame(
+            {"coverage": self.coverage.reshape(-1)},
+            index=pd.MultiIndex.from_product(
+                [self.players, self.features, self.weeks],
+                names=["player", "feature", "week"],
+            ),
+        )
+
+    @classmethod
+    def from_store(cls, store: TeamStore) -> "MissingnessIndex":
+        index, order = store.index, slice(None)
+        if not index.is_monotonic_increasing:
+            order = np.argsort(index, kind="stable")
+            index = index[order]
+        days = index.to_period("W")
+        if len(index) == 0:
+            coverage = np.empty((len(store.players), len(store.features), 0))
+            return cls(store.players, store.features, days, coverage, np.empty(0))
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        week_days = np.diff(np.r_[starts, len(index)]).astype(np.float64)
+        coverage = (
+            np.stack(
+                [
+                    np.add.reduceat(
+                        (~store.feature_mask(feature)[:, order]).astype(np.float64),
+                        starts,
+                        axis=-1,
+                    )
+                    for feature in store.features
+                ],
+                axis=1,
+            )
+            / week_days
+        )
+        return cls(store.players, store.features, days[starts], coverage, week_days)
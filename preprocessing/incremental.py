@@ -0,0 +1,298 @@
+"""Append-only updates of teams by the rows of new days.
+
+The exports grow by a few days at a time. Instead of building the teams again,
+the loaders build a `TeamUpdate` from the new rows only: the daily features of
+the days following the last day of the team, the new sessions and events and
+the game series of the days they touch. `extend_team` appends the update to
+the team. Reading, validating, resolving and rolling up only touch the new
+rows. The store of an extended team is a `ChunkedStore`: the store of the team,
+e.g. memory-mapped from disk, followed by the stores of the updates, which are
+not copied into one array.
+
+    updates = team_updates(teams, path_to_new_files)
+    teams = append_teams(teams, updates)
+    append_segments(path_to_folder, updates)"""
+
+from dataclasses import dataclass, replace
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.compact import CompactStore
+from preprocessing.daily_calendar import DailyCalendar
+from preprocessing.events import EventTable, parse_days
+from preprocessing.sessions import SessionTable
+from preprocessing.team_store import TeamStore
+from preprocessing.validation import ValidationReport
+
+
+class NotAppendOnly(Exception):
+    def __init__(self, value):
+        message = f"New days have to follow the last day {value} of the team"
+        super().__init__(message)
+
+
+class NewPlayers(Exception):
+    def __init__(self, value):
+        message = (
+            f"Players {value} are not part of the team, build it again to add them"
+        )
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class ChunkedStore:
+    """Store of a team made of stores of consecutive days, the store the team was
+    built or loaded with followed by the stores of the appended days. Appending
+    adds a chunk and copies nothing. Series and selections are gathered from the
+    chunks they span, the full `values` and `mask` are only concatenated when
+    they are asked for."""
+
+    chunks: Tuple[Union[TeamStore, CompactStore], ...]
+
+    @property
+    def players(self) -> List[str]:
+        return self.chunks[0].players
+
+    @property
+    def features(self) -> List[str]:
+        return self.chunks[0].features
+
+    @property
+    def player_positions(self) -> Dict[str, int]:
+        return self.chunks[0].player_positions
+
+    @property
+    def feature_positions(self) -> Dict[str, int]:
+        return self.chunks[0].feature_positions
+
+    @cached_property
+    def index(self) -> pd.DatetimeIndex:
+        return self.chunks[0].index.append([chunk.index for chunk in self.chunks[1:]])
+
+    @cached_property
+    def calendar(self) -> DailyCalendar:
+        days = sum(len(chunk.index) for chunk in self.chunks)
+        starts = [chunk.index[0] for chunk in self.chunks if len(chunk.index)]
+        return (
+            DailyCalendar(starts[0], days)
+            if starts
+            else DailyCalendar.from_index(self.index)
+        )
+
+    @property
+    def shape(self):
+        return len(self.players), len(self.features), len(self.calendar)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(chunk.nbytes for chunk in self.chunks)
+
+    @property
+    def values(self) -> np.ndarray:
+        return np.concatenate([chunk.values for chunk in self.chunks], axis=-1)
+
+    @property
+    def mask(self) -> np.ndarray:
+        return np.concatenate([chunk.mask for chunk in self.chunks], axis=-1)
+
+    def player_position(self, player_name: str) -> int:
+        return self.player_positions[player_name]
+
+    def feature_position(self, feature_name: str) -> int:
+        return self.feature_positions[feature_name]
+
+    def day_position(self, date) -> int:
+        return self.calendar.position(date)
+
+    def feature_values(self, feature_name: str) -> np.ndarray:
+        """Players x days array of one feature."""
+        return np.concatenate(
+            [chunk.feature_values(feature_name) for chunk in self.chunks], axis=-1
+        )
+
+    def feature_mask(self, feature_name: str) -> np.ndarray:
+        """Players x days mask of the missing days of one feature."""
+        return np.concatenate(
+            [chunk.feature_mask(feature_name) for chunk in self.chunks], axis=-1
+        )
+
+    def series(self, player_name: str, feature_name: str) -> pd.Series:
+        return pd.concat(
+            [chunk.series(player_name, feature_name) for chunk in self.chunks]
+        )
+
+    def feature(self, feature_name: str) -> pd.DataFrame:
+        """Days x players frame of one feature."""
+        return pd.DataFrame(
+            self.feature_values(feature_name).T,
+            index=self.index,
+            columns=self.players,
+            copy=False,
+        )
+
+    def player_frame(self, player_name: str) -> pd.DataFrame:
+        """Days x features frame of one player."""
+        return pd.concat([chunk.player_frame(player_name) for chunk in self.chunks])
+
+    def block(
+        self,
+        players: Optional[List[str]] = None,
+        features: Optional[List[str]] = None,
+        days: Union[slice, np.ndarray] = slice(None),
+    ) -> np.ndarray:
+        """Players x features x days float64 array of the selection, gathered
+        from the chunks holding the selected days."""
+        positions = np.arange(len(self.calendar))[days]
+        order = np.argsort(positions, kind="stable")
+        ordered = positions[order]
+        parts, start = [], 0
+        for chunk in self.chunks:
+            stop = start + len(chunk.index)
+            selected = ordered[(ordered >= start) & (ordered < stop)] - start
+            if len(selected) or not parts:
+                parts.append(chunk.block(players, features, selected))
+            start = stop
+        block = np.empty(parts[0].shape[:-1] + (len(positions),))
+        block[..., order] = np.concatenate(parts, axis=-1)
+        return block
+
+    def extend(self, store: Union[TeamStore, CompactStore]) -> "ChunkedStore":
+        """Store with the days of `store` appended as a new chunk, compacted if the
+        first chunk is."""
+        if isinstance(self.chunks[0], CompactStore):
+            store = CompactStore.from_store(store, self.chunks[0].score_features)
+        return ChunkedStore(self.chunks + (store,))
+
+    @classmethod
+    def from_store(cls, store) -> "ChunkedStore":
+        return store if isinstance(store, ChunkedStore) else cls((store,))
+
+
+@dataclass(frozen=True)
+class TeamUpdate:
+    """New rows of one team. `store` holds the days after the last day of the
+    team, `game_ts` the game series on these days and on the earlier days of
+    new games."""
+
+    store: TeamStore
+    sessions: Optional[SessionTable]
+    events: Dict[str, EventTable]
+    game_performance: pd.DataFrame
+    game_ts: pd.Series
+    validation: Optional[ValidationReport] = None
+
+
+def following_days(team_store, store: TeamStore) -> TeamStore:
+    """Store of the new rows on the days from the day after the last day of the
+    team store up to the last new day, with the players and features of the team
+    store. Days and players without new rows are missing. New days of players
+    that are not part of the team raise `NewPlayers`."""
+    start = team_store.calendar.end + pd.Timedelta(days=1)
+    if len(store.index) and store.index[0] < start:
+        raise NotAppendOnly(team_store.calendar.end.strftime("%d.%m.%Y"))
+    new_players = [
+        player for player in store.players if player not in team_store.player_positions
+    ]
+    if new_players:
+        raise NewPlayers(new_players)
+    days = (store.calendar.end - start).days + 1 if len(store.index) else 0
+    calendar = DailyCalendar(start, days)
+    values = np.full((len(team_store.players), len(team_store.features), days), np.nan)
+    positions = pd.Index(store.players).get_indexer(team_store.players)
+    found = positions >= 0
+    values[found, :, days - len(store.index) :] = store.block(
+        features=team_store.features
+    )[positions[found]]
+    return TeamStore.from_arrays(
+        team_store.players, team_store.features, calendar.index, values
+    )
+
+
+def changed_days(
+    calendar: DailyCalendar, new: pd.DatetimeIndex, game_dates
+) -> pd.DatetimeIndex:
+    """The new days and the days of the calendar with a new game."""
+    days = parse_days(game_dates)
+    earlier = days[(days >= calendar.start) & (days <= calendar.end)]
+    return earlier.unique().sort_values().append(new).rename("Date")
+
+
+def team_update(
+    team,
+    store: TeamStore,
+    sessions: Optional[SessionTable],
+    events: Dict[str, EventTable],
+    game_performance: pd.DataFrame,
+    game_series: Callable[[pd.DatetimeIndex], pd.Series],
+    game_dates,
+    validation: Optional[ValidationReport] = None,
+) -> TeamUpdate:
+    """Update of the team by the store of the new rows. `game_series` builds the
+    game series of the new games on given days, as the loader of the team does.
+    It is only built on the new days and on the earlier days of the new games,
+    found from their `game_dates`."""
+    team_store = team.get_store()
+    new = following_days(team_store, store)
+    return TeamUpdate(
+        new,
+        sessions,
+        events,
+        game_performance,
+        game_series(changed_days(team_store.calendar, new.index, game_dates)),
+        validation,
+    )
+
+
+def extend_team(
+    team,
+    update: TeamUpdate,
+    build_players: Callable[[Any, Optional[SessionTable], Dict], Mapping],
+):
+    """Team with the update appended. `build_players` creates the players of the
+    extended store, sessions and events, as the loader of the team does. The
+    store of the update is added as a chunk of the store of the team, the game
+    series is extended by the new days and changed on the days of new games only.
+    Rollups that were already computed are extended by the new days only."""
+    team_store = team.get_store()
+    store = ChunkedStore.from_store(team_store).extend(update.store)
+    sessions = team.sessions
+    if sessions is not None and update.sessions is not None:
+        sessions = sessions.append(update.sessions)
+    events = {
+        variable: (
+            table.append(update.events[variable])
+            if variable in update.events
+            else table
+        )
+        for variable, table in team.events.items()
+    }
+    earlier = update.game_ts.index <= team_store.calendar.end
+    game_ts = pd.concat([team.game_ts, update.game_ts[~earlier]])
+    game_ts.iloc[team.game_ts.index.searchsorted(update.game_ts.index[earlier])] = (
+        update.game_ts.to_numpy()[earlier]
+    )
+    validation = team.validation
+    if update.validation is not None:
+        validation = ValidationReport.concat(
+            [report for report in [validation, update.validation] if report]
+        )
+    extended = replace(
+        team,
+        game_performance=pd.concat(
+            [team.game_performance, update.game_performance], ignore_index=True
+        ),
+        game_ts=game_ts,
+        players=build_players(store, sessions, events),
+        store=store,
+        events=events,
+        validation=validation,
+        sessions=sessions,
+    )
+    if "rollups" in team.__dict__:
+        extended.__dict__["rollups"] = team.rollups.append(
+            update.store.values, update.store.index
+        )
+    return extended
@@ -0,0 +1,102 @@
+"""Build cache for parsed input files.
+
+Every cached file is identified by its size, modification time and the hash of
+its content. As long as size and modification time are unchanged the cached
+parse is reused without reading the file. Otherwise the content is hashed and
+the file is only parsed again if its content really changed."""
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+manifest_name = "manifest.json"
+
+
+def file_digest(path_to_file: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path_to_file, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestCache:
+    def __init__(self, path_to_cache: Path):
+        self.path_to_cache = Path(path_to_cache)
+        self.path_to_cache.mkdir(parents=True, exist_ok=True)
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        if (self.path_to_cache / manifest_name).exists():
+            with open(self.path_to_cache / manifest_name) as manifest_file:
+                self.manifest = json.load(manifest_file)
+        self.hits = 0
+        self.misses = 0
+
+    def _cached_file(self, digest: str) -> Path:
+        return self.path_to_cache / f"{digest}.pkl"
+
+    def _read(self, digest: str) -> Any:
+        with open(self._cached_file(digest), "rb") as cached_file:
+            return pickle.load(cached_file)
+
+    def _write(self, digest: str, parsed: Any):
+        with open(self._cached_file(digest), "wb") as cached_file:
+            pickle.dump(parsed, cached_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path_to_file: Path, parse: Callable[[Path], Any]) -> Any:
+        """Return the parsed content of the file, parsing it only if it changed
+        since it was cached."""
+        return self.load_many(
+            [path_to_file], lambda paths: [parse(path) for path in paths]
+        )[0]
+
+    def load_many(
+        self, paths: List[Path], parse_many: Callable[[List[Path]], List[Any]]
+    ) -> List[Any]:
+        """Like `load` for several files. All files that have to be parsed are
+        handed to `parse_many` in one call, so they can be parsed concurrently."""
+        results: List[Any] = [None] * len(paths)
+        changed = []
+        for position, path_to_file in enumerate(paths):
+            key = str(Path(path_to_file).resolve())
+            stat = os.stat(path_to_file)
+            entry = self.manifest.get(key)
+            if (
+                entry is not None
+                and entry["size"] == stat.st_size
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and self._cached_file(entry["digest"]).exists()
+            ):
+                self.hits += 1
+                results[position] = self._read(entry["digest"])
+                continue
+            digest = file_digest(path_to_file)
+            self.manifest[key] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "digest": digest,
+            }
+            if entry is not None and entry["digest"] != digest:
+                self._discard(entry["digest"])
+            if self._cached_file(digest).exists():
+                self.hits += 1
+                results[position] = self._read(digest)
+            else:
+                changed.append((position, digest))
+
+        self.misses += len(changed)
+        parsed = parse_many([paths[position] for position, _ in changed])
+        for (position, digest), content in zip(changed, parsed):
+            self._write(digest, content)
+            results[position] = content
+        return results
+
+    def _discard(self, digest: str):
+        if all(entry["digest"] != digest for entry in self.manifest.values()):
+            self._cached_file(digest).unlink(missing_ok=True)
+
+    def save(self):
+        with open(self.path_to_cache / manifest_name, "w") as manifest_file:
+            json.dump(self.manifest, manifest_file)
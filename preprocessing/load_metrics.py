@@ -0,0 +1,191 @@
+"""Training load metrics derived from the daily load of all players at once.
+
+The metrics follow the definitions used in the PMSys export:
+    atl          mean load of the acute window (7 days)
+    weekly_load  summed load of the acute window
+    monotony     mean / standard deviation of the load in the acute window
+    strain       weekly_load * monotony
+    ctl28/ctl42  mean load of the chronic windows (28 and 42 days)
+    acwr         acute:chronic workload ratio, atl / ctl28 or the ratio of the
+                 exponentially weighted acute and chronic load
+All computations run over the days x players matrix of a team, so there is no
+loop over players."""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.team_store import TeamStore
+
+load_metric_names = [
+    "atl",
+    "weekly_load",
+    "monotony",
+    "strain",
+    "acwr",
+    "ctl28",
+    "ctl42",
+]
+
+
+@dataclass(frozen=True)
+class LoadModel:
+    acute_window: int = 7
+    chronic_windows: Tuple[int, int] = (28, 42)
+    acwr: str = "rolling"
+    min_periods: Optional[int] = None
+    missing_load: float = 0.0
+
+    @property
+    def longest_window(self) -> int:
+        return max(self.acute_window, *self.chronic_windows)
+
+    def periods(self, window: int) -> int:
+        return window if self.min_periods is None else min(self.min_periods, window)
+
+    def alpha(self, window: int) -> float:
+        return 2 / (window + 1)
+
+
+def ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def ewma(daily_load: np.ndarray, alpha: float, start: Optional[np.ndarray] = None):
+    """Exponentially weighted mean along the day axis. Without a start value the
+    recursion starts at the first day, as pandas does with adjust=False."""
+    frame = pd.DataFrame(daily_load.T)
+    if start is None:
+        return frame.ewm(alpha=alpha, adjust=False).mean().to_numpy().T
+    result = np.empty_like(daily_load, dtype=np.float64)
+    previous = start
+    for day in range(daily_load.shape[1]):
+        previous = (1 - alpha) * previous + alpha * daily_load[:, day]
+        result[:, day] = previous
+    return result
+
+
+def rolling_metrics(daily_load: np.ndarray, model: LoadModel) -> Dict[str, np.ndarray]:
+    """All rolling window metrics for a players x days load matrix."""
+    frame = pd.DataFrame(daily_load.T)
+    acute = frame.rolling(model.acute_window, model.periods(model.acute_window))
+    atl = acute.mean().to_numpy().T
+    weekly_load = acute.sum().to_numpy().T
+    monotony = ratio(atl, acute.std().to_numpy().T)
+    chronic = {
+        window: frame.rolling(window, model.periods(window)).mean().to_numpy().T
+        for window in model.chronic_windows
+    }
+    short, long = model.chronic_windows
+    return {
+        "atl": atl,
+        "weekly_load": weekly_load,
+        "monotony": monotony,
+        "strain": weekly_load * monotony,
+        "acwr": ratio(atl, chronic[short]),
+        "ctl28": chronic[short],
+        "ctl42": chronic[long],
+    }
+
+
+def compute_load_metrics(
+    daily_load: np.ndarray, model: LoadModel = LoadModel()
+) -> Dict[str, np.ndarray]:
+    daily_load = np.where(np.isnan(daily_load), model.missing_load, daily_load)
+    metrics = rolling_metrics(daily_load, model)
+    if model.acwr == "ewma":
+        metrics["acwr"] = ratio(
+            ewma(daily_load, model.alpha(model.acute_window)),
+            ewma(daily_load, model.alpha(model.chronic_windows[0])),
+        )
+    elif model.acwr != "rolling":
+        raise ValueError(f"Unknown acwr variant {model.acwr}")
+    return metrics
+
+
+def load_metrics(store: TeamStore, model: LoadModel = LoadModel()) -> TeamStore:
+    """Store with the load metrics of all players of the team, derived from the
+    daily load of the team store."""
+    daily_load = np.asarray(store.feature_values("daily_load"), dtype=np.float64)
+    metrics = compute_load_metrics(daily_load, model)
+    values = np.stack([metrics[name] for name in load_metric_names], axis=1)
+    return TeamStore.from_arrays(store.players, load_metric_names, store.index, values)
+
+
+def validate_load_metrics(
+    store: TeamStore,
+    model: LoadModel = LoadModel(),
+    tolerance: float = 1e-2,
+) -> pd.DataFrame:
+    """Share of the days on which the exported metrics agree with the recomputed
+    ones, per player and metric. Days on which either value is missing are left
+    out."""
+    computed = load_metrics(store, model)
+    metrics = [name for name in load_metric_names if name in store.feature_positions]
+    exported = np.stack(
+        [np.asarray(store.feature_values(name), dtype=np.float64) for name in metrics],
+        axis=1,
+    )
+    recomputed = computed.values[
+        :, [computed.feature_position(name) for name in metrics]
+    ]
+    comparable = ~(np.isnan(exported) | np.isnan(recomputed))
+    agree = (np.abs(exported - recomputed) <= tolerance) & comparable
+    with np.errstate(invalid="ignore"):
+        share = agree.sum(axis=2) / comparable.sum(axis=2)
+    return pd.DataFrame(share, index=store.players, columns=metrics)
+
+
+@dataclass(frozen=True)
+class LoadState:
+    """What is needed to extend the metrics by new days: the load of the last days
+    of the longest window and the last exponentially weighted means."""
+
+    model: LoadModel
+    tail: np.ndarray
+    acute_ewma: np.ndarray
+    chronic_ewma: np.ndarray
+
+    @classmethod
+    def from_history(
+        cls, daily_load: np.ndarray, model: LoadModel = LoadModel()
+    ) -> "LoadState":
+        daily_load = np.where(np.isnan(daily_load), model.missing_load, daily_load)
+        return cls(
+            model,
+            daily_load[:, -(model.longest_window - 1) :],
+            ewma(daily_load, model.alpha(model.acute_window))[:, -1],
+            ewma(daily_load, model.alpha(model.chronic_windows[0]))[:, -1],
+        )
+
+    def update(
+        self, new_daily_load: np.ndarray
+    ) -> Tuple[Dict[str, np.ndarray], "LoadState"]:
+        """Metrics for the appended days only, and the state after them. The cost
+        depends on the number of new days, not on the length of the history."""
+        model = self.model
+        new_daily_load = np.where(
+            np.isnan(new_daily_load), model.missing_load, new_daily_load
+        )
+        days = new_daily_load.shape[1]
+        window = np.concatenate([self.tail, new_daily_load], axis=1)
+        metrics = {
+            name: metric[:, -days:]
+            for name, metric in rolling_metrics(window, model).items()
+        }
+        acute = ewma(new_daily_load, model.alpha(model.acute_window), self.acute_ewma)
+        chronic = ewma(
+            new_daily_load, model.alpha(model.chronic_windows[0]), self.chronic_ewma
+        )
+        if model.acwr == "ewma":
+            metrics["acwr"] = ratio(acute, chronic)
+        state = LoadState(
+            model,
+            window[:, -(model.longest_window - 1) :],
+            acute[:, -1],
+            chronic[:, -1],
+        )
+        return metrics, state
@@ -0,0 +1,41 @@
+"""Concurrent loading of input files.
+
+Reading the raw bytes is I/O bound and done in a thread pool, parsing is CPU
+bound and done in a process pool. A file is handed to the process pool as
+soon as it has been read, so reading and parsing overlap."""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+
+def read_bytes(path_to_file: Path) -> bytes:
+    with open(path_to_file, "rb") as file:
+        return file.read()
+
+
+def load_in_parallel(
+    paths: List[Path],
+    parse_content: Callable[[str, bytes], Any],
+    workers: Optional[int] = None,
+) -> List[Any]:
+    """Parse the files with `parse_content(file_name, content)` and return the
+    results in the order of `paths`. `parse_content` has to be importable from a
+    module since it is run in worker processes. With a single worker the files are
+    parsed one after another in the calling process."""
+    if workers == 1 or len(paths) <= 1:
+        return [parse_content(path.name, read_bytes(path)) for path in paths]
+    with ThreadPoolExecutor(workers) as io_pool, ProcessPoolExecutor(
+        workers
+    ) as process_pool:
+        reads = {
+            io_pool.submit(read_bytes, path): position
+            for position, path in enumerate(paths)
+        }
+        parses = {}
+        for read in as_completed(reads):
+            position = reads[read]
+            parses[position] = process_pool.submit(
+                parse_content, paths[position].name, read.result()
+            )
+        return [parses[position].result() for position in range(len(paths))]
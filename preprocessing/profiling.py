@@ -0,0 +1,148 @@
+"""Stage level timing and memory instrumentation of the team generation.
+
+The loaders wrap their stages in `profiler.stage(name, team)`. While profiling is
+off this returns a shared no-op context, so the hooks cost one attribute lookup
+and a function call. With profiling on, every stage records its wall time, CPU
+time, the peak resident set size of the process at the end of the stage and the
+number of rows it produced:
+
+    with profiling() as profile:
+        teams = generate_teams(path_to_data)
+    print(profile.table())
+    profile.to_json(Path("profile.json"))
+
+Stages running in worker processes are recorded by the profiler of the worker and
+do not show up in the report of the parent process."""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+@dataclass(frozen=True)
+class StageRecord:
+    stage: str
+    team: Optional[str]
+    depth: int
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_mb: Optional[float]
+    rows: Optional[int]
+
+
+class NullStage:
+    """Stage handed out while profiling is off. Row counts set on it are ignored."""
+
+    rows: Optional[int] = None
+
+    def __enter__(self) -> "NullStage":
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+null_stage = NullStage()
+
+
+class Stage:
+    def __init__(self, profiler: "Profiler", name: str, team: Optional[str]):
+        self.profiler = profiler
+        self.name = name
+        self.team = team
+        self.rows: Optional[int] = None
+
+    def __enter__(self) -> "Stage":
+        self.position = len(self.profiler.records)
+        self.depth = self.profiler.depth
+        self.profiler.depth += 1
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        record = StageRecord(
+            self.name,
+            self.team,
+            self.depth,
+            time.perf_counter() - self.wall,
+            time.process_time() - self.cpu,
+            peak_rss_mb(),
+            self.rows,
+        )
+        self.profiler.depth -= 1
+        # records are kept in the order the stages started, parents first
+        self.profiler.records.insert(self.position, record)
+        return False
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.records: List[StageRecord] = []
+        self.depth = 0
+
+    def stage(self, name: str, team: Optional[str] = None):
+        if not self.enabled:
+            return null_stage
+        return Stage(self, name, team)
+
+    def reset(self):
+        self.records = []
+        self.depth = 0
+
+    def report(self) -> List[dict]:
+        return [asdict(record) for record in self.records]
+
+    def to_json(self, path: Optional[Path] = None) -> str:
+        report = json.dumps(self.report(), indent=2)
+        if path is not None:
+            path.write_text(report)
+        return report
+
+    def table(self) -> str:
+        lines = [
+            f"{'stage':<36} {'team':<12} {'wall s':>9} {'cpu s':>9} "
+            f"{'peak MB':>9} {'rows':>9}"
+        ]
+        for record in self.records:
+            stage = "  " * record.depth + record.stage
+            peak = "" if record.peak_rss_mb is None else f"{record.peak_rss_mb:.1f}"
+            rows = "" if record.rows is None else str(record.rows)
+            lines.append(
+                f"{stage:<36} {record.team or '':<12} {record.wall_seconds:>9.4f} "
+                f"{record.cpu_seconds:>9.4f} {peak:>9} {rows:>9}"
+            )
+        return "\n".join(lines)
+
+
+profiler = Profiler()
+
+
+@contextmanager
+def profiling() -> Iterator[Profiler]:
+    """Record the stages run within the context, starting from an empty report."""
+    enabled = profiler.enabled
+    profiler.reset()
+    profiler.enabled = True
+    try:
+        yield profiler
+    finally:
+        profiler.enabled = enabled
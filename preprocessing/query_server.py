@@ -0,0 +1,307 @@
+"""Local query server holding the teams of one data file in a single process.
+
+Clients talk to the server over a Unix socket, readable and writable by the
+owner only, or a localhost TCP port. Every message is preceded by its length as
+an unsigned 8 byte integer. A request is a JSON object with the query `method`
+and its `args` and `kwargs`, so the arguments have to be JSON values and dates
+are passed as strings. The server never unpickles what it receives. The
+response is a pickled dictionary holding either the `result` or an `error`, so
+clients have to trust the server. Queries are answered, and changed data is
+loaded, on a worker thread so that the event loop keeps serving connections.
+
+Responses are kept in an LRU cache keyed by the request. The data file (a
+`teams.pkl` or a folder written by `columnar.save_teams`) is watched, when it
+changes the teams are loaded again and the cache is cleared.
+
+    python preprocessing/query_server.py input/teams.pkl --socket /tmp/teams.sock
+
+    client = QueryClient(socket_path=Path("/tmp/teams.sock"))
+    client.get_variables_by_date("TeamA", "TeamA-01", ["stress"])"""
+
+import asyncio
+import json
+import os
+import pickle
+import socket
+import struct
+import sys
+import time
+from argparse import ArgumentParser
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from preprocessing.columnar import load_teams
+from preprocessing.data_loader import SoccerPlayer, Team
+
+header = struct.Struct("!Q")
+
+
+class QueryFailed(Exception):
+    def __init__(self, value):
+        message = f"Query failed on the server: {value}"
+        super().__init__(message)
+
+
+class UnknownQuery(Exception):
+    def __init__(self, value):
+        message = f"The server does not answer {value} queries"
+        super().__init__(message)
+
+
+def frame(payload: Any) -> bytes:
+    data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    return header.pack(len(data)) + data
+
+
+def request_frame(method: str, args: Tuple, kwargs: Dict) -> bytes:
+    data = json.dumps(
+        {"method": method, "args": args, "kwargs": kwargs}, sort_keys=True
+    ).encode()
+    return header.pack(len(data)) + data
+
+
+def data_signature(path_to_data: Path) -> Tuple:
+    """Sizes and modification times of the files of the data, changes when the
+    data is rewritten."""
+    paths = sorted(path_to_data.rglob("*")) if path_to_data.is_dir() else [path_to_data]
+    return tuple(
+        (str(path), path.stat().st_size, path.stat().st_mtime_ns)
+        for path in paths
+        if path.is_file()
+    )
+
+
+def load_data(path_to_data: Path) -> Dict[str, Team]:
+    if path_to_data.is_dir():
+        return load_teams(path_to_data)
+    with open(path_to_data, "rb") as data_file:
+        return pickle.load(data_file)
+
+
+def plain_player(player: SoccerPlayer) -> SoccerPlayer:
+    """Player with all variables set, lazy players are materialised so that only
+    the player and not the team store is sent."""
+    return SoccerPlayer(
+        **{field.name: getattr(player, field.name) for field in fields(SoccerPlayer)}
+    )
+
+
+class QueryServer:
+    queries = [
+        "teams",
+        "players",
+        "player",
+        "get_variables_by_date",
+        "query",
+        "rollup",
+        "sessions",
+    ]
+
+    def __init__(
+        self, path_to_data: Path, cache_size: int = 256, reload_interval: float = 1.0
+    ):
+        self.path_to_data = path_to_data
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        self.cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.reload()
+
+    def reload(self):
+        self.signature = data_signature(self.path_to_data)
+        self.teams = load_data(self.path_to_data)
+        self.cache.clear()
+        self.checked = time.monotonic()
+
+    def reload_if_changed(self):
+        if time.monotonic() - self.checked < self.reload_interval:
+            return
+        self.checked = time.monotonic()
+        if data_signature(self.path_to_data) != self.signature:
+            self.reload()
+
+    def teams_query(self) -> List[str]:
+        return list(self.teams)
+
+    def players_query(self, team_name: str) -> List[str]:
+        return list(self.teams[team_name].players)
+
+    def player_query(self, team_name: str, player_name: str) -> SoccerPlayer:
+        return plain_player(self.teams[team_name].players[player_name])
+
+    def get_variables_by_date_query(
+        self, team_name: str, player_name: str, *args, **kwargs
+    ):
+        player = self.teams[team_name].players[player_name]
+        return player.get_variables_by_date(*args, **kwargs)
+
+    def query_query(self, team_name: str, *args, **kwargs):
+        return self.teams[team_name].query(*args, **kwargs)
+
+    def rollup_query(self, team_name: str, *args, **kwargs):
+        return self.teams[team_name].rollups.query(*args, **kwargs)
+
+    def sessions_query(self, team_name: str, *args, **kwargs):
+        return self.teams[team_name].get_sessions().query(*args, **kwargs)
+
+    def answer(self, request: bytes) -> bytes:
+        """Framed response to a JSON request, from the cache if possible."""
+        self.reload_if_changed()
+        if request in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(request)
+            return self.cache[request]
+        self.misses += 1
+        try:
+            query = json.loads(request)
+            if query["method"] not in self.queries:
+                raise UnknownQuery(query["method"])
+            answer = getattr(self, f"{query['method']}_query")
+            response = frame(
+                {"result": answer(*query.get("args", ()), **query.get("kwargs", {}))}
+            )
+        except Exception as error:
+            return frame({"error": f"{type(error).__name__}: {error}"})
+        self.cache[request] = response
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return response
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            while True:
+                try:
+                    (size,) = header.unpack(await reader.readexactly(header.size))
+                except asyncio.IncompleteReadError:
+                    break
+                request = await reader.readexactly(size)
+                response = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.answer, request
+                )
+                writer.write(response)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(
+        self, socket_path: Optional[Path] = None, port: Optional[int] = None
+    ) -> asyncio.AbstractServer:
+        if socket_path is not None:
+            umask = os.umask(0o177)
+            try:
+                server = await asyncio.start_unix_server(
+                    self.handle_connection, path=str(socket_path)
+                )
+            finally:
+                os.umask(umask)
+            os.chmod(socket_path, 0o600)
+            return server
+        return await asyncio.start_server(self.handle_connection, "127.0.0.1", port)
+
+
+class QueryClient:
+    """Blocking client of a `QueryServer`, the queries return the same objects as
+    the corresponding methods of the library."""
+
+    def __init__(
+        self,
+        socket_path: Optional[Path] = None,
+        port: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        if socket_path is not None:
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.connect(str(socket_path))
+        else:
+            self.connection = socket.create_connection(("127.0.0.1", port))
+        self.connection.settimeout(timeout)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> "QueryClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def receive(self, size: int) -> bytes:
+        chunks = []
+        while size > 0:
+            chunk = self.connection.recv(min(size, 1 << 20))
+            if not chunk:
+                raise ConnectionError("Query server closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def call(self, method: str, *args, **kwargs):
+        self.connection.sendall(request_frame(method, args, kwargs))
+        (size,) = header.unpack(self.receive(header.size))
+        response = pickle.loads(self.receive(size))
+        if "error" in response:
+            raise QueryFailed(response["error"])
+        return response["result"]
+
+    def teams(self) -> List[str]:
+        return self.call("teams")
+
+    def players(self, team_name: str) -> List[str]:
+        return self.call("players", team_name)
+
+    def player(self, team_name: str, player_name: str) -> SoccerPlayer:
+        return self.call("player", team_name, player_name)
+
+    def get_variables_by_date(self, team_name: str, player_name: str, *args, **kwargs):
+        return self.call(
+            "get_variables_by_date", team_name, player_name, *args, **kwargs
+        )
+
+    def query(self, team_name: str, *args, **kwargs):
+        return self.call("query", team_name, *args, **kwargs)
+
+    def rollup(self, team_name: str, *args, **kwargs):
+        return self.call("rollup", team_name, *args, **kwargs)
+
+    def sessions(self, team_name: str, *args, **kwargs):
+        return self.call("sessions", team_name, *args, **kwargs)
+
+
+async def serve(
+    path_to_data: Path,
+    socket_path: Optional[Path] = None,
+    port: Optional[int] = None,
+    cache_size: int = 256,
+    reload_interval: float = 1.0,
+):
+    server = await QueryServer(path_to_data, cache_size, reload_interval).start(
+        socket_path, port
+    )
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("path_to_data", type=Path)
+    parser.add_argument("--socket", type=Path, default=Path("/tmp/teams.sock"))
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--cache-size", type=int, default=256)
+    arguments = parser.parse_args()
+    asyncio.run(
+        serve(
+            arguments.path_to_data,
+            arguments.socket if arguments.port is None else None,
+            arguments.port,
+            arguments.cache_size,
+        )
+    )
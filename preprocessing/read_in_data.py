@@ -1,12 +1,33 @@
+import io
 import json
 import os
+from dataclasses import replace
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
 
-from preprocessing.data_loader import Illness, Injury, Performance, SoccerPlayer, Team
+from preprocessing.compact import CompactStore, log_memory_report
+from preprocessing.daily_calendar import default_duplicate_policies
+from preprocessing.data_loader import (
+    Illness,
+    Injury,
+    LazySoccerPlayer,
+    Performance,
+    SoccerPlayer,
+    Team,
+)
+from preprocessing.events import EventTable, event_series
+from preprocessing.incremental import TeamUpdate, extend_team, team_update
+from preprocessing.ingest_cache import IngestCache
+from preprocessing.parallel_loader import load_in_parallel
+from preprocessing.profiling import profiler
+from preprocessing.sessions import SessionTable, session_variables
+from preprocessing.shared_arrays import attach_arrays, share_arrays, worker_pool
+from preprocessing.team_store import TeamStore, daily_features
+from preprocessing.validation import ValidationReport, default_rules, validate_store
 
 
 def flatten_list(any_list: List[List[Any]]) -> List[Any]:
@@ -30,109 +51,188 @@ def get_player_ids(csv_file: pd.DataFrame) -> List[str]:
     return csv_file.columns[1:]
 
 
-def initialise_injuries(
-    injury_df: pd.DataFrame, names: List[str]
-) -> Dict[str, List[Injury]]:
-    injuries: Dict = {name: [] for name in names}
-    for name, injuries_by_player in injury_df.groupby("player_name"):
-        injuries[name] = []
-        for _, row in injuries_by_player.iterrows():
-            injuries[name].append(
-                Injury(row["player_name"], row["type"], row["timestamp"])
-            )
-    return injuries
-
-
-def initialise_illness(
-    illness_df: pd.DataFrame, names: List[str]
-) -> Dict[str, List[Injury]]:
-    illness: Dict = {name: [] for name in names}
-    for name, illness_by_player in illness_df.groupby("player_name"):
-        illness[name] = []
-        for _, row in illness_df.iterrows():
-            illness[name].append(
-                Illness(row["player_name"], row["problems"], row["timestamp"])
-            )
-    return illness
+def initialise_injuries(injury_df: pd.DataFrame, names: List[str]) -> EventTable:
+    return EventTable.from_frame(
+        injury_df,
+        names,
+        Injury,
+        {"player": "player_name", "type": "type", "timestamp": "timestamp"},
+    )
+
+
+def initialise_illness(illness_df: pd.DataFrame, names: List[str]) -> EventTable:
+    return EventTable.from_frame(
+        illness_df,
+        names,
+        Illness,
+        {"player": "player_name", "problems": "problems", "timestamp": "timestamp"},
+    )
 
 
 def initialise_performance(
     performance_df: pd.DataFrame, names: List[str]
-) -> Dict[str, List[Injury]]:
-    performances: Dict = {name: [] for name in names}
-    for name, performance_by_player in performance_df.groupby("player_name"):
-        performances[name] = []
-        for _, row in performance_by_player.iterrows():
-            performances[name].append(
-                Performance(
-                    row["player_name"],
-                    row["team_performance"],
-                    row["offensive_performance"],
-                    row["defensive_performance"],
-                    row["timestamp"],
-                )
-            )
-    return performances
+) -> EventTable:
+    return EventTable.from_frame(
+        performance_df,
+        names,
+        Performance,
+        {
+            "name": "player_name",
+            "team_performance": "team_performance",
+            "offensive_performance": "offensive_performance",
+            "defensive_performance": "defensive_performance",
+            "timestamp": "timestamp",
+        },
+    )
 
 
-def read_in_variable_files(path_to_variable_folder: Path) -> Dict[str, Dict[str, Any]]:
-    file_names = os.listdir(path_to_variable_folder)
-    json_files = {
-        clean_suffix(file): read_in_json(
-            path_to_variable_folder / file, clean_suffix(file)
-        )
-        for file in file_names
-        if file.endswith(".json")
-    }
-    csv_files = {
-        clean_suffix(file): read_in_csv_file(path_to_variable_folder / file)
-        for file in file_names
-        if file.endswith(".csv")
-    }
-    names = get_player_ids(csv_files["stress"])
-    csv_files["performance"] = initialise_performance(csv_files["performance"], names)
-    csv_files["illness"] = initialise_illness(csv_files["illness"], names)
-    csv_files["injuries"] = initialise_injuries(csv_files["injuries"], names)
-    return {**json_files, **csv_files}
+def read_in_variable_file(path_to_file: Path) -> Any:
+    if path_to_file.suffix == ".json":
+        return read_in_json(path_to_file, clean_suffix(path_to_file.name))
+    return read_in_csv_file(path_to_file)
 
 
-def initialise_player(name: str, variables: Dict[str, Dict[str, Any]]) -> SoccerPlayer:
+def parse_variable_file(file_name: str, content: bytes) -> Any:
+    if file_name.endswith(".json"):
+        return json.loads(content)[clean_suffix(file_name)]
+    return pd.read_csv(io.BytesIO(content))
 
-    time_index = pd.to_datetime(
-        variables["daily_load"]["Date"].values, format="%d.%m.%Y"
+
+def read_in_files(paths: List[Path], workers: int = 1) -> List[Any]:
+    if workers == 1:
+        return [read_in_variable_file(path) for path in paths]
+    return load_in_parallel(paths, parse_variable_file, workers)
+
+
+def read_in_variable_files(
+    path_to_variable_folder: Path, cache_dir: Optional[Path] = None, workers: int = 1
+) -> Dict[str, Dict[str, Any]]:
+    """With a cache folder given, files that did not change since the last run are
+    not parsed again but read from the cache. With more than one worker, the files
+    are read and parsed concurrently."""
+    file_names = sorted(
+        file
+        for file in os.listdir(path_to_variable_folder)
+        if file.endswith(".json") or file.endswith(".csv")
     )
+    paths = [path_to_variable_folder / file for file in file_names]
+    cache = IngestCache(cache_dir) if cache_dir is not None else None
+    with profiler.stage("read_in_files") as stage:
+        if cache is not None:
+            parsed = cache.load_many(
+                paths, lambda changed: read_in_files(changed, workers)
+            )
+        else:
+            parsed = read_in_files(paths, workers)
+        stage.rows = sum(
+            len(content) for content in parsed if isinstance(content, pd.DataFrame)
+        )
+    files = {clean_suffix(file): content for file, content in zip(file_names, parsed)}
+    if cache is not None:
+        cache.save()
+    names = get_player_ids(files["stress"])
+    with profiler.stage("initialise_events") as stage:
+        files["performance"] = initialise_performance(files["performance"], names)
+        files["illness"] = initialise_illness(files["illness"], names)
+        files["injuries"] = initialise_injuries(files["injuries"], names)
+        stage.rows = sum(files[variable].size for variable in event_variables)
+    return files
+
+
+event_variables = ["injuries", "illness", "performance"]
+player_variables = ["srpe", "rpe", "duration"] + event_variables
+
+
+def initialise_player(
+    name: str,
+    variables: Dict[str, Dict[str, Any]],
+    store: Optional[TeamStore] = None,
+    lazy: bool = False,
+) -> SoccerPlayer:
+    """The daily features of the player are views into the team store. Without a
+    store, a store holding only this player is built. A lazy player only creates
+    the series of a feature when it is first accessed."""
+    if store is None:
+        store = TeamStore.from_frames(variables, [name])
+    if lazy:
+        return LazySoccerPlayer(
+            name,
+            store,
+            {variable: variables[variable][name] for variable in player_variables},
+        )
     return SoccerPlayer(
         name,
-        pd.Series(variables["daily_load"][name]).set_axis(time_index),
+        store.series(name, "daily_load"),
         variables["srpe"][name],
         variables["rpe"][name],
         variables["duration"][name],
-        pd.Series(variables["atl"][name]).set_axis(time_index),
-        pd.Series(variables["weekly_load"][name]).set_axis(time_index),
-        pd.Series(variables["monotony"][name]).set_axis(time_index),
-        pd.Series(variables["strain"][name]).set_axis(time_index),
-        pd.Series(variables["acwr"][name]).set_axis(time_index),
-        pd.Series(variables["ctl28"][name]).set_axis(time_index),
-        pd.Series(variables["ctl42"][name]).set_axis(time_index),
-        pd.Series(variables["fatigue"][name]).set_axis(time_index),
-        pd.Series(variables["mood"][name]).set_axis(time_index),
-        pd.Series(variables["readiness"][name]).set_axis(time_index),
-        pd.Series(variables["sleep_duration"][name]).set_axis(time_index),
-        pd.Series(variables["sleep_quality"][name]).set_axis(time_index),
-        pd.Series(variables["soreness"][name]).set_axis(time_index),
-        pd.Series(variables["stress"][name]).set_axis(time_index),
+        store.series(name, "atl"),
+        store.series(name, "weekly_load"),
+        store.series(name, "monotony"),
+        store.series(name, "strain"),
+        store.series(name, "acwr"),
+        store.series(name, "ctl28"),
+        store.series(name, "ctl42"),
+        store.series(name, "fatigue"),
+        store.series(name, "mood"),
+        store.series(name, "readiness"),
+        store.series(name, "sleep_duration"),
+        store.series(name, "sleep_quality"),
+        store.series(name, "soreness"),
+        store.series(name, "stress"),
         variables["injuries"][name],
         variables["illness"][name],
         variables["performance"][name],
     )
 
 
-def initialise_players(path_to_data: Path) -> List[SoccerPlayer]:
-    files = read_in_variable_files(path_to_data)
-    names = get_player_ids(files["stress"])
-    players = []
-    for name in names:
-        players.append(initialise_player(name, files))
+def session_views(
+    variables: Dict[str, Any], names: List[str]
+) -> Tuple[SessionTable, Dict[str, Dict[str, pd.Series]]]:
+    """Session table of the players and, per session variable, the views of the
+    sessions of every player into it."""
+    sessions = SessionTable.from_lists(
+        names, {variable: variables[variable] for variable in session_variables}
+    )
+    return sessions, {
+        variable: sessions.player_sessions(variable) for variable in session_variables
+    }
+
+
+def build_players(
+    variables: Dict[str, Dict[str, Any]],
+    names: List[str],
+    store: TeamStore,
+    lazy: bool = False,
+) -> List[SoccerPlayer]:
+    return [initialise_player(name, variables, store, lazy) for name in names]
+
+
+def initialise_players(
+    path_to_data: Path,
+    lazy: bool = False,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+) -> List[SoccerPlayer]:
+    """With rules given, the team store is validated and cleaned first, see
+    `validate_store`. Days reported more than once are merged by the duplicate
+    policies, see `TeamStore.from_frames`."""
+    with profiler.stage("read_in_variable_files"):
+        files = read_in_variable_files(path_to_data)
+    names = list(get_player_ids(files["stress"]))
+    with profiler.stage("team_store") as stage:
+        store = TeamStore.from_frames(files, names, policies=policies)
+        stage.rows = len(store.index)
+    if rules is not None:
+        with profiler.stage("validate_store") as stage:
+            store, validation = validate_store(store, rules)
+            stage.rows = validation.total
+    with profiler.stage("session_table") as stage:
+        sessions, views = session_views(files, names)
+        stage.rows = len(sessions)
+    with profiler.stage("initialise_players") as stage:
+        players = build_players({**files, **views}, names, store, lazy)
+        stage.rows = len(players)
     return players
 
 
@@ -160,26 +260,274 @@ def get_team_game_performance(players: List[SoccerPlayer]) -> pd.DataFrame:
 
 
 def get_game_ts(time_index: pd.Index, time_stamps: pd.Series) -> pd.Series:
-    """Extract the times when injuries occurred. For now only the time stamps are extracted and
-    an injury is binary event. However, there are more information stored and can be extracted, like
-    how many, injuries, what is injured and severity."""
-    binary_timeseries = {
-        time: (0 if time not in time_stamps else 1) for time in time_index.tolist()
-    }
-    return pd.Series(binary_timeseries.values(), index=binary_timeseries.keys())
-
-
-def generate_team(players: List[SoccerPlayer], team_name: str) -> Team:
+    """Binary series of the days on which the team played a game."""
+    return event_series(time_index, time_stamps, how="binary")
+
+
+def generate_team(
+    players: List[SoccerPlayer],
+    team_name: str,
+    store: Optional[TeamStore] = None,
+    events: Optional[Dict[str, EventTable]] = None,
+    validation: Optional[ValidationReport] = None,
+    sessions: Optional[SessionTable] = None,
+) -> Team:
     team_players = {
         player.name: player for player in players if team_name in player.name
     }
     time_index = list(team_players.values())[0].stress.index
-    game_performance = get_team_game_performance(list(team_players.values()))
+    if events is None:
+        events = {}
+        game_performance = get_team_game_performance(list(team_players.values()))
+    else:
+        game_performance = events["performance"].to_frame()
     game_ts = get_game_ts(time_index, game_performance["timestamp"])
-    return Team(team_name, game_performance, game_ts, team_players)
+    return Team(
+        team_name,
+        game_performance,
+        game_ts,
+        team_players,
+        store,
+        events,
+        validation,
+        sessions,
+    )
+
+
+def partition_players(names: List[str]) -> Dict[str, List[str]]:
+    teams: Dict[str, List[str]] = {}
+    for name in names:
+        teams.setdefault(get_team_name(name), []).append(name)
+    return teams
+
+
+def build_team(
+    team_name: str,
+    variables: Dict[str, Any],
+    team_ids: List[str],
+    lazy: bool = False,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    compact: bool = False,
+) -> Team:
+    with profiler.stage("team_store", team_name) as stage:
+        store = TeamStore.from_frames(variables, team_ids, policies=policies)
+        stage.rows = len(store.index)
+    validation = None
+    if rules is not None:
+        with profiler.stage("validate_store", team_name) as stage:
+            store, validation = validate_store(store, rules)
+            stage.rows = validation.total
+    if compact:
+        with profiler.stage("compact_store", team_name) as stage:
+            store = CompactStore.from_store(store)
+            stage.rows = len(store.index)
+    events = {
+        variable: variables[variable].select(team_ids) for variable in event_variables
+    }
+    with profiler.stage("session_table", team_name) as stage:
+        sessions, views = session_views(variables, team_ids)
+        stage.rows = len(sessions)
+    with profiler.stage("initialise_players", team_name) as stage:
+        players = build_players({**variables, **events, **views}, team_ids, store, lazy)
+        stage.rows = len(players)
+    with profiler.stage("generate_team", team_name) as stage:
+        team = generate_team(players, team_name, store, events, validation, sessions)
+        stage.rows = len(team.game_ts)
+    return team
+
+
+def team_variables(files: Dict[str, Any], team_ids: List[str]) -> Dict[str, Any]:
+    """The variables of the players of one team, all a worker needs to build it."""
+    return {
+        **{feature: files[feature][["Date"] + team_ids] for feature in daily_features},
+        **{variable: files[variable].select(team_ids) for variable in event_variables},
+        **{
+            variable: {name: files[variable][name] for name in team_ids}
+            for variable in session_variables
+        },
+    }
+
+
+def build_team_parts(
+    team_name: str,
+    variables: Dict[str, Any],
+    team_ids: List[str],
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    compact: bool = False,
+) -> Team:
+    """Worker part of `build_teams_in_parallel`: the team without its players.
+    The arrays of its store and its session table are left in shared memory, see
+    `share_arrays`."""
+    team = build_team(team_name, variables, team_ids, True, rules, policies, compact)
+    return replace(
+        team,
+        players={},
+        store=share_arrays(team.store),
+        sessions=share_arrays(team.sessions),
+    )
 
 
-def generate_teams(path_to_data: Path) -> Dict[str, Team]:
-    team_names = ["TeamA", "TeamB"]
-    players = initialise_players(path_to_data)
-    return {team_name: generate_team(players, team_name) for team_name in team_names}
+def build_teams_in_parallel(
+    files: Dict[str, Any],
+    teams: Dict[str, List[str]],
+    workers: int,
+    lazy: bool,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    compact: bool = False,
+) -> Dict[str, Team]:
+    """The teams are built in worker processes, which hand the arrays of the
+    stores and session tables back in shared memory instead of pickling them.
+    The players are created again as views into the received arrays."""
+    with profiler.stage("build_teams") as stage, worker_pool(workers) as pool:
+        futures = {
+            team_name: pool.submit(
+                build_team_parts,
+                team_name,
+                team_variables(files, team_ids),
+                team_ids,
+                rules,
+                policies,
+                compact,
+            )
+            for team_name, team_ids in teams.items()
+        }
+        built = {}
+        for team_name, future in futures.items():
+            parts = future.result()
+            store = attach_arrays(parts.store)
+            sessions = attach_arrays(parts.sessions)
+            built[team_name] = replace(
+                parts,
+                players=team_players(store, sessions, parts.events, lazy),
+                store=store,
+                sessions=sessions,
+            )
+        stage.rows = len(built)
+    return built
+
+
+def generate_teams(
+    path_to_data: Path,
+    cache_dir: Optional[Path] = None,
+    workers: int = 1,
+    lazy: bool = False,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    compact: bool = False,
+) -> Dict[str, Team]:
+    """The teams are taken from the player ids. With lazy=True the players only
+    build the series of a feature when it is first accessed. With more than one
+    worker, files are parsed and team stores are built in worker processes. With
+    rules given, the team stores are validated and cleaned, the violations are
+    kept as the validation report of the team. All players of a team share one
+    gap-free daily calendar, days reported more than once are merged by the
+    duplicate `policies` (feature to policy, "first" for other features). With
+    compact=True the daily features are kept in a `CompactStore`, with int8
+    wellness scores and float32 loads, and their memory is logged, see
+    `log_memory_report`."""
+    with profiler.stage("generate_teams") as stage:
+        with profiler.stage("read_in_variable_files"):
+            files = read_in_variable_files(path_to_data, cache_dir, workers)
+        teams = partition_players(list(get_player_ids(files["stress"])))
+        if workers > 1 and len(teams) > 1:
+            built = build_teams_in_parallel(
+                files, teams, workers, lazy, rules, policies, compact
+            )
+        else:
+            built = {
+                team_name: build_team(
+                    team_name, files, team_ids, lazy, rules, policies, compact
+                )
+                for team_name, team_ids in teams.items()
+            }
+        stage.rows = len(built)
+    if compact:
+        log_memory_report({name: team.get_store() for name, team in built.items()})
+    return built
+
+
+def team_players(
+    store: TeamStore,
+    sessions: SessionTable,
+    events: Dict[str, EventTable],
+    lazy: bool = False,
+) -> Dict[str, SoccerPlayer]:
+    views = {
+        variable: sessions.player_sessions(variable) for variable in session_variables
+    }
+    players = build_players({**events, **views}, store.players, store, lazy)
+    return {player.name: player for player in players}
+
+
+def team_updates(
+    teams: Mapping[str, Team],
+    path_to_data: Path,
+    cache_dir: Optional[Path] = None,
+    workers: int = 1,
+    rules: Optional[List] = default_rules,
+    policies: Optional[Dict[str, str]] = default_duplicate_policies,
+) -> Dict[str, TeamUpdate]:
+    """Updates of the teams by the files in `path_to_data`, which hold only the
+    rows of the new days in the layout of the features folder. Only these rows
+    are read, validated and mapped onto the days following the last day of each
+    team, see `team_update`. Teams of the files that are not in `teams` are
+    left out."""
+    files = read_in_variable_files(path_to_data, cache_dir, workers)
+    teams_ids = partition_players(list(get_player_ids(files["stress"])))
+    updates = {}
+    for team_name, team_ids in teams_ids.items():
+        if team_name not in teams:
+            continue
+        with profiler.stage("team_store", team_name) as stage:
+            store = TeamStore.from_frames(files, team_ids, policies=policies)
+            stage.rows = len(store.index)
+        validation = None
+        if rules is not None:
+            with profiler.stage("validate_store", team_name) as stage:
+                store, validation = validate_store(store, rules)
+                stage.rows = validation.total
+        events = {
+            variable: files[variable].select(team_ids) for variable in event_variables
+        }
+        game_performance = events["performance"].to_frame()
+        updates[team_name] = team_update(
+            teams[team_name],
+            store,
+            SessionTable.from_lists(
+                team_ids, {variable: files[variable] for variable in session_variables}
+            ),
+            events,
+            game_performance,
+            partial(get_game_ts, time_stamps=game_performance["timestamp"]),
+            game_performance["timestamp"],
+            validation,
+        )
+    return updates
+
+
+def append_teams(
+    teams: Mapping[str, Team], updates: Dict[str, TeamUpdate]
+) -> Dict[str, Team]:
+    """Teams extended by their updates, see `extend_team`. Players stay lazy if
+    they were, teams without an update are kept as they are."""
+    return {
+        team_name: (
+            extend_team(
+                team,
+                updates[team_name],
+                partial(
+                    team_players,
+                    lazy=any(
+                        isinstance(player, LazySoccerPlayer)
+                        for player in team.players.values()
+                    ),
+                ),
+            )
+            if team_name in updates
+            else team
+        )
+        for team_name, team in teams.items()
+    }
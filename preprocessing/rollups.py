@@ -0,0 +1,238 @@
+"""Precomputed day, week, month and season aggregates of the daily features.
+
+For every granularity the cube holds the sum, the number of observations, the
+minimum and the maximum per player, feature and period, computed from the
+players x features x days array of a team store with one `reduceat` pass each.
+Means follow from sums and counts, team aggregates from the player aggregates,
+so queries only index into the precomputed arrays. Missing days do not count
+as observations. Seasons are calendar years, as in the PMSys data."""
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional, Union
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.daily_calendar import to_timestamp
+from preprocessing.team_store import TeamStore
+
+granularities = {"day": "D", "week": "W", "month": "M", "season": "Y"}
+rollup_aggregations = ["mean", "sum", "min", "max", "count"]
+
+
+class UnknownRollup(Exception):
+    def __init__(self, value):
+        message = (
+            f"Unknown rollup {value}, use one of {list(granularities)} and one of "
+            f"{rollup_aggregations}"
+        )
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class Rollup:
+    """Aggregates of one granularity, arrays of shape players x features x periods."""
+
+    periods: pd.PeriodIndex
+    sums: np.ndarray
+    counts: np.ndarray
+    minimums: np.ndarray
+    maximums: np.ndarray
+
+    @classmethod
+    def from_values(
+        cls, values: np.ndarray, index: pd.DatetimeIndex, frequency: str
+    ) -> "Rollup":
+        """`index` has to be sorted, the days of a period are then adjacent."""
+        days = index.to_period(frequency)
+        if len(index) == 0:
+            empty = np.empty(values.shape[:-1] + (0,))
+            return cls(days, empty, empty, empty, empty)
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        observed = ~np.isnan(values)
+        return cls(
+            days[starts],
+            np.add.reduceat(np.where(observed, values, 0.0), starts, axis=-1),
+            np.add.reduceat(observed.astype(np.float64), starts, axis=-1),
+            np.fmin.reduceat(values, starts, axis=-1),
+            np.fmax.reduceat(values, starts, axis=-1),
+        )
+
+    @classmethod
+    def stack(cls, rollups: List["Rollup"]) -> "Rollup":
+        """Rollup of the features of all rollups, which cover the same days."""
+        return cls(
+            rollups[0].periods,
+            *(
+                np.concatenate([getattr(rollup, name) for rollup in rollups], axis=1)
+                for name in ["sums", "counts", "minimums", "maximums"]
+            ),
+        )
+
+    def merge(self, other: "Rollup") -> "Rollup":
+        """Rollup of the days of both rollups, `other` holding the later days. A
+        period continued by `other` is combined."""
+        if len(self.periods) == 0 or len(other.periods) == 0:
+            return other if len(self.periods) == 0 else self
+        overlap = int(self.periods[-1] == other.periods[0])
+
+        def combine(mine: np.ndarray, theirs: np.ndarray, reduce) -> np.ndarray:
+            merged = np.concatenate([mine, theirs[..., overlap:]], axis=-1)
+            if overlap:
+                merged[..., len(self.periods) - 1] = reduce(
+                    mine[..., -1], theirs[..., 0]
+                )
+            return merged
+
+        return Rollup(
+            self.periods.append(other.periods[overlap:]),
+            combine(self.sums, other.sums, np.add),
+            combine(self.counts, other.counts, np.add),
+            combine(self.minimums, other.minimums, np.fmin),
+            combine(self.maximums, other.maximums, np.fmax),
+        )
+
+    def aggregate(self, aggregation: str, team: bool = False) -> np.ndarray:
+        """Array of one aggregation. With team=True, the players are combined and
+        the result has the shape features x periods."""
+        if aggregation == "min":
+            return np.fmin.reduce(self.minimums, axis=0) if team else self.minimums
+        if aggregation == "max":
+            return np.fmax.reduce(self.maximums, axis=0) if team else self.maximums
+        sums = self.sums.sum(axis=0) if team else self.sums
+        counts = self.counts.sum(axis=0) if team else self.counts
+        if aggregation == "sum":
+            return sums
+        if aggregation == "count":
+            return counts
+        if aggregation == "mean":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(counts > 0, sums / counts, np.nan)
+        raise UnknownRollup(aggregation)
+
+
+@dataclass(frozen=True)
+class RollupCube:
+    players: List[str]
+    features: List[str]
+    rollups: Dict[str, Rollup]
+
+    @cached_property
+    def player_positions(self) -> Dict[str, int]:
+        return {player: position for position, player in enumerate(self.players)}
+
+    @cached_property
+    def feature_positions(self) -> Dict[str, int]:
+        return {feature: position for position, feature in enumerate(self.features)}
+
+    def rollup(self, granularity: str) -> Rollup:
+        if granularity not in self.rollups:
+            raise UnknownRollup(granularity)
+        return self.rollups[granularity]
+
+    def query(
+        self,
+        feature: str,
+        aggregation: str = "mean",
+        granularity: str = "week",
+        players: Optional[List[str]] = None,
+        start=None,
+        end=None,
+    ) -> pd.DataFrame:
+        """Periods x players frame of one aggregate of one feature. Periods
+        overlapping the days from `start` up to, but not including, `end` are
+        returned."""
+        rollup = self.rollup(granularity)
+        periods = self.period_positions(rollup, start, end)
+        players = self.players if players is None else list(players)
+        values = rollup.aggregate(aggregation)[
+            np.ix_(
+                [self.player_positions[player] for player in players],
+                [self.feature_positions[feature]],
+                periods,
+            )
+        ]
+        return pd.DataFrame(
+            values[:, 0].T, index=rollup.periods[periods], columns=players, copy=False
+        )
+
+    def team_query(
+        self,
+        features: Union[str, List[str]],
+        aggregation: str = "mean",
+        granularity: str = "week",
+        start=None,
+        end=None,
+    ) -> pd.DataFrame:
+        """Periods x features frame of aggregates over all players of the team."""
+        features = [features] if isinstance(features, str) else list(features)
+        rollup = self.rollup(granularity)
+        periods = self.period_positions(rollup, start, end)
+        values = rollup.aggregate(aggregation, team=True)[
+            np.ix_([self.feature_positions[feature] for feature in features], periods)
+        ]
+        return pd.DataFrame(
+            values.T, index=rollup.periods[periods], columns=features, copy=False
+        )
+
+    @staticmethod
+    def period_positions(rollup: Rollup, start=None, end=None) -> np.ndarray:
+        keep = np.ones(len(rollup.periods), dtype=bool)
+        if start is not None:
+            keep &= rollup.periods.end_time >= to_timestamp(start)
+        if end is not None:
+            keep &= rollup.periods.start_time < to_timestamp(end)
+        return np.flatnonzero(keep)
+
+    def append(self, values: np.ndarray, index: pd.DatetimeIndex) -> "RollupCube":
+        """Cube extended by new days following the days already rolled up. Only
+        the new days are aggregated, a period they continue is updated."""
+        return RollupCube(
+            self.players,
+            self.features,
+            {
+                granularity: rollup.merge(
+                    Rollup.from_values(values, index, granularities[granularity])
+                )
+                for granularity, rollup in self.rollups.items()
+            },
+        )
+
+    def merge(self, other: "RollupCube") -> "RollupCube":
+        """Cube of the days of both cubes, `other` holding the later days."""
+        return RollupCube(
+            self.players,
+            self.features,
+            {
+                granularity: rollup.merge(other.rollups[granularity])
+                for granularity, rollup in self.rollups.items()
+            },
+        )
+
+    @classmethod
+    def from_store(cls, store: TeamStore) -> "RollupCube":
+        """Rolled up feature by feature, so compact stores are only converted to
+        float64 one feature at a time."""
+        index, order = store.index, slice(None)
+        if not index.is_monotonic_increasing:
+            order = np.argsort(index, kind="stable")
+            index = index[order]
+        rollups: Dict[str, List[Rollup]] = {
+            granularity: [] for granularity in granularities
+        }
+        for feature in store.features:
+            values = np.asarray(store.feature_values(feature), dtype=np.float64)
+            values = values[:, None, order]
+            for granularity, frequency in granularities.items():
+                rollups[granularity].append(
+                    Rollup.from_values(values, index, frequency)
+                )
+        return cls(
+            store.players,
+            store.features,
+            {
+                granularity: Rollup.stack(features)
+                for granularity, features in rollups.items()
+            },
+        )
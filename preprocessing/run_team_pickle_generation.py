@@ -2,18 +2,36 @@ from typing import Dict
 from pathlib import Path
 import pickle
 import sys
+
 sys.path.append(str(Path(__file__).parent.parent))
 
+from preprocessing.columnar import append_segments, load_teams, save_teams
 from preprocessing.data_loader import Team
-from preprocessing.read_in_data import generate_teams
+from preprocessing.read_in_data import generate_teams, team_updates
 
 
 def save_as_pickle(path_to_save: Path, teams_obj: Dict[str, Team]):
     pickle.dump(teams_obj, open(path_to_save / "teams.pkl", "wb"))
 
 
+def save_as_columnar(path_to_save: Path, teams_obj: Dict[str, Team]):
+    save_teams(path_to_save / "teams", teams_obj)
+
+
+def append_new_days(path_to_save: Path, path_to_new_files: Path):
+    """Append the rows of the new days in `path_to_new_files` to the saved teams
+    as segments, without rewriting them."""
+    teams = load_teams(path_to_save / "teams")
+    append_segments(path_to_save / "teams", team_updates(teams, path_to_new_files))
+
+
 if __name__ == "__main__":
     path_to_folder = Path(__file__).parent.parent / "input" / "features"
     path_to_save_folder = Path(__file__).parent.parent / "input"
-    teams = generate_teams(path_to_folder)
-    save_as_pickle(path_to_save_folder, teams)
+    if len(sys.argv) > 1:
+        append_new_days(path_to_save_folder, Path(sys.argv[1]))
+    else:
+        teams = generate_teams(
+            path_to_folder, cache_dir=path_to_folder / ".ingest_cache"
+        )
+        save_as_columnar(path_to_save_folder, teams)
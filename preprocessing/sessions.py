@@ -0,0 +1,221 @@
+"""Ragged columnar table of the training sessions of a team.
+
+The sRPE, RPE and duration of all sessions of all players are kept in flat
+arrays, the sessions of player p are the rows `offsets[p]:offsets[p + 1]`. The
+per player series handed out by the table are views into these arrays. Session
+dates are known for the workbooks; the sessions of the features folder come
+without dates and are marked NaT, they are left out of the daily aggregates.
+Players without any dated session have no daily aggregates at all.
+
+Daily aggregates of all players are computed in one `bincount` pass per
+aggregate:
+
+    daily = sessions.daily(store.calendar)
+    daily.feature("srpe_sum")"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.daily_calendar import DailyCalendar, to_dates, to_timestamp
+from preprocessing.events import appended_rows, group_rows
+from preprocessing.team_store import TeamStore
+
+session_variables = ["srpe", "rpe", "duration"]
+session_features = ["srpe_sum", "rpe_mean", "duration_sum", "session_count"]
+
+
+@dataclass(frozen=True)
+class SessionTable:
+    players: List[str]
+    offsets: np.ndarray
+    dates: np.ndarray
+    values: Dict[str, np.ndarray]
+
+    @cached_property
+    def player_positions(self) -> Dict[str, int]:
+        return {player: position for position, player in enumerate(self.players)}
+
+    @cached_property
+    def player_codes(self) -> np.ndarray:
+        """Position of the player of every session."""
+        return np.repeat(np.arange(len(self.players)), np.diff(self.offsets))
+
+    @property
+    def dated(self) -> bool:
+        return len(self.dates) == 0 or not np.isnat(self.dates).all()
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def rows(self, player_name: str) -> slice:
+        position = self.player_positions[player_name]
+        return slice(int(self.offsets[position]), int(self.offsets[position + 1]))
+
+    def series(self, player_name: str, variable: str) -> pd.Series:
+        """Sessions of one player, indexed by their dates if they are known."""
+        rows = self.rows(player_name)
+        index = (
+            pd.DatetimeIndex(self.dates[rows], name="Date")
+            if self.dated
+            else pd.RangeIndex(rows.stop - rows.start)
+        )
+        return pd.Series(
+            self.values[variable][rows], index=index, name=variable, copy=False
+        )
+
+    def player_sessions(self, variable: str) -> Dict[str, pd.Series]:
+        return {player: self.series(player, variable) for player in self.players}
+
+    def query(
+        self, players: Optional[List[str]] = None, start=None, end=None
+    ) -> pd.DataFrame:
+        """Sessions of the players from `start` up to, but not including, `end`,
+        one row per session."""
+        keep = np.ones(len(self), dtype=bool)
+        if players is not None:
+            keep &= np.isin(
+                self.player_codes, [self.player_positions[p] for p in players]
+            )
+        if start is not None:
+            keep &= self.dates >= np.datetime64(to_timestamp(start).floor("D"))
+        if end is not None:
+            keep &= self.dates < np.datetime64(to_timestamp(end).floor("D"))
+        return self.to_frame(np.flatnonzero(keep))
+
+    def to_frame(self, rows: Optional[np.ndarray] = None) -> pd.DataFrame:
+        rows = np.arange(len(self)) if rows is None else rows
+        columns = {
+            "player_name": pd.Categorical.from_codes(
+                self.player_codes[rows], categories=self.players
+            )
+        }
+        if self.dated:
+            columns["date"] = self.dates[rows]
+        for variable, values in self.values.items():
+            columns[variable] = values[rows]
+        return pd.DataFrame(columns, copy=False)
+
+    def daily(self, calendar: DailyCalendar) -> TeamStore:
+        """Daily sRPE sum, mean RPE, minutes and number of sessions of all players
+        on the calendar. Days without sessions have sums and counts of 0 and no
+        mean RPE; sessions outside of the calendar are left out. Players without
+        any dated session, e.g. all players of an undated table, have no values
+        on any day."""
+        days = calendar.days
+        positions = calendar.positions(pd.DatetimeIndex(self.dates))
+        flat = np.where(positions >= 0, self.player_codes * days + positions, -1)
+        size = len(self.players) * days
+
+        def total(values: Optional[np.ndarray] = None) -> np.ndarray:
+            keep = flat >= 0
+            if values is not None:
+                keep &= ~np.isnan(values)
+                values = values[keep]
+            return np.bincount(flat[keep], weights=values, minlength=size)
+
+        rpe_counts = total(np.where(np.isnan(self.values["rpe"]), np.nan, 1.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rpe_mean = np.where(
+                rpe_counts > 0, total(self.values["rpe"]) / rpe_counts, np.nan
+            )
+        values = np.stack(
+            [
+                total(self.values["srpe"]),
+                rpe_mean,
+                total(self.values["duration"]),
+                total(),
+            ]
+        )
+        values = values.reshape(len(session_features), len(self.players), days)
+        dated = np.bincount(
+            self.player_codes[~np.isnat(self.dates)], minlength=len(self.players)
+        )
+        values[:, dated == 0] = np.nan
+        return TeamStore.from_arrays(
+            self.players, session_features, calendar.index, values.transpose(1, 0, 2)
+        )
+
+    def append(self, other: "SessionTable") -> "SessionTable":
+        """Table with the sessions of `other` added after the sessions of the same
+        player, players of `other` that are not in the table are left out."""
+        new_rows, counts = group_rows(
+            other.offsets, pd.Index(other.players).get_indexer(self.players)
+        )
+        rows = appended_rows(self.offsets, counts)
+
+        def appended(column: np.ndarray, new_column: np.ndarray) -> np.ndarray:
+            return np.concatenate([column, new_column[new_rows]])[rows]
+
+        return SessionTable(
+            self.players,
+            self.offsets + np.concatenate([[0], np.cumsum(counts)]),
+            appended(self.dates, other.dates),
+            {
+                variable: appended(values, other.values[variable])
+                for variable, values in self.values.items()
+            },
+        )
+
+    @classmethod
+    def from_lists(
+        cls, players: List[str], sessions: Dict[str, Dict[str, List]]
+    ) -> "SessionTable":
+        """Table of undated sessions given as lists per variable and player, as in
+        the json files of the features folder. A player's shorter lists are padded
+        with missing values."""
+        players = list(players)
+        counts = np.array(
+            [
+                max(len(sessions[variable].get(player, [])) for variable in sessions)
+                for player in players
+            ],
+            dtype=np.int64,
+        )
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        values = {}
+        for variable in session_variables:
+            column = np.full(offsets[-1], np.nan)
+            for position, player in enumerate(players):
+                player_values = np.asarray(
+                    sessions.get(variable, {}).get(player, []), dtype=np.float64
+                )
+                start = offsets[position]
+                column[start : start + len(player_values)] = player_values
+            values[variable] = column
+        return cls(
+            players, offsets, np.full(offsets[-1], np.datetime64("NaT", "ns")), values
+        )
+
+    @classmethod
+    def from_series(
+        cls,
+        players: List[str],
+        sessions: Dict[str, List[pd.Series]],
+        date_format: str = "%d.%m.%Y",
+    ) -> "SessionTable":
+        """Table of dated sessions given as one series per variable and player,
+        indexed by the session dates, as in the record sheets of the workbooks."""
+        srpe = sessions["srpe"]
+        offsets = np.concatenate(
+            [[0], np.cumsum([len(series) for series in srpe])]
+        ).astype(np.int64)
+
+        def concatenate(arrays) -> np.ndarray:
+            return np.concatenate(list(arrays) or [np.empty(0)])
+
+        dates = to_dates(concatenate(np.asarray(series.index) for series in srpe))
+        return cls(
+            list(players),
+            offsets,
+            dates.values.astype("datetime64[ns]"),
+            {
+                variable: concatenate(
+                    series.to_numpy(dtype=np.float64) for series in sessions[variable]
+                )
+                for variable in session_variables
+            },
+        )
@@ -0,0 +1,98 @@
+"""NumPy arrays in shared memory, used to hand large arrays from worker processes
+back to the parent without pickling them.
+
+A worker leaves the arrays of a store or a session table in shared memory and
+sends back only the names of the blocks; the parent maps the blocks and keeps
+the arrays as they are, without copying them:
+
+    with worker_pool(workers) as pool:
+        shared = pool.submit(build, ...).result()  # share_arrays(store)
+    store = attach_arrays(shared)"""
+
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Tuple, TypeVar
+
+import numpy as np  # type: ignore
+
+Container = TypeVar("Container")
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Array left by a worker in the shared memory block `name`, pickled in place
+    of the array."""
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @classmethod
+    def share(cls, values: np.ndarray) -> "SharedArray":
+        memory = SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            np.copyto(
+                np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf), values
+            )
+        finally:
+            memory.close()
+        return cls(memory.name, values.shape, values.dtype.str)
+
+    def attach(self) -> np.ndarray:
+        """The array mapped from the block. The name of the block is released at
+        once, its memory when the array and all views of it are gone."""
+        memory = SharedMemory(name=self.name)
+        memory.unlink()
+        values = np.ndarray(self.shape, dtype=self.dtype, buffer=memory.buf)
+        weakref.finalize(values, memory.close)
+        return values
+
+
+def shared(value: Any) -> Any:
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        return SharedArray.share(value)
+    if isinstance(value, dict):
+        return {key: shared(item) for key, item in value.items()}
+    return value
+
+
+def attached(value: Any) -> Any:
+    if isinstance(value, SharedArray):
+        return value.attach()
+    if isinstance(value, dict):
+        return {key: attached(item) for key, item in value.items()}
+    return value
+
+
+def share_arrays(container: Container) -> Container:
+    """Copy of the dataclass `container` whose arrays, also those held in dict
+    fields, are left in shared memory. Arrays of objects are kept as they are."""
+    return replace(
+        container,
+        **{
+            field.name: shared(getattr(container, field.name))
+            for field in fields(container)
+        },
+    )
+
+
+def attach_arrays(container: Container) -> Container:
+    """Inverse of `share_arrays`, to be called once in the parent."""
+    return replace(
+        container,
+        **{
+            field.name: attached(getattr(container, field.name))
+            for field in fields(container)
+        },
+    )
+
+
+def worker_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool whose workers can share arrays with the parent. The resource
+    tracker of the parent is started first, so that the workers register their
+    blocks with it and `SharedArray.attach` unregisters them again."""
+    resource_tracker.ensure_running()
+    return ProcessPoolExecutor(workers)
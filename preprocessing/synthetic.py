@@ -0,0 +1,255 @@
+"""Synthetic data in the layout of the PMSys export, for tests and benchmarks.
+
+`write_feature_folder` writes the features folder read by `read_in_data`,
+`write_team_workbooks` writes the player workbooks read by `data_loader`."""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.compact import score_features
+from preprocessing.data_loader import record_columns, wellness_features
+from preprocessing.team_store import daily_features
+
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    teams: int = 2
+    players: int = 25
+    days: int = 365
+    start: str = "2020-01-01"
+    missing_rate: float = 0.2
+    duplicate_rate: float = 0.01
+    injury_rate: float = 0.005
+    illness_rate: float = 0.005
+    game_rate: float = 0.1
+    seed: int = 0
+
+    @property
+    def team_names(self) -> List[str]:
+        return [f"Team{chr(ord('A') + team)}" for team in range(self.teams)]
+
+
+def letters(number: int) -> str:
+    """Spell a number with letters only, the workbook loader skips player names
+    containing digits."""
+    spelled = ""
+    while True:
+        spelled = chr(ord("a") + number % 26) + spelled
+        number //= 26
+        if number == 0:
+            return spelled
+
+
+def player_ids(config: SyntheticConfig) -> List[str]:
+    return [
+        f"{team}-{player:04d}"
+        for team in config.team_names
+        for player in range(config.players)
+    ]
+
+
+def synthetic_dates(config: SyntheticConfig, rng: np.random.Generator) -> List[str]:
+    """Daily dates as day.month.year strings. A share of `duplicate_rate` of the
+    days repeats the day before instead, so dates are duplicated and skipped as in
+    the real export."""
+    dates = pd.date_range(config.start, periods=config.days)
+    duplicated = np.flatnonzero(rng.random(config.days) < config.duplicate_rate)
+    duplicated = duplicated[duplicated > 0]
+    positions = np.arange(config.days)
+    positions[duplicated] = positions[duplicated - 1]
+    return list(dates[positions].strftime("%d.%m.%Y"))
+
+
+def synthetic_feature(
+    feature: str, shape: Tuple[int, int], rng: np.random.Generator, missing_rate: float
+) -> np.ndarray:
+    if feature in score_features:
+        values = rng.integers(1, 6, size=shape).astype(np.float64)
+        if feature == "readiness":
+            values = rng.integers(0, 11, size=shape).astype(np.float64)
+    elif feature == "sleep_duration":
+        values = np.round(rng.normal(7.5, 1.0, size=shape), 1)
+    else:
+        values = np.round(rng.gamma(2.0, 200.0, size=shape), 1)
+    values[rng.random(shape) < missing_rate] = np.nan
+    return values
+
+
+def synthetic_events(
+    players: List[str],
+    dates: List[str],
+    rate: float,
+    rng: np.random.Generator,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Players and day positions of randomly drawn events."""
+    occurs = rng.random((len(players), len(dates))) < rate
+    player_positions, day_positions = np.nonzero(occurs)
+    return np.array(players, dtype=object)[player_positions], day_positions
+
+
+def write_feature_folder(
+    path_to_folder: Path, config: SyntheticConfig = SyntheticConfig()
+):
+    """Features folder with one csv file per daily feature, json files with the
+    sessions and csv files with injuries, illness and game performance."""
+    rng = np.random.default_rng(config.seed)
+    path_to_folder.mkdir(parents=True, exist_ok=True)
+    players = player_ids(config)
+    dates = synthetic_dates(config, rng)
+    timestamps = pd.to_datetime(dates, format="%d.%m.%Y")
+    for feature in daily_features:
+        values = synthetic_feature(
+            feature, (len(dates), len(players)), rng, config.missing_rate
+        )
+        frame = pd.DataFrame(values, columns=players)
+        frame.insert(0, "Date", dates)
+        frame.to_csv(path_to_folder / f"{feature}.csv", index=False)
+
+    sessions = rng.integers(0, 3, size=len(players))
+    for variable, low, high in [
+        ("srpe", 50, 900),
+        ("rpe", 1, 10),
+        ("duration", 20, 120),
+    ]:
+        with open(path_to_folder / f"{variable}.json", "w") as json_file:
+            json.dump(
+                {
+                    variable: {
+                        player: rng.integers(
+                            low, high, size=count * len(dates)
+                        ).tolist()
+                        for player, count in zip(players, sessions)
+                    }
+                },
+                json_file,
+            )
+
+    event_players, days = synthetic_events(players, dates, config.injury_rate, rng)
+    pd.DataFrame(
+        {
+            "player_name": event_players,
+            "type": [json.dumps({"knee": "minor"})] * len(days),
+            "timestamp": timestamps[days].strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    ).to_csv(path_to_folder / "injuries.csv", index=False)
+    event_players, days = synthetic_events(players, dates, config.illness_rate, rng)
+    pd.DataFrame(
+        {
+            "player_name": event_players,
+            "problems": [json.dumps(["fever"])] * len(days),
+            "timestamp": timestamps[days].strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    ).to_csv(path_to_folder / "illness.csv", index=False)
+    event_players, days = synthetic_events(players, dates, config.game_rate, rng)
+    pd.DataFrame(
+        {
+            "player_name": event_players,
+            "team_performance": rng.integers(1, 6, size=len(days)),
+            "offensive_performance": rng.integers(1, 6, size=len(days)),
+            "defensive_performance": rng.integers(1, 6, size=len(days)),
+            "timestamp": timestamps[days].strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    ).to_csv(path_to_folder / "performance.csv", index=False)
+
+
+def player_record_sheet(
+    dates: List[str], rng: np.random.Generator, config: SyntheticConfig
+) -> pd.DataFrame:
+    """Record sheet of one player. Every day has one row per training session, the
+    date and the daily values are only given in the first row of a day. The last
+    row holds the column totals, as in the export."""
+    sessions = rng.integers(1, 3, size=len(dates))
+    first_rows = np.concatenate([[0], np.cumsum(sessions)[:-1]])
+    rows = int(sessions.sum()) + 1
+    sheet = {}
+    for column in record_columns:
+        if column == "Date":
+            values = np.full(rows, None, dtype=object)
+            values[first_rows] = dates
+        elif column in ["SRPE", "RPE", "Duration [min]"]:
+            values = rng.integers(1, 600, size=rows).astype(np.float64)
+        else:
+            values = np.full(rows, np.nan)
+            values[first_rows] = np.round(rng.gamma(2.0, 200.0, size=len(dates)), 1)
+        if column == "Date":
+            values[-1] = None
+        else:
+            values[-1] = np.nansum(values[:-1])
+        sheet[column] = values
+    return pd.DataFrame(sheet)
+
+
+def write_team_workbooks(
+    path_to_folder: Path, config: SyntheticConfig = SyntheticConfig()
+) -> Tuple[List[List[Path]], List[Dict]]:
+    """One workbook per team in the PMSys layout. Returns the workbook paths and
+    the team descriptions expected by `data_loader.generate_teams`."""
+    rng = np.random.default_rng(config.seed)
+    path_to_folder.mkdir(parents=True, exist_ok=True)
+    paths, teams = [], []
+    for team_name in config.team_names:
+        names = [
+            f"{team_name} Player {letters(player)}" for player in range(config.players)
+        ]
+        dates = synthetic_dates(config, rng)
+        path_to_workbook = path_to_folder / f"{team_name}.xlsx"
+        with pd.ExcelWriter(path_to_workbook, engine="openpyxl") as writer:
+            event_players, days = synthetic_events(names, dates, config.game_rate, rng)
+            pd.DataFrame(
+                {
+                    "Date": np.array(dates, dtype=object)[days],
+                    "Player": event_players,
+                    "Team Overall Performance": rng.integers(1, 6, size=len(days)),
+                    "Individual Offensive Performance": rng.integers(
+                        1, 6, size=len(days)
+                    ),
+                    "Individual Defensive Performance": rng.integers(
+                        1, 6, size=len(days)
+                    ),
+                }
+            ).to_excel(writer, sheet_name="Game Performance", index=False)
+            event_players, days = synthetic_events(
+                names, dates, config.injury_rate, rng
+            )
+            pd.DataFrame(
+                {
+                    "Date": np.array(dates, dtype=object)[days],
+                    "Player": event_players,
+                    "Injuries": ["knee"] * len(days),
+                }
+            ).to_excel(writer, sheet_name="Injury", index=False)
+            event_players, days = synthetic_events(
+                names, dates, config.illness_rate, rng
+            )
+            pd.DataFrame(
+                {
+                    "Date": np.array(dates, dtype=object)[days],
+                    "Player": event_players,
+                    "Problems": ["fever"] * len(days),
+                }
+            ).to_excel(writer, sheet_name="Illness", index=False)
+            for sheet_name, feature in wellness_features.items():
+                values = synthetic_feature(
+                    feature, (len(dates), len(names)), rng, config.missing_rate
+                )
+                frame = pd.DataFrame(values, columns=names)
+                frame.insert(0, f"{sheet_name} Data", dates)
+                frame.to_excel(writer, sheet_name=sheet_name, index=False)
+            for name in names:
+                player_record_sheet(dates, rng, config).to_excel(
+                    writer, sheet_name=name, index=False
+                )
+        paths.append([path_to_workbook])
+        teams.append(
+            {
+                "team_name": team_name,
+                "pseudonym": team_name,
+                "players": {str(position): name for position, name in enumerate(names)},
+            }
+        )
+    return paths, teams
@@ -0,0 +1,187 @@
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional, Union
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.daily_calendar import (
+    DailyCalendar,
+    default_duplicate_policies,
+    duplicate_policy,
+    resolve,
+)
+
+daily_features = [
+    "daily_load",
+    "atl",
+    "weekly_load",
+    "monotony",
+    "strain",
+    "acwr",
+    "ctl28",
+    "ctl42",
+    "fatigue",
+    "mood",
+    "readiness",
+    "sleep_duration",
+    "sleep_quality",
+    "soreness",
+    "stress",
+]
+
+
+@dataclass(frozen=True)
+class TeamStore:
+    """Dense player x feature x day representation of the daily features of a team.
+
+    All players share one date index, the per player series handed out by the
+    store are views into `values` and do not copy any data. Stores built by the
+    loaders are indexed by a gap-free daily calendar."""
+
+    players: List[str]
+    features: List[str]
+    index: pd.DatetimeIndex
+    values: np.ndarray
+    mask: np.ndarray
+
+    @cached_property
+    def player_positions(self) -> Dict[str, int]:
+        return {player: position for position, player in enumerate(self.players)}
+
+    @cached_property
+    def feature_positions(self) -> Dict[str, int]:
+        return {feature: position for position, feature in enumerate(self.features)}
+
+    @cached_property
+    def calendar(self) -> DailyCalendar:
+        return DailyCalendar.from_index(self.index)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.mask.nbytes
+
+    def player_position(self, player_name: str) -> int:
+        return self.player_positions[player_name]
+
+    def feature_position(self, feature_name: str) -> int:
+        return self.feature_positions[feature_name]
+
+    def day_position(self, date) -> int:
+        """Position of the day of `date`, -1 outside of the calendar."""
+        return self.calendar.position(date)
+
+    def feature_values(self, feature_name: str) -> np.ndarray:
+        """Players x days view of one feature."""
+        return self.values[:, self.feature_position(feature_name)]
+
+    def feature_mask(self, feature_name: str) -> np.ndarray:
+        """Players x days view of the missing days of one feature."""
+        return self.mask[:, self.feature_position(feature_name)]
+
+    def series(self, player_name: str, feature_name: str) -> pd.Series:
+        return pd.Series(
+            self.values[
+                self.player_position(player_name), self.feature_position(feature_name)
+            ],
+            index=self.index,
+            name=player_name,
+            copy=False,
+        )
+
+    def feature(self, feature_name: str) -> pd.DataFrame:
+        """Days x players frame of one feature."""
+        return pd.DataFrame(
+            self.values[:, self.feature_position(feature_name)].T,
+            index=self.index,
+            columns=self.players,
+            copy=False,
+        )
+
+    def player_frame(self, player_name: str) -> pd.DataFrame:
+        """Days x features frame of one player."""
+        return pd.DataFrame(
+            self.values[self.player_position(player_name)].T,
+            index=self.index,
+            columns=self.features,
+            copy=False,
+        )
+
+    def block(
+        self,
+        players: Optional[List[str]] = None,
+        features: Optional[List[str]] = None,
+        days: Union[slice, np.ndarray] = slice(None),
+    ) -> np.ndarray:
+        """Players x features x days array of the selection, gathered in one
+        indexing operation."""
+        player_positions = (
+            np.arange(len(self.players))
+            if players is None
+            else np.array([self.player_position(player) for player in players])
+        )
+        feature_positions = (
+            np.arange(len(self.features))
+            if features is None
+            else np.array([self.feature_position(feature) for feature in features])
+        )
+        day_positions = np.arange(len(self.index))[days]
+        return self.values[np.ix_(player_positions, feature_positions, day_positions)]
+
+    def append(self, values: np.ndarray, index: pd.DatetimeIndex) -> "TeamStore":
+        """Store extended by new days following its last day, `values` holds the
+        players x features x new days array of the same players and features."""
+        values = np.asarray(values, dtype=np.float64)
+        return TeamStore(
+            self.players,
+            self.features,
+            self.index.append(index),
+            np.concatenate([self.values, values], axis=-1),
+            np.concatenate([self.mask, np.isnan(values)], axis=-1),
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        players: List[str],
+        features: List[str],
+        index: pd.DatetimeIndex,
+        values: np.ndarray,
+        mask: Optional[np.ndarray] = None,
+    ) -> "TeamStore":
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        if mask is None:
+            mask = np.isnan(values)
+        return cls(list(players), list(features), index, values, mask)
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: Dict[str, pd.DataFrame],
+        players: List[str],
+        features: List[str] = daily_features,
+        date_column: str = "Date",
+        date_format: str = "%d.%m.%Y",
+        policies: Optional[Dict[str, str]] = default_duplicate_policies,
+    ) -> "TeamStore":
+        """Build the store from one days x players frame per feature, as found in
+        the features folder. The rows are mapped onto the daily calendar of the
+        dates of the first feature, rows of the same day are merged by the
+        duplicate policy of the feature."""
+        dates = frames[features[0]][date_column].values
+        calendar = DailyCalendar.from_dates(dates, date_format=date_format)
+        positions = calendar.positions(dates, date_format)
+        players = list(players)
+        values = np.empty((len(players), len(features), calendar.days))
+        for position, feature in enumerate(features):
+            values[:, position, :] = resolve(
+                frames[feature][players].to_numpy(dtype=np.float64).T,
+                positions,
+                calendar.days,
+                duplicate_policy(feature, policies),
+            )
+        return cls.from_arrays(players, features, calendar.index, values)
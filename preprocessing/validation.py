@@ -0,0 +1,217 @@
+"""Declarative validation and cleaning of the daily features of a team.
+
+A rule checks one feature of all players at once, on a players x days array, and
+returns the cleaned array together with the values it found violating. The
+violations are counted per rule, feature and player into a compact report:
+
+    cleaned, report = apply_rules(features, index, players, default_rules)
+
+Rules either fix values (`UnitRule`), drop them by setting them missing
+(`action="drop"`), clip them to the allowed range (`action="clip"`) or only flag
+them (`action="flag"`)."""
+
+import warnings
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from preprocessing.team_store import TeamStore
+
+rule_actions = ["drop", "clip", "flag"]
+report_columns = ["rule", "feature", "player", "violations"]
+
+
+class UnknownRuleAction(Exception):
+    def __init__(self, value):
+        message = f"Unknown rule action {value}, use one of {rule_actions}"
+        super().__init__(message)
+
+
+def act(values: np.ndarray, violations: np.ndarray, action: str, clipped=None):
+    if action == "drop":
+        return np.where(violations, np.nan, values)
+    if action == "clip":
+        return clipped if clipped is not None else values
+    if action == "flag":
+        return values
+    raise UnknownRuleAction(action)
+
+
+@dataclass(frozen=True)
+class RangeRule:
+    feature: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    action: str = "drop"
+
+    @property
+    def name(self) -> str:
+        return "range"
+
+    def apply(self, values: np.ndarray, index: pd.Index):
+        with np.errstate(invalid="ignore"):
+            violations = np.zeros(values.shape, dtype=bool)
+            if self.minimum is not None:
+                violations |= values < self.minimum
+            if self.maximum is not None:
+                violations |= values > self.maximum
+        clipped = np.clip(values, self.minimum, self.maximum)
+        return act(values, violations, self.action, clipped), violations
+
+
+@dataclass(frozen=True)
+class UnitRule:
+    """Values above `above` are taken to be given in another unit and are
+    multiplied by `factor`, e.g. sleep reported in minutes instead of hours."""
+
+    feature: str
+    above: float
+    factor: float
+
+    @property
+    def name(self) -> str:
+        return "unit"
+
+    def apply(self, values: np.ndarray, index: pd.Index):
+        with np.errstate(invalid="ignore"):
+            violations = values > self.above
+        return np.where(violations, values * self.factor, values), violations
+
+
+@dataclass(frozen=True)
+class OutlierRule:
+    """Values further than `threshold` robust standard deviations (1.4826 times
+    the median absolute deviation) from the median of the player."""
+
+    feature: str
+    threshold: float = 5.0
+    action: str = "flag"
+
+    @property
+    def name(self) -> str:
+        return "outlier"
+
+    def apply(self, values: np.ndarray, index: pd.Index):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            median = np.nanmedian(values, axis=-1, keepdims=True)
+            spread = 1.4826 * np.nanmedian(
+                np.abs(values - median), axis=-1, keepdims=True
+            )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            violations = np.abs(values - median) > self.threshold * spread
+        violations &= spread > 0
+        return act(values, violations, self.action), violations
+
+
+@dataclass(frozen=True)
+class DuplicateRule:
+    """Values on days whose date already occurred earlier in the index. With
+    action="drop" only the first value of a date is kept."""
+
+    feature: str
+    action: str = "flag"
+
+    @property
+    def name(self) -> str:
+        return "duplicate"
+
+    def apply(self, values: np.ndarray, index: pd.Index):
+        duplicated = np.asarray(pd.Index(index).duplicated(keep="first"))
+        violations = duplicated & ~np.isnan(values)
+        return act(values, violations, self.action), violations
+
+
+wellness_scores = ["fatigue", "mood", "sleep_quality", "soreness", "stress"]
+load_features = ["daily_load", "atl", "weekly_load", "strain", "ctl28", "ctl42"]
+
+default_rules: List = [
+    *[RangeRule(feature, 1, 5) for feature in wellness_scores],
+    RangeRule("readiness", 0, 10),
+    UnitRule("sleep_duration", 24, 1 / 60),
+    RangeRule("sleep_duration", 0, 24),
+    *[RangeRule(feature, 0) for feature in load_features],
+    RangeRule("monotony", 0),
+    RangeRule("acwr", 0),
+    OutlierRule("daily_load"),
+    DuplicateRule("daily_load"),
+    DuplicateRule("stress"),
+]
+
+
+@dataclass(frozen=True)
+class ValidationReport:
+    """Number of violations per rule, feature and player; only rules that were
+    violated are listed."""
+
+    violations: pd.DataFrame
+
+    def __len__(self) -> int:
+        return len(self.violations)
+
+    @property
+    def total(self) -> int:
+        return int(self.violations["violations"].sum())
+
+    def summary(self) -> pd.DataFrame:
+        """Violations per rule and feature, summed over the players."""
+        return (
+            self.violations.groupby(["rule", "feature"], sort=False)["violations"]
+            .sum()
+            .reset_index()
+        )
+
+    @classmethod
+    def concat(cls, reports: Sequence["ValidationReport"]) -> "ValidationReport":
+        frames = [report.violations for report in reports if len(report)]
+        if not frames:
+            return cls(pd.DataFrame(columns=report_columns))
+        return cls(pd.concat(frames, ignore_index=True))
+
+
+def apply_rules(
+    features: Dict[str, np.ndarray],
+    index: pd.Index,
+    players: List[str],
+    rules: List = default_rules,
+) -> Tuple[Dict[str, np.ndarray], ValidationReport]:
+    """Run the rules in order over the players x days arrays of `features`, rules
+    of features that are not given are skipped. The input arrays are not
+    changed."""
+    cleaned = dict(features)
+    rows: Dict[str, list] = {column: [] for column in report_columns}
+    players_array = np.array(players, dtype=object)
+    for rule in rules:
+        if rule.feature not in cleaned:
+            continue
+        values = np.asarray(cleaned[rule.feature], dtype=np.float64)
+        cleaned[rule.feature], violations = rule.apply(values, index)
+        counts = violations.reshape(len(players), -1).sum(axis=1)
+        violated = np.flatnonzero(counts)
+        rows["rule"] += [rule.name] * len(violated)
+        rows["feature"] += [rule.feature] * len(violated)
+        rows["player"] += list(players_array[violated])
+        rows["violations"] += list(counts[violated])
+    return cleaned, ValidationReport(pd.DataFrame(rows, columns=report_columns))
+
+
+def validate_store(
+    store: TeamStore, rules: List = default_rules
+) -> Tuple[TeamStore, ValidationReport]:
+    """Cleaned copy of the team store and the violations found in it."""
+    cleaned, report = apply_rules(
+        {
+            feature: np.asarray(store.feature_values(feature), dtype=np.float64)
+            for feature in store.features
+        },
+        store.index,
+        store.players,
+        rules,
+    )
+    values = np.stack([cleaned[feature] for feature in store.features], axis=1)
+    return (
+        TeamStore.from_arrays(store.players, store.features, store.index, values),
+        report,
+    )
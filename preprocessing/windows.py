@@ -0,0 +1,153 @@
+"""Sliding window datasets for forecasting models.
+
+A window consists of `lookback` days of input features followed by `horizon`
+days of target features. The windows are strided views of the players x days
+arrays of the team and are never copied; only the windows of a batch are
+gathered into new arrays when the batch is materialised."""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from numpy.lib.stride_tricks import sliding_window_view  # type: ignore
+
+from preprocessing.daily_calendar import to_timestamp
+
+
+def missing_per_window(source: np.ndarray, length: int) -> np.ndarray:
+    """Number of missing days in every window of `length` days, for all players."""
+    missing = np.zeros((source.shape[0], source.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.isnan(source), axis=1, out=missing[:, 1:])
+    return missing[:, length:] - missing[:, :-length]
+
+
+def window_view(source: np.ndarray, length: int) -> np.ndarray:
+    """Players x windows x `length` view of all windows of `length` days, without
+    windows if there are fewer days."""
+    if length > source.shape[1]:
+        return np.empty((source.shape[0], 0, length), dtype=source.dtype)
+    return sliding_window_view(source, length, axis=1)
+
+
+class WindowDataset:
+    """Windows over `sources`, a mapping of feature name to a players x days array
+    on the shared date `index`.
+
+    A window starting on day t uses the input days t ... t + lookback - 1 and the
+    target days t + lookback ... t + lookback + horizon - 1. Windows with more
+    than `max_missing` missing input values or with a missing target are left
+    out. `stride` keeps every stride-th window start per player."""
+
+    def __init__(
+        self,
+        sources: Dict[str, np.ndarray],
+        index: pd.DatetimeIndex,
+        players: List[str],
+        inputs: List[str],
+        targets: List[str],
+        lookback: int,
+        horizon: int = 1,
+        stride: int = 1,
+        max_missing: int = 0,
+        windows: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ):
+        self.sources = sources
+        self.index = index
+        self.players = list(players)
+        self.inputs = list(inputs)
+        self.targets = list(targets)
+        self.lookback = lookback
+        self.horizon = horizon
+        self.stride = stride
+        self.max_missing = max_missing
+        self.input_views = {
+            name: window_view(sources[name], lookback) for name in self.inputs
+        }
+        self.target_views = {
+            name: window_view(sources[name], horizon)[:, lookback:]
+            for name in self.targets
+        }
+        if windows is None:
+            windows = self.valid_windows()
+        self.window_players, self.window_starts = windows
+
+    @property
+    def number_of_starts(self) -> int:
+        return len(self.index) - self.lookback - self.horizon + 1
+
+    def valid_windows(self) -> Tuple[np.ndarray, np.ndarray]:
+        starts = self.number_of_starts
+        if starts <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        valid = np.zeros((len(self.players), starts), dtype=bool)
+        valid[:, :: self.stride] = True
+        missing_inputs = sum(
+            missing_per_window(self.sources[name], self.lookback)[:, :starts]
+            for name in self.inputs
+        )
+        valid &= missing_inputs <= self.max_missing
+        for name in self.targets:
+            valid &= (
+                missing_per_window(self.sources[name], self.horizon)[
+                    :, self.lookback :
+                ][:, :starts]
+                == 0
+            )
+        players, starts = np.nonzero(valid)
+        return players.astype(np.int64), starts.astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.window_starts)
+
+    def target_dates(self) -> pd.DatetimeIndex:
+        """First target day of every window."""
+        return self.index[self.window_starts + self.lookback]
+
+    def subset(self, rows) -> "WindowDataset":
+        return WindowDataset(
+            self.sources,
+            self.index,
+            self.players,
+            self.inputs,
+            self.targets,
+            self.lookback,
+            self.horizon,
+            self.stride,
+            self.max_missing,
+            (self.window_players[rows], self.window_starts[rows]),
+        )
+
+    def split(self, date) -> Tuple["WindowDataset", "WindowDataset"]:
+        """Training windows whose targets lie completely before `date`, and
+        validation windows whose targets start on or after it. Strings are read
+        as by `to_timestamp`."""
+        date = to_timestamp(date)
+        last_target = self.index[self.window_starts + self.lookback + self.horizon - 1]
+        first_target = self.target_dates()
+        return (
+            self.subset(np.asarray(last_target < date)),
+            self.subset(np.asarray(first_target >= date)),
+        )
+
+    def batch(self, rows) -> Tuple[np.ndarray, np.ndarray]:
+        """Inputs of shape (windows, lookback, inputs) and targets of shape
+        (windows, horizon, targets) of the selected windows."""
+        players = self.window_players[rows]
+        starts = self.window_starts[rows]
+        inputs = np.stack(
+            [self.input_views[name][players, starts] for name in self.inputs], axis=-1
+        )
+        targets = np.stack(
+            [self.target_views[name][players, starts] for name in self.targets],
+            axis=-1,
+        )
+        return inputs, targets
+
+    def batches(
+        self, batch_size: int, shuffle: bool = False, seed: Optional[int] = None
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        for start in range(0, len(order), batch_size):
+            yield self.batch(order[start : start + batch_size])
@@ -0,0 +1,42 @@
+from preprocessing.columnar import load_teams, save_teams
+from preprocessing.data_loader import Injury, Team
+from preprocessing.read_in_data import build_players
+from preprocessing.team_store import TeamStore, daily_features
+
+import pandas as pd  # type: ignore
+import numpy as np  # type: ignore
+
+dates = ["01.01.2000", "02.01.2000", "03.01.2000", "04.01.2000"]
+variables = {
+    feature: pd.DataFrame(
+        {"Date": dates, "A": [1, 2, np.nan, 4], "B": [np.nan, 3, 3, 3]}
+    )
+    for feature in daily_features
+}
+variables.update(
+    {
+        "srpe": {"A": [300, 200], "B": [100]},
+        "rpe": {"A": [5, 4], "B": [2]},
+        "duration": {"A": [60, 50], "B": [50]},
+        "injuries": {"A": [Injury("A", "knee", "2000-01-02")], "B": []},
+        "illness": {"A": [], "B": []},
+        "performance": {"A": [], "B": []},
+    }
+)
+
+
+def test_save_and_load_teams(tmp_path):
+    store = TeamStore.from_frames(variables, ["A", "B"])
+    players = {
+        player.name: player for player in build_players(variables, ["A", "B"], store)
+    }
+    team = Team("Team", pd.DataFrame(), pd.Series(np.zeros(4)), players, store)
+    save_teams(tmp_path, {"Team": team})
+
+    loaded = load_teams(tmp_path)
+    assert list(loaded) == ["Team"]
+    loaded_team = loaded["Team"]
+    assert isinstance(loaded_team.store.values, np.memmap)
+    assert loaded_team.get_player("A").fatigue.equals(players["A"].fatigue)
+    assert loaded_team.get_player("A").injuries == players["A"].injuries
+    assert loaded_team.get_player("B").srpe == [100]
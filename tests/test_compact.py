@@ -0,0 +1,98 @@
+import json
+import logging
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import pytest
+
+from preprocessing.columnar import load_store, save_store
+from preprocessing.compact import CompactStore, memory_report
+from preprocessing.imputation import MissingnessIndex, impute
+from preprocessing.load_metrics import load_metrics
+from preprocessing.read_in_data import generate_teams
+from preprocessing.rollups import RollupCube
+from preprocessing.synthetic import SyntheticConfig, write_feature_folder
+from preprocessing.team_store import TeamStore
+from preprocessing.validation import validate_store
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(0)
+    values = np.stack(
+        [rng.integers(1, 6, size=(3, 20)), rng.normal(300, 50, size=(3, 20))], axis=1
+    ).astype(np.float64)
+    values[rng.random(values.shape) < 0.2] = np.nan
+    index = pd.date_range("2020-01-01", periods=20, name="Date")
+    return TeamStore.from_arrays(
+        ["a", "b", "c"], ["stress", "daily_load"], index, values
+    )
+
+
+def test_compact_store_keeps_values(store):
+    compact = CompactStore.from_store(store)
+    assert compact.score_features == ["stress"]
+    assert compact.scores.dtype == np.int8 and compact.loads.dtype == np.float32
+    np.testing.assert_array_equal(compact.mask, store.mask)
+    np.testing.assert_allclose(compact.values, store.values, rtol=1e-6)
+    np.testing.assert_array_equal(
+        compact.block(["c"], ["stress"], slice(2, 5)),
+        store.block(["c"], ["stress"], slice(2, 5)),
+    )
+    stress = compact.series("b", "stress")
+    assert stress.dtype == "Int8"
+    assert stress.isna().tolist() == store.series("b", "stress").isna().tolist()
+    assert compact.series("b", "daily_load").dtype == np.float32
+
+
+def test_fractional_scores_stay_float(store):
+    values = store.values.copy()
+    values[0, 0, 0] = 2.5
+    compact = CompactStore.from_store(
+        TeamStore.from_arrays(store.players, store.features, store.index, values)
+    )
+    assert compact.score_features == []
+    assert compact.values[0, 0, 0] == 2.5
+
+
+def test_memory_report_and_columnar_round_trip(store, tmp_path):
+    compact = CompactStore.from_store(store)
+    report = memory_report({"dense": store, "compact": compact})
+    assert report.loc["dense", "ratio"] == 1
+    assert report.loc["compact", "stored_mb"] < report.loc["dense", "stored_mb"] / 2
+    meta = save_store(tmp_path, compact)
+    (tmp_path / "meta.json").write_text(json.dumps(meta))
+    loaded = load_store(tmp_path)
+    assert isinstance(loaded, CompactStore)
+    np.testing.assert_array_equal(loaded.scores, compact.scores)
+
+
+def test_consumers_work_feature_by_feature(store, monkeypatch):
+    compact = CompactStore.from_store(store)
+    expected = RollupCube.from_store(store).query("stress", "mean", "week")
+    missingness = MissingnessIndex.from_store(store).coverage
+    imputed = impute(store).values
+
+    def inflated(self):
+        raise AssertionError("full float64 array built")
+
+    monkeypatch.setattr(CompactStore, "values", property(inflated))
+    np.testing.assert_allclose(impute(compact).values, imputed, rtol=1e-6)
+    monkeypatch.setattr(CompactStore, "mask", property(inflated))
+    pd.testing.assert_frame_equal(
+        RollupCube.from_store(compact).query("stress", "mean", "week"),
+        expected,
+        rtol=1e-6,
+    )
+    np.testing.assert_array_equal(
+        MissingnessIndex.from_store(compact).coverage, missingness
+    )
+    validate_store(compact)
+    load_metrics(compact)
+
+
+def test_compact_teams_log_their_memory(tmp_path, caplog):
+    write_feature_folder(tmp_path, SyntheticConfig(teams=1, players=2, days=20))
+    with caplog.at_level(logging.INFO, logger="preprocessing.compact"):
+        generate_teams(tmp_path, compact=True)
+    assert "TeamA" in caplog.text and "MB as float64" in caplog.text
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing.correlations import UnknownCorrelation, lagged_correlations
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(0)
+    sources = rng.normal(size=(4, 2, 60))
+    targets = rng.normal(size=(4, 1, 60))
+    targets[:, 0, 2:] += sources[:, 0, :-2]
+    sources[rng.random(sources.shape) < 0.2] = np.nan
+    targets[rng.random(targets.shape) < 0.2] = np.nan
+    return sources, targets
+
+
+def expected(source, target, lag, ranked):
+    pairs = pd.DataFrame(
+        {"source": source, "target": pd.Series(target).shift(-lag)}
+    ).dropna()
+    if ranked:
+        pairs = pairs.rank()
+    return pairs["source"].corr(pairs["target"])
+
+
+@pytest.mark.parametrize("method", ["pearson", "spearman"])
+def test_lagged_correlations_match_pairwise_pandas(arrays, method):
+    sources, targets = arrays
+    result = lagged_correlations(
+        sources, targets, list("abcd"), ["load", "acwr"], ["fatigue"], 4, method
+    )
+    assert result.correlations.shape == (4, 2, 1, 5)
+    for player in range(4):
+        for source in range(2):
+            for lag in range(5):
+                np.testing.assert_allclose(
+                    result.correlations[player, source, 0, lag],
+                    expected(
+                        sources[player, source],
+                        targets[player, 0],
+                        lag,
+                        method == "spearman",
+                    ),
+                )
+    squad = result.squad()
+    assert squad.loc[("load", "fatigue")].idxmax() == 2
+
+
+def test_workers_give_the_same_correlations(arrays):
+    sources, targets = arrays
+    serial = lagged_correlations(sources, targets, list("abcd"), ["x", "y"], ["z"])
+    parallel = lagged_correlations(
+        sources, targets, list("abcd"), ["x", "y"], ["z"], workers=2, players_per_task=2
+    )
+    np.testing.assert_allclose(parallel.correlations, serial.correlations)
+    with pytest.raises(UnknownCorrelation):
+        lagged_correlations(sources, targets, list("abcd"), ["x", "y"], ["z"], 1, "tau")
+
+
+@pytest.mark.parametrize("method", ["pearson", "spearman"])
+def test_lags_longer_than_the_days_have_no_pairs(method):
+    values = np.arange(10, dtype=float).reshape(2, 1, 5)
+    result = lagged_correlations(values, values, ["a", "b"], ["x"], ["y"], 7, method)
+    assert result.correlations.shape == (2, 1, 1, 8)
+    assert np.isnan(result.correlations[..., 5:]).all()
+    assert (result.counts[..., 5:] == 0).all()
+    assert (result.counts[..., 4] == 1).all()
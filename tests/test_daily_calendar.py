@@ -0,0 +1,56 @@
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import pytest
+
+from preprocessing.daily_calendar import (
+    DailyCalendar,
+    NotADailyCalendar,
+    UnknownDuplicatePolicy,
+    resolve,
+)
+from preprocessing.team_store import TeamStore
+
+dates = ["02.01.2000", "03.01.2000", "03.01.2000", "05.01.2000"]
+
+
+def test_calendar_has_no_gaps():
+    calendar = DailyCalendar.from_dates(dates, ["01.01.2000"])
+    assert calendar.days == 5
+    assert calendar.index[0] == pd.Timestamp("2000-01-01")
+    assert calendar.position("04.01.2000") == 3
+    assert calendar.position(pd.Timestamp("2000-02-01")) == -1
+    assert calendar.positions(dates + ["not a date"]).tolist() == [1, 2, 2, 4, -1]
+    assert calendar.slice("03.01.2000", "01.02.2000") == slice(2, 5)
+    assert calendar.position("2000-01-04") == 3
+    assert calendar.slice("2000-01-03", "2000-02-01") == slice(2, 5)
+    assert DailyCalendar.from_index(calendar.index) == calendar
+    with pytest.raises(NotADailyCalendar):
+        DailyCalendar.from_index(pd.DatetimeIndex(["2000-01-01", "2000-01-03"]))
+
+
+def test_resolve_duplicates():
+    calendar = DailyCalendar.from_dates(dates)
+    positions = calendar.positions(dates)
+    values = np.array([[1.0, 2.0, 4.0, 5.0], [1.0, np.nan, 3.0, np.nan]])
+    resolved = {
+        policy: np.nan_to_num(resolve(values, positions, calendar.days, policy), nan=-1)
+        for policy in ["first", "last", "mean", "sum"]
+    }
+    assert resolved["first"].tolist() == [[1, 2, -1, 5], [1, 3, -1, -1]]
+    assert resolved["last"].tolist() == [[1, 4, -1, 5], [1, 3, -1, -1]]
+    assert resolved["mean"].tolist() == [[1, 3, -1, 5], [1, 3, -1, -1]]
+    assert resolved["sum"].tolist() == [[1, 6, -1, 5], [1, 3, -1, -1]]
+    with pytest.raises(UnknownDuplicatePolicy):
+        resolve(values, positions, calendar.days, "median")
+
+
+def test_store_from_frames_uses_calendar():
+    frames = {
+        feature: pd.DataFrame({"Date": dates, "A": [1.0, 2.0, 4.0, 5.0]})
+        for feature in ["daily_load", "stress"]
+    }
+    store = TeamStore.from_frames(frames, ["A"], ["daily_load", "stress"])
+    assert store.index.equals(pd.date_range("2000-01-02", periods=4, name="Date"))
+    assert store.series("A", "daily_load").iloc[1] == 6
+    assert store.series("A", "stress").iloc[1] == 2
+    assert store.day_position("05.01.2000") == 3
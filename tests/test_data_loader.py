@@ -1,7 +1,17 @@
-from preprocessing.data_loader import initialise_players
+from preprocessing.data_loader import (
+    LazySoccerPlayer,
+    Team,
+    date_positions,
+    generate_teams,
+    initialise_players,
+    validate_workbook_store,
+)
+from preprocessing.synthetic import SyntheticConfig, write_team_workbooks
+from preprocessing.team_store import TeamStore
 
 import pandas as pd  # type: ignore
 import numpy as np  # type: ignore
+import pytest
 
 test_records_df = pd.DataFrame({
         "Date": [
@@ -203,58 +213,128 @@ record_sheets = {
 
 def test_initialise_players():
     """More tests should be implemented."""
-    output = initialise_players(wellness_sheets, record_sheets)
-    assert output["0"].name == "A"
-    assert output["3"].name == "D"
+    sheets = {
+        **wellness_sheets,
+        "Illness": pd.DataFrame(columns=["Date", "Player", "Problems"]),
+        "Game Performance": pd.DataFrame(
+            columns=[
+                "Date",
+                "Player",
+                "Team Overall Performance",
+                "Individual Offensive Performance",
+                "Individual Defensive Performance",
+            ]
+        ),
+    }
+    dates = test_records_df["Date"].to_numpy()
+    records = {
+        name: {
+            column: pd.Series(
+                np.arange(12.0) if column == "Daily Load" else values.to_numpy(),
+                index=dates,
+                name=column,
+            )
+            for column, values in test_records_df.items()
+            if column != "Date"
+        }
+        for name in record_sheets
+    }
+    name_mapping = {"0": "A", "1": "B", "2": "C", "3": "D"}
+    output = initialise_players(sheets, records, name_mapping, rules=None)
+    calendar = pd.date_range("2000-01-01", "2000-01-12", freq="D", name="Date")
+    assert output["0"].name == "0"
+    assert output["3"].name == "3"
     assert output["1"].stress.equals(
         pd.Series(
-            [1, 2, 3, 4, 5, 1, 2, 3, 4, 5, np.nan, np.nan],
-            name="B",
-            index=[
-                "01.01.2000",
-                "02.01.2000",
-                "03.01.2000",
-                "04.01.2000",
-                "05.01.2000",
-                "06.01.2000",
-                "07.01.2000",
-                "07.01.2000",
-                "09.01.2000",
-                "10.01.2000",
-                "11.01.2000",
-                "12.01.2000",
-            ],
+            [1, 2, 3, 4, 5, 1, 2, np.nan, 4, 5, np.nan, np.nan],
+            name="1",
+            index=calendar,
         )
     )
-    assert output["2"].strain.equals(pd.Series(
-        np.zeros(12),
-        name="Strain",
-    ))
-    assert output["3"].srpe.equals(pd.Series(
-        np.zeros(12),
-        name="SRPE",
-    ))
-    assert output["2"].strain.equals(pd.Series(
-        np.zeros(12),
-        name="Strain",
-    ))
+    assert output["0"].daily_load.iloc[5:9].fillna(-1).tolist() == [5, 13, -1, 8]
+    assert output["2"].strain.index.equals(calendar)
+    srpe = output["3"].srpe
+    assert srpe.tolist() == records["D"]["SRPE"].tolist()
+    assert srpe.index.strftime("%d.%m.%Y").tolist() == list(dates)
     assert output["3"].sleep_duration.equals(
         pd.Series(
-            [2, 3, 7, 2, np.nan, 4, np.nan, 1, 2, 3, np.nan, 5],
-            name="D",
-            index=[
-                "01.01.2000",
-                "02.01.2000",
-                "03.01.2000",
-                "04.01.2000",
-                "05.01.2000",
-                "06.01.2000",
-                "07.01.2000",
-                "07.01.2000",
-                "09.01.2000",
-                "10.01.2000",
-                "11.01.2000",
-                "12.01.2000",
-            ],
+            [2, 3, 7, 2, np.nan, 4, 1, np.nan, 2, 3, np.nan, 5],
+            name="3",
+            index=calendar,
         )
     )
+
+
+def test_date_positions():
+    index = pd.date_range("2000-01-01", periods=10, freq="2D")
+    positions = date_positions(index, "02.01.2000", "09.01.2000")
+    assert positions == slice(1, 4)
+    assert date_positions(index, "01.01.1999", "01.01.2001") == slice(0, 10)
+    assert date_positions(index, "2000-01-02", "2000-01-09") == slice(1, 4)
+    with pytest.raises(ValueError):
+        date_positions(index, "first of January", "09.01.2000")
+    mask = date_positions(
+        pd.Index(["03.01.2000", "01.01.2000", "05.01.2000"]), "01.01.2000", "04.01.2000"
+    )
+    assert mask.tolist() == [True, True, False]
+
+
+def test_team_query():
+    store = TeamStore.from_arrays(
+        ["A", "B"],
+        ["fatigue", "stress"],
+        pd.date_range("2000-01-01", periods=3),
+        np.arange(12, dtype=float).reshape(2, 2, 3),
+    )
+    team = Team("Team", pd.DataFrame(), pd.Series(dtype=float), {}, store)
+    long = team.query(["stress"], players=["B"], start="02.01.2000")
+    assert long["stress"].tolist() == [10, 11]
+    assert long.index.get_level_values("player").tolist() == ["B", "B"]
+    wide = team.query(["fatigue", "stress"], end="02.01.2000", layout="wide")
+    assert wide.loc["2000-01-01", ("B", "fatigue")] == 6
+    assert wide.loc["2000-01-01", ("A", "stress")] == 3
+
+
+def test_lazy_player_builds_features_on_access():
+    index = pd.date_range("2000-01-01", periods=3)
+    store = TeamStore.from_arrays(["A"], ["fatigue", "stress"], index, np.ones((1, 2, 3)))
+    player = LazySoccerPlayer("A", store, {"srpe": [300], "injuries": []})
+    assert "stress" not in vars(player)
+    assert player.stress.tolist() == [1, 1, 1]
+    assert "stress" in vars(player) and "fatigue" not in vars(player)
+    assert player.srpe == [300]
+    assert "readiness" in player.get_variable_names()
+
+
+def test_generate_teams_without_validation(tmp_path):
+    paths, team_names = write_team_workbooks(
+        tmp_path, SyntheticConfig(teams=1, players=2, days=10)
+    )
+    teams = generate_teams(paths, team_names, rules=None)
+    assert teams["TeamA"].validation is None
+    assert teams["TeamA"].store.shape == (2, 15, 10)
+
+
+def test_workbook_store_converts_sleep_in_minutes_once():
+    index = pd.date_range("2000-01-01", periods=3)
+    sleep = np.array([[[420.0, 7.0, 6.0]]])
+    store = TeamStore.from_arrays(["A"], ["sleep_duration"], index, sleep)
+    validated, report = validate_workbook_store(store)
+    assert validated.series("A", "sleep_duration").tolist() == [7, 7, 6]
+    assert report.violations.values.tolist() == [["unit", "sleep_duration", "A", 1]]
+    unvalidated, report = validate_workbook_store(store, None)
+    assert unvalidated.series("A", "sleep_duration").tolist() == [7, 7, 6]
+    assert report is None
+
+
+def test_generate_teams_in_parallel_keeps_players_as_store_views(tmp_path):
+    paths, team_names = write_team_workbooks(
+        tmp_path, SyntheticConfig(teams=2, players=2, days=10)
+    )
+    parallel = generate_teams(paths, team_names, workers=2)
+    serial = generate_teams(paths, team_names)
+    for pseudonym, team in parallel.items():
+        assert list(team.players) == list(serial[pseudonym].players)
+        for player_name, player in team.players.items():
+            assert player.stress.equals(serial[pseudonym].players[player_name].stress)
+            assert np.shares_memory(player.stress.to_numpy(), team.store.values)
@@ -0,0 +1,97 @@
+from preprocessing.data_loader import Injury
+from preprocessing.events import EventTable, event_matrix, event_series
+
+import pandas as pd  # type: ignore
+import numpy as np  # type: ignore
+
+days = pd.date_range("2000-01-01", periods=4)
+
+
+def test_event_series_aggregations():
+    timestamps = [
+        "2000-01-02 10:00",
+        "2000-01-02 18:00",
+        "2000-01-04 09:00",
+        "2001-01-01 09:00",
+    ]
+    values = np.array([3, 5, 1, 7])
+    assert event_series(days, timestamps).tolist() == [0, 1, 0, 1]
+    assert event_series(days, timestamps, how="count").tolist() == [0, 2, 0, 1]
+    assert event_series(days, timestamps, values, how="sum").tolist() == [0, 8, 0, 1]
+    assert event_series(days, timestamps, values, how="first").tolist() == [0, 3, 0, 1]
+
+
+def test_event_series_on_string_calendar():
+    calendar = ["01.01.2000", "02.01.2000", "02.01.2000", "03.01.2000"]
+    series = event_series(calendar, ["02.01.2000"])
+    assert series.index.tolist() == ["01.01.2000", "02.01.2000", "03.01.2000"]
+    assert series.tolist() == [0, 1, 0]
+
+
+def test_event_matrix():
+    matrix = event_matrix(
+        days,
+        ["A", "B"],
+        ["A", "B", "A", "C"],
+        ["2000-01-01"] * 3 + ["2000-01-02"],
+        how="count",
+    )
+    assert matrix["A"].tolist() == [2, 0, 0, 0]
+    assert matrix["B"].tolist() == [1, 0, 0, 0]
+
+
+def test_event_table_views():
+    frame = pd.DataFrame(
+        {
+            "Player": ["B", "A", "B", "C"],
+            "Injuries": ["knee", "hip", "back", "hip"],
+            "Date": ["01.01.2000", "02.01.2000", "03.01.2000", "04.01.2000"],
+        }
+    )
+    table = EventTable.from_frame(
+        frame,
+        ["A", "B"],
+        Injury,
+        {"player": "Player", "type": "Injuries", "timestamp": "Date"},
+    )
+    assert table.players == ["A", "B", "C"]
+    assert table.size == 4
+    assert table["B"] == [
+        Injury("B", "knee", "01.01.2000"),
+        Injury("B", "back", "03.01.2000"),
+    ]
+    assert table["A"][0] == Injury("A", "hip", "02.01.2000")
+    assert table["B"][0:2] == [
+        Injury("B", "knee", "01.01.2000"),
+        Injury("B", "back", "03.01.2000"),
+    ]
+    assert table["B"][-1:] == [Injury("B", "back", "03.01.2000")]
+    assert table["B"] != 1
+    selected = table.select(["C", "B"])
+    assert selected.to_frame()["player"].tolist() == ["C", "B", "B"]
+    assert list(selected["C"]) == [Injury("C", "hip", "04.01.2000")]
+
+
+def test_event_table_append():
+    columns = {"player": "Player", "type": "Injuries", "timestamp": "Date"}
+    table = EventTable.from_frame(
+        pd.DataFrame(
+            {"Player": ["B", "A"], "Injuries": ["knee", "hip"], "Date": ["1", "2"]}
+        ),
+        ["A", "B"],
+        Injury,
+        columns,
+    )
+    new = EventTable.from_frame(
+        pd.DataFrame(
+            {"Player": ["D", "A"], "Injuries": ["toe", "back"], "Date": ["3", "4"]}
+        ),
+        [],
+        Injury,
+        columns,
+    )
+    appended = table.append(new)
+    assert appended.players == ["A", "B", "D"]
+    assert appended.to_frame()["player"].tolist() == ["A", "A", "B", "D"]
+    assert list(appended["A"]) == [Injury("A", "hip", "2"), Injury("A", "back", "4")]
+    assert list(appended["D"]) == [Injury("D", "toe", "3")]
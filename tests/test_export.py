@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing import read_in_data
+from preprocessing.export import export_tables, export_team
+from preprocessing.synthetic import SyntheticConfig, write_feature_folder
+
+
+def synthetic_team(path):
+    write_feature_folder(path, SyntheticConfig(teams=1, players=3, days=20))
+    return read_in_data.generate_teams(path)["TeamA"]
+
+
+def test_export_matches_player_frames(tmp_path):
+    team = synthetic_team(tmp_path)
+    tables = team.export()
+    assert list(tables) == export_tables
+    daily = tables["daily"]
+    assert isinstance(daily["player_name"].dtype, pd.CategoricalDtype)
+    assert len(daily) == 3 * 20
+    for pseudonym, player in team.players.items():
+        expected = player.to_dataframe(pseudonym)
+        exported = daily[daily["player_name"] == pseudonym]
+        np.testing.assert_array_equal(
+            exported["sleep-duration"].to_numpy(), expected["sleep-duration"]
+        )
+        np.testing.assert_array_equal(
+            exported["injury_ts"].to_numpy(), expected["injury_ts"]
+        )
+    sessions = tables["sessions"]
+    assert len(sessions) == sum(len(p.srpe) for p in team.players.values())
+    injuries = tables["injuries"]
+    assert len(injuries) == sum(len(p.injuries) for p in team.players.values())
+    assert list(injuries.columns) == ["player_name", "type", "timestamp"]
+
+
+def test_export_streams_csv_files(tmp_path):
+    team = synthetic_team(tmp_path / "features")
+    paths = export_team(team, tmp_path / "export", players_per_chunk=2)
+    daily = pd.read_csv(paths["daily"])
+    assert len(daily) == 3 * 20
+    assert sorted(daily["player_name"].unique()) == sorted(team.players)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing.imputation import (
+    MissingnessIndex,
+    forward_fill,
+    impute,
+    interpolate,
+    rolling_mean,
+)
+from preprocessing.team_store import TeamStore
+
+nan = np.nan
+
+
+def test_forward_fill_with_limit():
+    values = np.array([[nan, 1.0, nan, nan, nan, 2.0]])
+    np.testing.assert_array_equal(
+        forward_fill(values, limit=2), [[nan, 1.0, 1.0, 1.0, nan, 2.0]]
+    )
+
+
+def test_interpolate_fills_inner_gaps_only():
+    values = np.array([[nan, 1.0, nan, nan, 4.0, nan]])
+    np.testing.assert_allclose(interpolate(values), [[nan, 1.0, 2.0, 3.0, 4.0, nan]])
+    x = np.array([0.0, 1.0, 2.0, 4.0, 5.0, 6.0])
+    np.testing.assert_allclose(
+        interpolate(values, x), [[nan, 1.0, 1.75, 3.25, 4.0, nan]]
+    )
+
+
+def test_rolling_mean_matches_pandas():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(2, 40))
+    values[rng.random(values.shape) < 0.3] = nan
+    expected = [
+        pd.Series(row).fillna(pd.Series(row).shift(1).rolling(5, 1).mean())
+        for row in values
+    ]
+    np.testing.assert_allclose(rolling_mean(values, 5), expected)
+
+
+def test_impute_keeps_mask_and_missingness_index():
+    index = pd.date_range("2020-01-06", periods=14)
+    values = np.ones((2, 1, 14))
+    values[0, 0, :7] = nan
+    values[1, 0, 3] = nan
+    store = TeamStore.from_arrays(["a", "b"], ["stress"], index, values)
+    imputed = impute(store, "ffill")
+    assert np.isnan(imputed.values[0, 0, :7]).all()
+    assert imputed.values[1, 0, 3] == 1.0
+    np.testing.assert_array_equal(imputed.mask, store.mask)
+
+    missingness = MissingnessIndex.from_store(store)
+    np.testing.assert_allclose(missingness.coverage[:, 0], [[0, 1], [6 / 7, 1]])
+    assert missingness.players_with_coverage("stress", 0.9) == ["b"]
+    assert missingness.players_with_coverage("stress", 0.9, start="2020-01-13") == [
+        "a",
+        "b",
+    ]
+    assert missingness.players_with_coverage("stress", 0.8, start="12.01.2020") == ["b"]
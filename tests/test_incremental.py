@@ -0,0 +1,135 @@
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import pytest
+
+from preprocessing.columnar import (
+    append_segments,
+    load_teams,
+    merge_segments,
+    save_teams,
+    segment_paths,
+)
+from preprocessing.daily_calendar import DailyCalendar
+from preprocessing.incremental import (
+    ChunkedStore,
+    NewPlayers,
+    NotAppendOnly,
+    changed_days,
+)
+from preprocessing.read_in_data import append_teams, generate_teams, team_updates
+from preprocessing.rollups import RollupCube
+from preprocessing.synthetic import SyntheticConfig, write_feature_folder
+from preprocessing.team_store import TeamStore
+
+
+@pytest.fixture
+def folders(tmp_path):
+    write_feature_folder(tmp_path / "history", SyntheticConfig(players=3, days=40))
+    write_feature_folder(
+        tmp_path / "new",
+        SyntheticConfig(players=3, days=5, start="2020-02-12", seed=1),
+    )
+    return tmp_path / "history", tmp_path / "new"
+
+
+def test_appended_team_matches_new_rows(folders):
+    history, new = folders
+    teams = generate_teams(history)
+    team = teams["TeamA"]
+    team.rollups
+    updates = team_updates(teams, new)
+    appended = append_teams(teams, updates)["TeamA"]
+    assert updates["TeamA"].game_ts.index.equals(updates["TeamA"].store.index)
+
+    store = appended.get_store()
+    assert store.index[0] == team.store.index[0]
+    assert store.calendar.end == updates["TeamA"].store.calendar.end
+    np.testing.assert_array_equal(
+        store.values[..., : len(team.store.index)], team.store.values
+    )
+    np.testing.assert_array_equal(
+        store.values[..., len(team.store.index) :], updates["TeamA"].store.values
+    )
+    assert appended.players["TeamA-0000"].stress.index.equals(store.index)
+    assert appended.game_ts.index.equals(store.index)
+    full = RollupCube.from_store(store)
+    for granularity in ["day", "week", "month", "season"]:
+        pd.testing.assert_frame_equal(
+            appended.rollups.query("stress", "mean", granularity),
+            full.query("stress", "mean", granularity),
+        )
+
+
+def test_rejects_days_of_the_team(folders):
+    history, _ = folders
+    teams = generate_teams(history)
+    with pytest.raises(NotAppendOnly):
+        team_updates(teams, history)
+
+
+def test_rejects_new_players(folders, tmp_path):
+    history, _ = folders
+    write_feature_folder(
+        tmp_path / "joined",
+        SyntheticConfig(players=4, days=5, start="2020-02-12", seed=1),
+    )
+    teams = generate_teams(history)
+    with pytest.raises(NewPlayers, match="TeamA-0003"):
+        team_updates(teams, tmp_path / "joined")
+
+
+def test_segments_are_appended_on_load(folders, tmp_path):
+    history, new = folders
+    teams = generate_teams(history)
+    save_teams(tmp_path / "teams", teams)
+    append_segments(
+        tmp_path / "teams", team_updates(load_teams(tmp_path / "teams"), new)
+    )
+    expected = append_teams(teams, team_updates(teams, new))["TeamA"]
+
+    loaded = load_teams(tmp_path / "teams")["TeamA"]
+    assert segment_paths(tmp_path / "teams" / "TeamA")
+    assert len(loaded.store.chunks) == 2
+    assert all(isinstance(chunk.values, np.memmap) for chunk in loaded.store.chunks)
+    np.testing.assert_array_equal(loaded.store.values, expected.store.values)
+    assert loaded.events["injuries"].size == expected.events["injuries"].size
+    assert loaded.players["TeamA-0001"].stress.equals(
+        expected.players["TeamA-0001"].stress
+    )
+
+    merge_segments(tmp_path / "teams" / "TeamA")
+    assert not segment_paths(tmp_path / "teams" / "TeamA")
+    merged = load_teams(tmp_path / "teams")["TeamA"]
+    assert isinstance(merged.store.values, np.memmap)
+    np.testing.assert_array_equal(merged.store.values, expected.store.values)
+
+
+def test_chunked_store_gathers_selections_across_chunks():
+    values = np.arange(2 * 3 * 10, dtype=float).reshape(2, 3, 10)
+    index = pd.date_range("2020-01-01", periods=10, name="Date")
+
+    def chunk(days):
+        return TeamStore.from_arrays(
+            ["a", "b"], ["x", "y", "z"], index[days], values[..., days]
+        )
+
+    store = ChunkedStore.from_store(chunk(slice(0, 4))).extend(chunk(slice(4, 10)))
+    assert store.calendar == DailyCalendar(index[0], 10)
+    np.testing.assert_array_equal(store.values, values)
+    days = np.array([8, 1, 5, 3])
+    np.testing.assert_array_equal(
+        store.block(["b"], ["z", "x"], days), values[[1]][:, [2, 0]][..., days]
+    )
+    np.testing.assert_array_equal(store.block(days=slice(2, 6)), values[..., 2:6])
+    assert store.series("a", "y").tolist() == values[0, 1].tolist()
+
+
+def test_changed_days_are_the_new_days_and_the_days_of_new_games():
+    calendar = DailyCalendar(pd.Timestamp("2020-01-01"), 10)
+    new = pd.date_range("2020-01-11", periods=2, name="Date")
+    days = changed_days(calendar, new, ["03.01.2020", "12.01.2020", "2019-12-01"])
+    assert days.strftime("%Y-%m-%d").tolist() == [
+        "2020-01-03",
+        "2020-01-11",
+        "2020-01-12",
+    ]
@@ -0,0 +1,29 @@
+import os
+
+from preprocessing.ingest_cache import IngestCache
+
+import pandas as pd  # type: ignore
+
+
+def test_only_changed_files_are_parsed(tmp_path):
+    path_to_csv = tmp_path / "stress.csv"
+    pd.DataFrame({"Date": ["01.01.2000"], "A": [1]}).to_csv(path_to_csv, index=False)
+    parsed = []
+
+    def parse(path):
+        parsed.append(path)
+        return pd.read_csv(path)
+
+    cache = IngestCache(tmp_path / "cache")
+    first = cache.load(path_to_csv, parse)
+    cache.save()
+
+    cache = IngestCache(tmp_path / "cache")
+    assert cache.load(path_to_csv, parse).equals(first)
+    os.utime(path_to_csv, ns=(0, 0))
+    assert cache.load(path_to_csv, parse).equals(first)
+    assert len(parsed) == 1
+
+    pd.DataFrame({"Date": ["01.01.2000"], "A": [2]}).to_csv(path_to_csv, index=False)
+    assert cache.load(path_to_csv, parse)["A"].tolist() == [2]
+    assert len(parsed) == 2
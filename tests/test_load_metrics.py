@@ -0,0 +1,30 @@
+from preprocessing.load_metrics import LoadModel, LoadState, compute_load_metrics
+
+import pandas as pd  # type: ignore
+import numpy as np  # type: ignore
+
+rng = np.random.default_rng(0)
+daily_load = rng.integers(0, 800, size=(3, 90)).astype(float)
+daily_load[0, 10] = np.nan
+
+
+def test_rolling_metrics_match_pandas():
+    metrics = compute_load_metrics(daily_load)
+    player = pd.Series(daily_load[1])
+    assert np.allclose(metrics["atl"][1], player.rolling(7).mean(), equal_nan=True)
+    assert np.allclose(metrics["ctl42"][1], player.rolling(42).mean(), equal_nan=True)
+    assert np.allclose(
+        metrics["acwr"][1],
+        player.rolling(7).mean() / player.rolling(28).mean(),
+        equal_nan=True,
+    )
+
+
+def test_incremental_update_matches_full_computation():
+    for model in [LoadModel(), LoadModel(acwr="ewma")]:
+        full = compute_load_metrics(daily_load, model)
+        state = LoadState.from_history(daily_load[:, :80], model)
+        metrics, state = state.update(daily_load[:, 80:85])
+        metrics, state = state.update(daily_load[:, 85:])
+        for name, values in metrics.items():
+            assert np.allclose(values, full[name][:, 85:], equal_nan=True), name
@@ -0,0 +1,19 @@
+from preprocessing.parallel_loader import load_in_parallel
+from preprocessing.read_in_data import parse_variable_file
+
+import pandas as pd  # type: ignore
+
+
+def test_parallel_and_serial_results_match(tmp_path):
+    paths = []
+    for position in range(4):
+        path_to_csv = tmp_path / f"feature{position}.csv"
+        pd.DataFrame({"Date": ["01.01.2000"], "A": [position]}).to_csv(
+            path_to_csv, index=False
+        )
+        paths.append(path_to_csv)
+
+    serial = load_in_parallel(paths, parse_variable_file, workers=1)
+    parallel = load_in_parallel(paths, parse_variable_file, workers=2)
+    assert [frame["A"].iat[0] for frame in parallel] == [0, 1, 2, 3]
+    assert all(left.equals(right) for left, right in zip(serial, parallel))
@@ -0,0 +1,27 @@
+import json
+
+from preprocessing.profiling import null_stage, profiler, profiling
+
+
+def test_stages_are_not_recorded_when_profiling_is_off():
+    profiler.reset()
+    with profiler.stage("parse") as stage:
+        stage.rows = 3
+    assert profiler.stage("parse") is null_stage
+    assert profiler.records == []
+
+
+def test_nested_stages_are_reported_parents_first():
+    with profiling() as profile:
+        with profile.stage("generate_teams") as outer:
+            with profile.stage("initialise_players", "TeamA") as inner:
+                inner.rows = 5
+            outer.rows = 1
+    assert not profiler.enabled
+    assert [(r.stage, r.team, r.depth, r.rows) for r in profile.records] == [
+        ("generate_teams", None, 0, 1),
+        ("initialise_players", "TeamA", 1, 5),
+    ]
+    assert profile.records[0].wall_seconds >= profile.records[1].wall_seconds
+    assert json.loads(profile.to_json())[1]["team"] == "TeamA"
+    assert "  initialise_players" in profile.table()
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import pickle
+import socket
+import stat
+import threading
+
+import pytest
+
+from preprocessing import read_in_data
+from preprocessing.query_server import (
+    QueryClient,
+    QueryFailed,
+    QueryServer,
+    frame,
+    header,
+)
+from preprocessing.synthetic import SyntheticConfig, write_feature_folder
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    write_feature_folder(
+        tmp_path / "features", SyntheticConfig(teams=1, players=2, days=20)
+    )
+    teams = read_in_data.generate_teams(tmp_path / "features")
+    path_to_data = tmp_path / "teams.pkl"
+    with open(path_to_data, "wb") as data_file:
+        pickle.dump(teams, data_file)
+    return path_to_data
+
+
+@pytest.fixture
+def running_server(data_file, tmp_path):
+    server = QueryServer(data_file, reload_interval=0.0)
+    loop = asyncio.new_event_loop()
+    socket_path = tmp_path / "teams.sock"
+    listener = loop.run_until_complete(server.start(socket_path))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server, socket_path
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    listener.close()
+    loop.run_until_complete(listener.wait_closed())
+    loop.close()
+
+
+def test_client_returns_library_objects(running_server, data_file):
+    server, socket_path = running_server
+    with open(data_file, "rb") as loaded:
+        team = pickle.load(loaded)["TeamA"]
+    with QueryClient(socket_path=socket_path) as client:
+        assert client.teams() == ["TeamA"]
+        assert client.players("TeamA") == list(team.players)
+        player_name = list(team.players)[0]
+        expected = team.players[player_name].get_variables_by_date(["stress"])
+        result = client.get_variables_by_date("TeamA", player_name, ["stress"])
+        assert result.equals(expected)
+        client.get_variables_by_date("TeamA", player_name, ["stress"])
+        assert server.hits == 1
+        assert client.query("TeamA", ["fatigue"]).equals(team.query(["fatigue"]))
+        assert client.player("TeamA", player_name).stress.equals(
+            team.players[player_name].stress
+        )
+        with pytest.raises(QueryFailed):
+            client.query("TeamA", ["unknown"])
+
+
+def test_server_reloads_changed_data(running_server, data_file):
+    server, socket_path = running_server
+    with open(data_file, "rb") as loaded:
+        teams = pickle.load(loaded)
+    teams["TeamB"] = teams["TeamA"]
+    with QueryClient(socket_path=socket_path) as client:
+        assert client.teams() == ["TeamA"]
+        with open(data_file, "wb") as changed:
+            pickle.dump(teams, changed)
+        os.utime(data_file, ns=(0, 0))
+        assert client.teams() == ["TeamA", "TeamB"]
+
+
+class Touch:
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return open, (str(self.path), "w")
+
+
+def test_server_does_not_unpickle_requests(running_server, tmp_path):
+    server, socket_path = running_server
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+    touched = tmp_path / "touched"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(str(socket_path))
+        connection.sendall(frame(Touch(touched)))
+        (size,) = header.unpack(connection.recv(header.size))
+        response = pickle.loads(connection.recv(size))
+    assert "error" in response
+    assert not touched.exists()
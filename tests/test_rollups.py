@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing.rollups import RollupCube, UnknownRollup, rollup_aggregations
+from preprocessing.team_store import TeamStore
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2020-12-01", periods=80)
+    values = rng.normal(size=(3, 2, 80))
+    values[rng.random(values.shape) < 0.3] = np.nan
+    return TeamStore.from_arrays(["a", "b", "c"], ["load", "stress"], index, values)
+
+
+@pytest.mark.parametrize("aggregation", rollup_aggregations)
+def test_rollups_match_groupby(store, aggregation):
+    cube = RollupCube.from_store(store)
+    frame = store.feature("stress")
+    for granularity, frequency in [("week", "W"), ("month", "M"), ("season", "Y")]:
+        expected = frame.groupby(frame.index.to_period(frequency)).agg(aggregation)
+        result = cube.query("stress", aggregation, granularity)
+        np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+        team = cube.team_query("stress", aggregation, granularity)
+        stacked = frame.stack()
+        expected_team = stacked.groupby(
+            stacked.index.get_level_values(0).to_period(frequency)
+        ).agg(aggregation)
+        np.testing.assert_allclose(team["stress"], expected_team)
+
+
+def test_append_matches_full_rollup(store):
+    cube = RollupCube.from_store(store)
+    first = TeamStore.from_arrays(
+        store.players, store.features, store.index[:45], store.values[..., :45]
+    )
+    appended = RollupCube.from_store(first).append(
+        store.values[..., 45:], store.index[45:]
+    )
+    for granularity in ["day", "week", "month", "season"]:
+        np.testing.assert_allclose(
+            appended.query("load", "mean", granularity),
+            cube.query("load", "mean", granularity),
+        )
+
+
+def test_query_by_period_and_player(store):
+    cube = RollupCube.from_store(store)
+    result = cube.query("load", "max", "month", ["b"], "2021-01-15", "2021-02-01")
+    assert list(result.index.astype(str)) == ["2021-01"]
+    assert list(result.columns) == ["b"]
+    result = cube.query("load", "max", "month", start="01.02.2021")
+    assert list(result.index.astype(str)) == ["2021-02"]
+    with pytest.raises(UnknownRollup):
+        cube.query("load", "median")
@@ -0,0 +1,111 @@
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import pytest
+
+from preprocessing.daily_calendar import DailyCalendar
+from preprocessing.data_loader import Team
+from preprocessing.sessions import SessionTable
+from preprocessing.team_store import TeamStore
+
+dates = ["01.01.2000", "01.01.2000", "03.01.2000", "02.01.2000"]
+
+
+def dated_table() -> SessionTable:
+    def sessions(values, index):
+        return pd.Series(values, index=index)
+
+    return SessionTable.from_series(
+        ["A", "B"],
+        {
+            "srpe": [
+                sessions([100.0, 200.0, 300.0], dates[:3]),
+                sessions([50.0], dates[3:]),
+            ],
+            "rpe": [
+                sessions([2.0, 4.0, np.nan], dates[:3]),
+                sessions([5.0], dates[3:]),
+            ],
+            "duration": [
+                sessions([50.0, 50.0, 60.0], dates[:3]),
+                sessions([10.0], dates[3:]),
+            ],
+        },
+    )
+
+
+def test_player_sessions_are_views():
+    table = dated_table()
+    assert table.offsets.tolist() == [0, 3, 4]
+    srpe = table.series("A", "srpe")
+    assert srpe.tolist() == [100, 200, 300]
+    assert srpe.index[2] == pd.Timestamp("2000-01-03")
+    assert np.shares_memory(srpe.to_numpy(), table.values["srpe"])
+
+
+def test_daily_aggregates():
+    table = dated_table()
+    daily = table.daily(DailyCalendar.from_dates(dates))
+    assert daily.series("A", "srpe_sum").tolist() == [300, 0, 300]
+    assert daily.series("A", "session_count").tolist() == [2, 0, 1]
+    assert daily.series("A", "duration_sum").tolist() == [100, 0, 60]
+    assert daily.series("A", "rpe_mean").fillna(-1).tolist() == [3, -1, -1]
+    assert daily.series("B", "srpe_sum").tolist() == [0, 50, 0]
+
+
+def test_query_joins_sessions_to_daily_features():
+    table = dated_table()
+    index = pd.date_range("2000-01-01", periods=3, name="Date")
+    store = TeamStore.from_arrays(["A", "B"], ["stress"], index, np.ones((2, 1, 3)))
+    team = Team(
+        "Team", pd.DataFrame(), pd.Series(dtype=float), {}, store, sessions=table
+    )
+    frame = team.query(["srpe_sum", "stress"], players=["A"], end="02.01.2000")
+    assert frame.columns.tolist() == ["srpe_sum", "stress"]
+    assert frame.to_numpy().tolist() == [[300, 1]]
+    sessions = table.query(["A"], start="02.01.2000")
+    assert sessions["srpe"].tolist() == [300]
+    assert table.query(start="2000-01-02")["srpe"].tolist() == [300, 50]
+    with pytest.raises(ValueError):
+        table.query(start="not a date")
+
+
+def test_undated_sessions_from_lists():
+    table = SessionTable.from_lists(
+        ["A", "B"],
+        {
+            "srpe": {"A": [1, 2], "B": [3]},
+            "rpe": {"A": [1, 2], "B": []},
+            "duration": {},
+        },
+    )
+    assert not table.dated
+    assert table.series("B", "srpe").tolist() == [3]
+    assert np.isnan(table.series("B", "rpe")).all()
+    assert table.to_frame().columns.tolist() == [
+        "player_name",
+        "srpe",
+        "rpe",
+        "duration",
+    ]
+    daily = table.daily(DailyCalendar.from_dates(dates))
+    assert daily.feature("srpe_sum").isna().all(axis=None)
+    assert daily.feature("session_count").isna().all(axis=None)
+
+
+def test_append_puts_new_sessions_after_those_of_the_player():
+    table = dated_table()
+    new = SessionTable.from_series(
+        ["B", "A"],
+        {
+            variable: [
+                pd.Series([1.0, 2.0], index=["05.01.2000", "06.01.2000"]),
+                pd.Series([3.0], index=["05.01.2000"]),
+            ]
+            for variable in ["srpe", "rpe", "duration"]
+        },
+    )
+    appended = table.append(new)
+    assert appended.offsets.tolist() == [0, 4, 7]
+    assert appended.series("A", "srpe").tolist() == [100, 200, 300, 3]
+    assert appended.series("B", "srpe").tolist() == [50, 1, 2]
+    assert appended.series("B", "rpe").index[-1] == pd.Timestamp("2000-01-06")
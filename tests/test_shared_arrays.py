@@ -0,0 +1,51 @@
+from multiprocessing.shared_memory import SharedMemory
+
+from preprocessing.read_in_data import generate_teams
+from preprocessing.sessions import SessionTable
+from preprocessing.shared_arrays import (
+    SharedArray,
+    attach_arrays,
+    share_arrays,
+    worker_pool,
+)
+from preprocessing.synthetic import SyntheticConfig, write_feature_folder
+from preprocessing.team_store import TeamStore
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import pytest
+
+
+def test_worker_shares_the_arrays_of_stores_and_session_tables():
+    values = np.arange(24, dtype=float).reshape(2, 3, 4)
+    store = TeamStore.from_arrays(
+        ["a", "b"], ["x", "y", "z"], pd.date_range("2000-01-01", periods=4), values
+    )
+    sessions = SessionTable.from_lists(["a", "b"], {"srpe": {"a": [1, 2], "b": [3]}})
+    with worker_pool(1) as pool:
+        shared_store = pool.submit(share_arrays, store).result()
+        shared_sessions = pool.submit(share_arrays, sessions).result()
+    assert isinstance(shared_store.values, SharedArray)
+    received = attach_arrays(shared_store)
+    assert np.array_equal(received.values, values)
+    assert np.array_equal(received.mask, store.mask)
+    assert attach_arrays(shared_sessions).series("b", "srpe").tolist() == [3]
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=shared_store.values.name)
+
+
+def test_teams_built_in_parallel_keep_players_as_store_views(tmp_path):
+    write_feature_folder(tmp_path, SyntheticConfig(teams=2, players=2, days=10))
+    parallel = generate_teams(tmp_path, workers=2)
+    serial = generate_teams(tmp_path)
+    for team_name, team in parallel.items():
+        assert np.array_equal(
+            team.store.values, serial[team_name].store.values, equal_nan=True
+        )
+        assert team.validation.violations.equals(
+            serial[team_name].validation.violations
+        )
+        for player_name, player in team.players.items():
+            assert player.stress.equals(serial[team_name].players[player_name].stress)
+            assert player.srpe.equals(serial[team_name].players[player_name].srpe)
+            assert np.shares_memory(player.stress.to_numpy(), team.store.values)
@@ -0,0 +1,30 @@
+from preprocessing import data_loader, read_in_data
+from preprocessing.synthetic import (
+    SyntheticConfig,
+    letters,
+    write_feature_folder,
+    write_team_workbooks,
+)
+
+
+def test_letters():
+    assert letters(0) == "a"
+    assert letters(25) == "z"
+    assert letters(26) == "ba"
+
+
+def test_feature_folder_loads(tmp_path):
+    config = SyntheticConfig(teams=2, players=3, days=20)
+    write_feature_folder(tmp_path, config)
+    teams = read_in_data.generate_teams(tmp_path)
+    assert sorted(teams) == config.team_names
+    assert teams["TeamA"].store.shape == (3, 15, 20)
+
+
+def test_team_workbooks_load(tmp_path):
+    config = SyntheticConfig(teams=1, players=2, days=10)
+    paths, team_names = write_team_workbooks(tmp_path, config)
+    teams = data_loader.generate_teams(paths, team_names)
+    player = teams["TeamA"].players["0"]
+    assert player.name == "0"
+    assert len(player.daily_load) == 10
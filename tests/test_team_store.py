@@ -0,0 +1,36 @@
+from preprocessing.team_store import TeamStore
+
+import pandas as pd  # type: ignore
+import numpy as np  # type: ignore
+
+frames = {
+    "fatigue": pd.DataFrame(
+        {
+            "Date": ["01.01.2000", "02.01.2000", "03.01.2000"],
+            "A": [1, np.nan, 3],
+            "B": [4, 5, 6],
+        }
+    ),
+    "stress": pd.DataFrame(
+        {
+            "Date": ["01.01.2000", "02.01.2000", "03.01.2000"],
+            "A": [2, 2, np.nan],
+            "B": [1, 1, 1],
+        }
+    ),
+}
+
+
+def test_from_frames():
+    store = TeamStore.from_frames(frames, ["A", "B"], features=["fatigue", "stress"])
+    assert store.shape == (2, 2, 3)
+    assert store.mask.sum() == 2
+    assert store.index.equals(pd.date_range("2000-01-01", periods=3))
+    assert store.series("B", "stress").tolist() == [1, 1, 1]
+
+
+def test_series_are_views():
+    store = TeamStore.from_frames(frames, ["A", "B"], features=["fatigue", "stress"])
+    fatigue = store.series("A", "fatigue")
+    assert np.shares_memory(fatigue.values, store.values)
+    assert np.shares_memory(store.feature("stress").values, store.values)
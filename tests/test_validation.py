@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing.team_store import TeamStore
+from preprocessing.validation import (
+    DuplicateRule,
+    OutlierRule,
+    RangeRule,
+    UnitRule,
+    apply_rules,
+    validate_store,
+)
+
+nan = np.nan
+
+
+def test_rules_clean_and_report_per_player():
+    index = pd.Index(["01.01.2020", "02.01.2020", "02.01.2020", "03.01.2020"])
+    features = {
+        "readiness": np.array([[5.0, 11.0, 3.0, nan], [2.0, -1.0, 4.0, 10.0]]),
+        "sleep_duration": np.array([[480.0, 7.5, 8.0, 30.0], [7.0, 6.0, nan, 8.0]]),
+    }
+    rules = [
+        RangeRule("readiness", 0, 10),
+        UnitRule("sleep_duration", 24, 1 / 60),
+        RangeRule("sleep_duration", 0, 24, action="clip"),
+        DuplicateRule("sleep_duration"),
+        RangeRule("unknown", 0, 1),
+    ]
+    cleaned, report = apply_rules(features, index, ["a", "b"], rules)
+    np.testing.assert_array_equal(
+        cleaned["readiness"], [[5.0, nan, 3.0, nan], [2.0, nan, 4.0, 10.0]]
+    )
+    np.testing.assert_allclose(
+        cleaned["sleep_duration"], [[8.0, 7.5, 8.0, 0.5], [7.0, 6.0, nan, 8.0]]
+    )
+    assert features["readiness"][0, 1] == 11.0
+    assert report.violations.values.tolist() == [
+        ["range", "readiness", "a", 1],
+        ["range", "readiness", "b", 1],
+        ["unit", "sleep_duration", "a", 2],
+        ["duplicate", "sleep_duration", "a", 1],
+    ]
+    assert report.total == 5
+
+
+def test_outliers_are_flagged_and_validated_store_is_cleaned():
+    values = np.full((2, 1, 30), 100.0) + np.arange(30)
+    values[0, 0, 10] = 10000.0
+    values[1, 0, 5] = -5.0
+    store = TeamStore.from_arrays(
+        ["a", "b"], ["daily_load"], pd.date_range("2020-01-01", periods=30), values
+    )
+    cleaned, report = validate_store(
+        store, [RangeRule("daily_load", 0), OutlierRule("daily_load")]
+    )
+    assert report.summary()["violations"].tolist() == [1, 1]
+    assert cleaned.values[0, 0, 10] == 10000.0
+    assert cleaned.mask[1, 0, 5] and not store.mask[1, 0, 5]
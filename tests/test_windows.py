@@ -0,0 +1,55 @@
+from preprocessing.windows import WindowDataset
+
+import pandas as pd  # type: ignore
+import numpy as np  # type: ignore
+
+index = pd.date_range("2000-01-01", periods=10)
+load = np.arange(20, dtype=float).reshape(2, 10)
+readiness = np.arange(100, 120, dtype=float).reshape(2, 10)
+readiness[1, 6] = np.nan
+
+
+def dataset(**kwargs) -> WindowDataset:
+    return WindowDataset(
+        {"daily_load": load, "readiness": readiness},
+        index,
+        ["A", "B"],
+        ["daily_load"],
+        ["readiness"],
+        lookback=3,
+        **kwargs
+    )
+
+
+def test_windows_skip_missing_targets():
+    windows = dataset()
+    assert len(windows) == 7 + 6
+    assert 3 not in windows.window_starts[windows.window_players == 1]
+    inputs, targets = windows.batch([0])
+    assert inputs[0, :, 0].tolist() == [0, 1, 2]
+    assert targets[0, :, 0].tolist() == [103]
+
+
+def test_stride_and_split():
+    windows = dataset(horizon=2, stride=2)
+    assert windows.window_starts[windows.window_players == 0].tolist() == [0, 2, 4]
+    train, validation = windows.split("2000-01-07")
+    assert len(windows.split("07.01.2000")[1]) == len(validation)
+    assert train.target_dates().max() < pd.Timestamp("2000-01-06")
+    assert validation.target_dates().min() >= pd.Timestamp("2000-01-07")
+    batches = list(windows.batches(2))
+    assert sum(len(inputs) for inputs, _ in batches) == len(windows)
+
+
+def test_lookback_longer_than_the_days_gives_no_windows():
+    windows = WindowDataset(
+        {"daily_load": load, "readiness": readiness},
+        index,
+        ["A", "B"],
+        ["daily_load"],
+        ["readiness"],
+        lookback=12,
+    )
+    assert len(windows) == 0
+    inputs, targets = windows.batch(slice(None))
+    assert inputs.shape == (0, 12, 1)